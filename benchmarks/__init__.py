@@ -0,0 +1,3 @@
+""" Benchmarks of the peak calling stages on seeded synthetic genomes; see
+syntheticGenome for the generator and runBenchmarks for the runner.
+"""
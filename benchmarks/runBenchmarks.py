@@ -0,0 +1,257 @@
+""" Times and measures the memory of each peak calling stage on synthetic
+genomes of increasing size, saving the results as JSON so that runs can be
+compared across commits.
+
+Usage:
+	python -m benchmarks.runBenchmarks --scales 1e4 1e5 1e6 -o results.json
+	python -m benchmarks.runBenchmarks --scales 1e4 1e5 1e6 \
+									   --compare results.json
+"""
+
+import argparse, contextlib, datetime, io, json, platform, subprocess, sys, \
+	   time, tracemalloc
+import numpy, pandas
+from benchmarks import syntheticGenome
+from simplenexuscaller import callSignals, callBoundaries, callPeaks
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+
+stageNames = ['callSignalRangesBed', 'getBoundaries',
+			  'resolveBoundariesWithSignal', 'getPeaks',
+			  'NexusAnalysis.callPeaks']
+
+# Parameters of the peak calling, as in NexusAnalysis.callPeaks #
+defaultCallParams = {'cutoff': 10, 'falseInRowUpper': 10, 'nInRowCutoff': 2,
+					 'distLimit': 40, 'maxWidth': 100}
+
+def measure(function, *args, traceMemory=True):
+	""" Calls function, measuring the time and the peak memory allocated.
+
+	Returns:
+		object, dict: The output of the function, and the seconds and peak \
+					  memory in bytes (None where not traced) of the call.
+	"""
+	if traceMemory:
+		tracemalloc.start()
+	start = time.perf_counter()
+	output = function(*args)
+	seconds = time.perf_counter() - start
+
+	peakMemory = None
+	if traceMemory:
+		peakMemory = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+
+	return output, {'seconds': seconds, 'peakMemoryBytes': peakMemory}
+
+def addMeasures(total, measures):
+	""" Adds the measures of a stage on one strand to the other strand.
+	"""
+	if total is None:
+		return dict(measures)
+
+	peaks = [total['peakMemoryBytes'], measures['peakMemoryBytes']]
+	return {'seconds': total['seconds'] + measures['seconds'],
+			'peakMemoryBytes': None if None in peaks else max(peaks)}
+
+def runStages(pos, neg, callParams, traceMemory=True):
+	""" Runs each stage on both strands of a genome.
+
+	Args:
+		pos (pandas.DataFrame): + strand bedGraph.
+
+		neg (pandas.DataFrame): - strand bedGraph, with positive counts.
+
+		callParams (dict): As in defaultCallParams.
+
+		traceMemory (bool): Whether to measure the peak memory of each stage, \
+							which slows the stages.
+
+	Returns:
+		dict, int: The seconds and peak memory of each stage, summed over \
+				   the strands, and the no. of peaks called.
+	"""
+	stages = {}
+	strandBoundaries = []
+	for bedFrame in [pos, neg]:
+		(signalRanges, summits), measures = measure(
+							callSignals.callSignalRangesBed, bedFrame,
+							callParams['cutoff'], callParams['falseInRowUpper'],
+							callParams['nInRowCutoff'], traceMemory=traceMemory)
+		stages['callSignalRangesBed'] = addMeasures(
+							stages.get('callSignalRangesBed'), measures)
+
+		boundaries, measures = measure(callBoundaries.getBoundaries,
+									   signalRanges, summits, bedFrame,
+									   traceMemory=traceMemory)
+		stages['getBoundaries'] = addMeasures(stages.get('getBoundaries'),
+											  measures)
+
+		boundaries, measures = measure(
+							callBoundaries.resolveBoundariesWithSignal,
+							boundaries, callParams['distLimit'],
+							traceMemory=traceMemory)
+		stages['resolveBoundariesWithSignal'] = addMeasures(
+							stages.get('resolveBoundariesWithSignal'), measures)
+		strandBoundaries.append(boundaries)
+
+	peaks, stages['getPeaks'] = measure(callPeaks.getPeaks, *strandBoundaries,
+										callParams['maxWidth'],
+										traceMemory=traceMemory)
+
+	# The whole pipeline as run by the CLI, from the compact tracks
+	nexus = NexusAnalysis(pos, neg)
+	with contextlib.redirect_stdout(io.StringIO()):
+		nexusPeaks, stages['NexusAnalysis.callPeaks'] = measure(
+							lambda: nexus.callPeaks(**callParams),
+							traceMemory=traceMemory)
+
+	return stages, len(nexusPeaks)
+
+def getCommit():
+	""" Gets the git commit of the working tree, or None outside of git.
+	"""
+	try:
+		return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+							  text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def runBenchmarks(scales, genomeParams=None, callParams=None, seed=0,
+				  repeats=1, traceMemory=True):
+	""" Runs the stages on a synthetic genome at each scale.
+
+	Args:
+		scales (list<int>): Approximate no. of rows of each strand's bedGraph.
+
+		genomeParams (dict): Parameters of syntheticGenome.generateGenome, \
+							 other than the genomeSize and seed.
+
+		callParams (dict): Parameters of the peak calling, defaulting to \
+						   defaultCallParams.
+
+		seed (int): Seed of the synthetic genomes.
+
+		repeats (int): No. of times to run the stages, taking the fastest.
+
+		traceMemory (bool): As in runStages.
+
+	Returns:
+		dict: The results, with the environment, parameters, and for each \
+			  scale the no. of rows, the measures of each stage and the no. of \
+			  peaks.
+	"""
+	genomeParams = dict(genomeParams or {})
+	callParams = {**defaultCallParams, **(callParams or {})}
+	rowsPerBase = syntheticGenome.getRowsPerBase(**genomeParams)
+
+	results = {'commit': getCommit(),
+			   'timestamp': datetime.datetime.now().isoformat(),
+			   'python': platform.python_version(),
+			   'numpy': numpy.__version__, 'pandas': pandas.__version__,
+			   'platform': platform.platform(),
+			   'seed': seed, 'genomeParams': genomeParams,
+			   'callParams': callParams, 'scales': []}
+	for scale in scales:
+		genomeSize = int(numpy.ceil(scale / rowsPerBase))
+		pos, neg = syntheticGenome.generateGenome(genomeSize=genomeSize,
+												  seed=seed, **genomeParams)
+
+		stages = None
+		for repeat in range(repeats):
+			repeatStages, nPeaks = runStages(pos, neg, callParams, traceMemory)
+			if stages is None:
+				stages = repeatStages
+				continue
+			for name, measures in repeatStages.items():
+				stages[name]['seconds'] = min(stages[name]['seconds'],
+											  measures['seconds'])
+
+		results['scales'].append({'scale': scale, 'genomeSize': genomeSize,
+								  'posRows': len(pos), 'negRows': len(neg),
+								  'stages': stages, 'peaks': nPeaks})
+		print(f"{scale:.0e} rows: " + ", ".join(
+				f"{name} {stages[name]['seconds']:.3f}s" for name in stageNames),
+			  file=sys.stderr)
+
+	return results
+
+def compareResults(oldResults, newResults):
+	""" Gets the ratio of the old to the new seconds of each stage, at the \
+	scales of both results; above 1 where the new results are faster.
+
+	Returns:
+		pandas.DataFrame: Rows of scales, columns of stages.
+	"""
+	oldScales = {result['scale']: result for result in oldResults['scales']}
+	speedups = {}
+	for result in newResults['scales']:
+		if result['scale'] not in oldScales:
+			continue
+
+		oldStages = oldScales[result['scale']]['stages']
+		speedups[result['scale']] = {
+					name: oldStages[name]['seconds'] / measures['seconds']
+					for name, measures in result['stages'].items()
+					if name in oldStages and measures['seconds'] > 0}
+
+	return pandas.DataFrame.from_dict(speedups, orient='index')
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(prog='benchmarks.runBenchmarks',
+							description="Benchmarks the peak calling stages on "
+										"seeded synthetic genomes.")
+	parser.add_argument("--scales",
+						help="Approximate no. of bedGraph rows per strand of "
+							 "each genome, e.g. 1e4 1e5 1e6.",
+						dest="scales",
+						type=lambda value: int(float(value)),
+						nargs='+',
+						default=[10**4, 10**5, 10**6])
+	parser.add_argument("--seed",
+						help="Seed of the synthetic genomes.",
+						dest="seed",
+						type=int,
+						default=0)
+	parser.add_argument("--repeats",
+						help="No. of times to run the stages at each scale, "
+							 "reporting the fastest.",
+						dest="repeats",
+						type=int,
+						default=1)
+	parser.add_argument("--noMemory",
+						help="Do not measure the peak memory of each stage, "
+							 "which slows the stages.",
+						dest="noMemory",
+						action="store_true")
+	parser.add_argument("--genomeParams",
+						help="JSON of parameters of "
+							 "syntheticGenome.generateGenome, e.g. "
+							 "'{\"nChroms\": 24, \"noise\": 0.1}'.",
+						dest="genomeParams",
+						type=json.loads,
+						default={})
+	parser.add_argument("--compare",
+						help="Results JSON of a previous run to print the "
+							 "speedup of this run over.",
+						dest="compare",
+						type=str,
+						default=None)
+	parser.add_argument("-o", "--output",
+						help="File to write the results JSON to.",
+						dest="output",
+						type=str,
+						default="benchmarkResults.json")
+	args = parser.parse_args(argv)
+
+	results = runBenchmarks(args.scales, args.genomeParams, seed=args.seed,
+							repeats=args.repeats,
+							traceMemory=not args.noMemory)
+	with open(args.output, 'w') as outputFile:
+		json.dump(results, outputFile, indent=1)
+
+	if args.compare is not None:
+		with open(args.compare) as compareFile:
+			print(compareResults(json.load(compareFile), results).to_string())
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,176 @@
+""" Generates seeded synthetic ChIP-nexus + and - strand bedGraphs, at any
+scale, for benchmarking the peak calling stages.
+
+Each chromosome has background reads at a random fraction of bases, and
+binding sites at a given density, each of which adds a cluster of high counts
+at the + strand boundary and, peakWidth bases downstream, at the - strand
+boundary. Large zero-count gap intervals (such as unmappable regions) have no
+reads. As in real bedGraphs, each base with reads is one row, and each run of
+bases without reads between them is a single zero-count row.
+"""
+
+import numpy, pandas
+
+def getBindingSites(rng, chromLen, peakDensity, peakWidth, boundaryWidth):
+	""" Gets the start of each binding site on a chromosome, at peakDensity \
+	sites per kb.
+	"""
+	nSites = rng.poisson(peakDensity * chromLen / 1000)
+	maxStart = max(chromLen - peakWidth - boundaryWidth, 1)
+	return numpy.sort(rng.integers(0, maxStart, nSites))
+
+def getStrandCounts(rng, chromLen, siteStarts, noise, peakHeight,
+					boundaryWidth, gaps):
+	""" Gets the bases with reads on one strand of a chromosome.
+
+	Args:
+		rng (numpy.random.Generator): Random number generator.
+
+		chromLen (int): Length of the chromosome.
+
+		siteStarts (numpy.array<int>): First base of the boundary of each \
+									   binding site on this strand.
+
+		noise, peakHeight, boundaryWidth: As in generateGenome.
+
+		gaps (numpy.array<int>): Rows of [start, end) of the zero-count gaps.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>: Sorted bases with reads, and the \
+											counts at those bases.
+	"""
+	# Background bases, as geometric steps between bases with reads
+	noiseBases = numpy.zeros(0, dtype=numpy.int64)
+	if noise > 0:
+		nExpected = int(noise * chromLen * 1.1) + 10
+		noiseBases = numpy.cumsum(rng.geometric(noise, nExpected)) - 1
+		noiseBases = noiseBases[noiseBases < chromLen]
+	noiseCounts = rng.poisson(1, len(noiseBases)) + 1
+
+	# Binding site boundaries, as a cluster of bases with high counts
+	siteBases = (siteStarts[:, None] + numpy.arange(boundaryWidth)).ravel()
+	siteCounts = rng.poisson(peakHeight, len(siteBases))
+
+	bases, inverse = numpy.unique(numpy.concatenate((noiseBases, siteBases)),
+								  return_inverse=True)
+	counts = numpy.bincount(inverse, weights=numpy.concatenate((noiseCounts,
+																siteCounts)))
+
+	# Removing reads in the gaps, and bases which were given no counts
+	inGap = numpy.zeros(len(bases), dtype=bool)
+	if len(gaps) > 0:
+		gapi = numpy.searchsorted(gaps[:, 0], bases, side='right') - 1
+		inGap = (gapi >= 0) & (bases < gaps[numpy.maximum(gapi, 0), 1])
+	keep = ~inGap & (counts > 0) & (bases < chromLen)
+
+	return bases[keep], counts[keep].astype(numpy.int64)
+
+def getGaps(rng, chromLen, gapDensity, gapLength):
+	""" Gets non-overlapping zero-count gaps, at gapDensity gaps per Mb with \
+	exponentially distributed lengths of mean gapLength.
+	"""
+	nGaps = rng.poisson(gapDensity * chromLen / 1e6)
+	starts = numpy.sort(rng.integers(0, chromLen, nGaps))
+	ends = numpy.minimum(starts + rng.exponential(gapLength, nGaps).astype(int)
+						 + 1, chromLen)
+	if nGaps > 1:
+		# Merging overlapping gaps
+		ends = numpy.maximum.accumulate(ends)
+		newGap = numpy.concatenate(([True], starts[1:] > ends[:-1]))
+		ends = numpy.maximum.reduceat(ends, numpy.flatnonzero(newGap))
+		starts = starts[newGap]
+
+	return numpy.column_stack((starts, ends)).astype(numpy.int64)
+
+def getBedRows(bases, counts, chromLen):
+	""" Gets the bedGraph rows of a chromosome from the bases with reads.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>, numpy.array<int>: The start, end \
+								and count of each row, where each base with \
+								reads is a row and the bases between are \
+								zero-count rows.
+	"""
+	prevEnds = numpy.concatenate(([0], bases + 1))
+	nextStarts = numpy.concatenate((bases, [chromLen]))
+	isGap = nextStarts > prevEnds
+
+	starts = numpy.concatenate((prevEnds[isGap], bases))
+	ends = numpy.concatenate((nextStarts[isGap], bases + 1))
+	rowCounts = numpy.concatenate((numpy.zeros(isGap.sum(), dtype=numpy.int64),
+								   counts))
+	order = numpy.argsort(starts, kind='stable')
+
+	return starts[order], ends[order], rowCounts[order]
+
+def generateGenome(nChroms=4, genomeSize=1000000, peakDensity=0.5,
+				   noise=0.05, gapDensity=10, gapLength=5000, peakHeight=20,
+				   peakWidth=40, boundaryWidth=5, seed=0):
+	""" Generates + and - strand bedGraphs of a synthetic ChIP-nexus library.
+
+	Args:
+		nChroms (int): No. of chromosomes, which split the genome equally.
+
+		genomeSize (int): Total length of the chromosomes.
+
+		peakDensity (float): Binding sites per kb.
+
+		noise (float): Fraction of bases with background reads, which have \
+					   1 + Poisson(1) counts.
+
+		gapDensity (float): Zero-count gap intervals per Mb.
+
+		gapLength (float): Mean length of the gap intervals.
+
+		peakHeight (float): Mean counts at each base of a binding site boundary.
+
+		peakWidth (int): Distance from the + strand to the - strand boundary of \
+						 a binding site.
+
+		boundaryWidth (int): No. of bases with high counts at each boundary.
+
+		seed (int): Seed of the random number generator; the same seed and \
+					parameters give the same bedGraphs.
+
+	Returns:
+		pandas.DataFrame, pandas.DataFrame: The + and - strand bedGraphs, \
+				with columns [chr, start, end, count] and positive counts.
+	"""
+	rng = numpy.random.default_rng(seed)
+	chromLen = max(genomeSize // nChroms, 1)
+
+	strandRows = {'+': [], '-': []}
+	for chromi in range(nChroms):
+		chrom = f'chr{chromi + 1}'
+		gaps = getGaps(rng, chromLen, gapDensity, gapLength)
+		siteStarts = getBindingSites(rng, chromLen, peakDensity, peakWidth,
+									 boundaryWidth)
+
+		for strand, strandStarts in [('+', siteStarts),
+									 ('-', siteStarts + peakWidth)]:
+			bases, counts = getStrandCounts(rng, chromLen, strandStarts, noise,
+											peakHeight, boundaryWidth, gaps)
+			starts, ends, rowCounts = getBedRows(bases, counts, chromLen)
+			strandRows[strand].append(pandas.DataFrame({
+								'chr': numpy.full(len(starts), chrom,
+												  dtype=object),
+								'start': starts, 'end': ends,
+								'count': rowCounts}))
+
+	return [pandas.concat(strandRows[strand], ignore_index=True)
+			for strand in ['+', '-']]
+
+def getRowsPerBase(noise=0.05, peakDensity=0.5, boundaryWidth=5, **params):
+	""" Estimates the no. of bedGraph rows per base of genome for parameters \
+	of generateGenome, to choose the genomeSize for a no. of rows.
+	"""
+	withReads = min(noise + 2 * peakDensity * boundaryWidth / 1000, 1)
+	return withReads * (2 - withReads)
+
+def writeBedGraph(bedFrame, fileName, negate=False):
+	""" Writes a generated bedGraph to a file, with the counts negated for \
+	a - strand bedGraph as output by common tools.
+	"""
+	if negate:
+		bedFrame = bedFrame.assign(count=-bedFrame['count'])
+	bedFrame.to_csv(fileName, sep='\t', header=False, index=False)
@@ -8,7 +8,7 @@ setup(
     version='1.0.0',
     author='Brad Balderson, Mikael Boden',
     author_email='brad.balderson@uqconnect.edu.au',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     license='GPL-3.0',
     long_description_content_type="text/markdown",
     long_description=long_description,
@@ -2,7 +2,7 @@ from simplenexuscaller import simplenexuscaller
 
 
 def main():
-    simplenexuscaller.SimpleNexusCaller()
+    simplenexuscaller.main()
 
 if __name__ == "__main__":
     main()
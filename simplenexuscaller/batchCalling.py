@@ -0,0 +1,341 @@
+""" Calls peaks for many samples listed in a manifest, on one process pool.
+
+Each sample is read in the main process and its bedGraph columns placed in
+shared memory as in parallelCalling; each chromosome of each sample is then a
+task on a pool shared by all the samples, so the workers stay busy across
+samples rather than idling at the end of each one. Samples are admitted while
+the shared memory of the samples being called is within a memory budget, and
+freed once their peaks are written.
+
+The peaks of each sample are written to a temporary file which is renamed to
+{output}.bed once complete, after which the sample is appended to a status
+file. A batch resumed with the same status file skips the samples already
+completed with the same parameters.
+"""
+
+import collections, json, logging, os, time
+import pandas
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from simplenexuscaller import bedGraphReader, callPeaks, cutoffSelection, \
+							  parallelCalling, parameterSweep, peakWriter
+
+logger = logging.getLogger(__name__)
+
+manifestColumns = ['sample', 'pos', 'neg']
+optionalColumns = ['output'] + parameterSweep.paramNames + \
+				  ['cutoffMethod', 'cutoffLevel']
+statusColumns = ['sample', 'output', 'params', 'peaks', 'wallSeconds']
+
+def parseParam(name, value):
+	""" Parses a parameter of a manifest, given as a string.
+	"""
+	if name == 'cutoff' and value == 'auto':
+		return value
+	if name in ['dualMethod', 'cutoffMethod']:
+		return value
+	if name == 'cutoffLevel':
+		return float(value)
+
+	return int(value)
+
+def readManifest(fileName, defaults):
+	""" Reads a manifest of the samples to call.
+
+	Args:
+		fileName (str): Tab separated file with a header, with the columns \
+						'sample', 'pos' and 'neg', the + and - strand \
+						bedGraphs or caches; and optionally 'output', the \
+						output prefix (by default the sample name), and any \
+						of the parameters of NexusAnalysis.callPeaks, which \
+						override defaults for the sample where not empty. \
+						Relative paths are relative to the manifest.
+
+		defaults (dict): Default parameters, the cutoff, falseInRowUpper, \
+						 nInRowCutoff, distLimit, maxWidth, dualMethod, \
+						 cutoffMethod and cutoffLevel.
+
+	Returns:
+		list<dict>: For each sample, the 'sample', 'pos', 'neg', 'output' \
+					and 'params'.
+	"""
+	manifest = pandas.read_csv(fileName, sep='\t', dtype=str,
+							   keep_default_na=False, comment='#')
+	missingColumns = [column for column in manifestColumns
+					  if column not in manifest.columns]
+	unknownColumns = [column for column in manifest.columns
+					  if column not in manifestColumns + optionalColumns]
+	if len(missingColumns) > 0 or len(unknownColumns) > 0:
+		raise ValueError(f"Manifest {fileName} is missing columns "
+						 f"{missingColumns} or has unknown columns "
+						 f"{unknownColumns}; expected {manifestColumns} and "
+						 f"optionally some of {optionalColumns}.")
+
+	duplicated = manifest['sample'][manifest['sample'].duplicated()]
+	if len(duplicated) > 0:
+		raise ValueError(f"Manifest {fileName} has duplicate samples "
+						 f"{sorted(set(duplicated))}.")
+
+	manifestDir = os.path.dirname(os.path.abspath(fileName))
+	samples = []
+	for row in manifest.to_dict('records'):
+		params = dict(defaults)
+		for name in optionalColumns[1:]:
+			if row.get(name, '') != '':
+				try:
+					params[name] = parseParam(name, row[name])
+				except ValueError:
+					raise ValueError(f"Sample {row['sample']} has an invalid "
+									 f"{name} of '{row[name]}'.")
+
+		samples.append({'sample': row['sample'],
+						'pos': os.path.join(manifestDir, row['pos']),
+						'neg': os.path.join(manifestDir, row['neg']),
+						'output': os.path.join(manifestDir,
+											   row.get('output') or
+											   row['sample']),
+						'params': params})
+
+	return samples
+
+def getParamsKey(params):
+	""" Gets the parameters of a sample as recorded in the status file.
+	"""
+	return json.dumps(params, sort_keys=True)
+
+def readStatus(statusFile):
+	""" Reads the samples completed in a previous run of a batch.
+
+	Returns:
+		dict<str, tuple<str, str>>: The output and parameters of each \
+									completed sample, as in getParamsKey.
+	"""
+	if not os.path.exists(statusFile):
+		return {}
+
+	status = pandas.read_csv(statusFile, sep='\t', dtype=str,
+							 keep_default_na=False)
+	return {row['sample']: (row['output'], row['params'])
+			for row in status.to_dict('records')}
+
+def isComplete(sample, status):
+	""" Whether a sample was completed with the same output and parameters in \
+	a previous run, as read by readStatus.
+	"""
+	return status.get(sample['sample']) == \
+		   (sample['output'], getParamsKey(sample['params'])) and \
+		   os.path.exists(f"{sample['output']}.bed")
+
+def appendStatus(statusFile, sample, nPeaks, wallSeconds):
+	""" Records a sample as completed in the status file.
+	"""
+	writeHeader = not os.path.exists(statusFile)
+	with open(statusFile, 'a') as status:
+		if writeHeader:
+			status.write('\t'.join(statusColumns) + '\n')
+		status.write('\t'.join([sample['sample'], sample['output'],
+								getParamsKey(sample['params']), str(nPeaks),
+								f'{wallSeconds:.3f}']) + '\n')
+
+def writePeaks(peaks, output):
+	""" Writes peaks to {output}.bed, through a temporary file so that an \
+	interrupted write does not leave a partial bed file.
+	"""
+	fileName = f'{output}.bed'
+	tempFileName = f'{fileName}.tmp'
+	peakWriter.writePeaks(peaks, tempFileName)
+	os.replace(tempFileName, fileName)
+
+class BatchSample(object):
+	""" A sample being called, with its bedGraph columns in shared memory.
+
+	Construction is by contract, no error checking.
+	"""
+
+	def __init__(self, sample, samplei):
+		""" Reads the sample and shares its bedGraph columns.
+
+			Args:
+				sample (dict): As output by readManifest.
+
+				samplei (int): Index of the sample, keying its shared arrays \
+							   in the workers.
+		"""
+		self.sample = sample
+		self.samplei = samplei
+		self.startTime = time.perf_counter()
+
+		params = dict(sample['params'])
+		pos = bedGraphReader.readTrack(sample['pos'])
+		neg = bedGraphReader.readTrack(sample['neg'], absCounts=True)
+		if params['cutoff'] == 'auto':
+			params['cutoff'], summary = cutoffSelection.selectCutoff(
+						[pos, neg], params['cutoffMethod'], params['cutoffLevel'])
+			logger.info(f"Selected a cutoff of {params['cutoff']} counts for "
+						f"{sample['sample']}.")
+		self.maxWidth = params['maxWidth']
+		self.params = {name: params[name] for name in
+					   ['cutoff', 'falseInRowUpper', 'nInRowCutoff',
+						'distLimit', 'dualMethod']}
+
+		posArrays, negArrays = pos.getBedArrays(), neg.getBedArrays()
+		self.posChromNames, self.negChromNames = posArrays[1], negArrays[1]
+		self.posBlockStarts, self.negBlockStarts, self.tasks = \
+			parallelCalling.getChromosomeTasks(posArrays[0], posArrays[1],
+											   negArrays[0], negArrays[1])
+		self.sharedArrays = parallelCalling.SharedArrays(
+						parallelCalling.getSharedStrandArrays(posArrays,
+															  negArrays))
+		self.results = {}
+		self.failed = False
+
+	@property
+	def nbytes(self):
+		return self.sharedArrays.nbytes
+
+	def submit(self, pool):
+		""" Submits a task per chromosome to the pool.
+
+		Returns:
+			dict<concurrent.futures.Future, tuple>: The task of each future.
+		"""
+		return {pool.submit(parallelCalling.callSharedChromosome,
+							self.samplei, self.sharedArrays.spec,
+							*parallelCalling.getTaskBlocks(
+									task, self.posBlockStarts,
+									self.negBlockStarts),
+							self.posChromNames, self.negChromNames,
+							self.maxWidth, self.params): task
+				for task in self.tasks}
+
+	def isDone(self):
+		return len(self.results) == len(self.tasks)
+
+	def getPeaks(self):
+		""" Merges the results of the chromosomes into the peaks, as output \
+		by NexusAnalysis.callPeaks.
+		"""
+		posResult, negResult, peakIndex = \
+			parallelCalling.mergeChromosomeResults(self.results,
+												   self.posChromNames,
+												   self.negChromNames)
+
+		return callPeaks.getPeakFrame(posResult[3], negResult[3], *peakIndex)
+
+	def close(self):
+		self.sharedArrays.close()
+
+def callBatch(samples, threads=1, memoryBudget=None, statusFile=None,
+			  resume=False):
+	""" Calls the peaks of each sample, writing them to {output}.bed.
+
+	Args:
+		samples (list<dict>): As output by readManifest.
+
+		threads (int): No. of worker processes, shared by all samples.
+
+		memoryBudget (int): Bytes of shared memory for the samples being \
+							called, beyond which no more samples are read \
+							until one is written; at least one sample is \
+							called at a time. None for no limit. Columns \
+							memory-mapped from a binaryCache use none.
+
+		statusFile (str): File the completed samples are appended to, or \
+						  None to not record them.
+
+		resume (bool): Whether to skip the samples recorded as completed \
+					   with the same output and parameters in statusFile.
+
+	Returns:
+		dict<str, int>, list<str>: The no. of peaks of each sample called, \
+								   and the samples which failed.
+	"""
+	if resume and statusFile is not None:
+		status = readStatus(statusFile)
+		pending = [sample for sample in samples
+				   if not isComplete(sample, status)]
+		if len(pending) < len(samples):
+			logger.info(f"Skipping {len(samples) - len(pending)} samples "
+						f"completed in a previous run.")
+	else:
+		pending = list(samples)
+	pending = collections.deque(enumerate(pending))
+
+	nPeaks, failed = {}, []
+	active, futures = {}, {}
+	nextSample = None
+	with ProcessPoolExecutor(max_workers=threads) as pool:
+		while len(pending) > 0 or nextSample is not None or len(active) > 0:
+			# Admitting samples while within the memory budget #
+			while True:
+				if nextSample is None and len(pending) > 0:
+					samplei, sample = pending.popleft()
+					logger.info(f"Reading {sample['sample']}...")
+					try:
+						nextSample = BatchSample(sample, samplei)
+					except Exception as error:
+						logger.error(f"Failed to read {sample['sample']}: "
+									 f"{error}")
+						failed.append(sample['sample'])
+						continue
+				if nextSample is None:
+					break
+
+				activeBytes = sum(batchSample.nbytes
+								  for batchSample in active.values())
+				if len(active) > 0 and memoryBudget is not None and \
+				   activeBytes + nextSample.nbytes > memoryBudget:
+					break
+
+				for future, task in nextSample.submit(pool).items():
+					futures[future] = (nextSample.samplei, task)
+				if nextSample.isDone(): # No chromosomes to call
+					finishSample(nextSample, statusFile, nPeaks, failed)
+				else:
+					active[nextSample.samplei] = nextSample
+				nextSample = None
+
+			if len(futures) == 0:
+				continue
+
+			done, _ = wait(futures, return_when=FIRST_COMPLETED)
+			for future in done:
+				samplei, task = futures.pop(future)
+				batchSample = active[samplei]
+				try:
+					batchSample.results[task] = future.result()
+				except Exception as error:
+					if not batchSample.failed:
+						logger.error(f"Failed to call "
+									 f"{batchSample.sample['sample']}: {error}")
+					batchSample.failed = True
+					batchSample.results[task] = None
+
+				if batchSample.isDone():
+					finishSample(batchSample, statusFile, nPeaks, failed)
+					del active[samplei]
+
+	return nPeaks, failed
+
+def finishSample(batchSample, statusFile, nPeaks, failed):
+	""" Writes the peaks of a sample whose chromosomes are all called, and \
+	frees its shared memory.
+	"""
+	sample = batchSample.sample
+	try:
+		if batchSample.failed:
+			failed.append(sample['sample'])
+			return
+
+		peaks = batchSample.getPeaks()
+		writePeaks(peaks, sample['output'])
+		nPeaks[sample['sample']] = len(peaks)
+		wallSeconds = time.perf_counter() - batchSample.startTime
+		if statusFile is not None:
+			appendStatus(statusFile, sample, len(peaks), wallSeconds)
+		logger.info(f"Detected {len(peaks)} peaks for {sample['sample']}, "
+					f"written to {sample['output']}.bed.")
+	except Exception as error:
+		logger.error(f"Failed to write {sample['sample']}: {error}")
+		failed.append(sample['sample'])
+	finally:
+		batchSample.close()
@@ -0,0 +1,469 @@
+""" Functions for reading ChIP-nexus bedGraph files, either in full or one
+chromosome at a time so that only one chromosome of each strand needs to be
+held in memory. Files are read in chunks, with each chunk converted to the
+compact columns of a bedGraphTrack.BedGraphTrack before the next is read.
+
+Where a bedGraph has been converted to a binaryCache, the cache is
+memory-mapped instead of parsing the bedGraph. BGZF compressed bedGraphs are
+decompressed in parallel, and where indexed (see bgzf) only the parts holding
+a chromosome or the regions called are decompressed.
+"""
+
+import io, queue, threading
+import numpy, pandas
+from concurrent.futures import ThreadPoolExecutor
+from simplenexuscaller import bedGraphTrack, binaryCache, bgzf
+
+colNames = ['chr', 'start', 'end', 'count']
+bytesPerRow = 32 # Approximate bytes of text per row, for reading BGZF chunks
+
+def readBedGraph(fileName, absCounts=False):
+	""" Reads in a bedGraph file.
+
+	Args:
+		fileName (str): BedGraph with columns [chr, start, end, count], and \
+						no column headers.
+
+		absCounts (bool): Whether to take the absolute value of the counts, \
+						  such as for - strand bedGraphs with negative counts.
+
+	Returns:
+		pandas.DataFrame: The bedGraph with columns [chr, start, end, count].
+	"""
+	bedFrame = pandas.read_csv(fileName, sep='\t', names=colNames,
+							   dtype={'chr': str})
+	if absCounts:
+		bedFrame['count'] = numpy.abs(bedFrame['count'])
+
+	return bedFrame
+
+def iterChunks(fileName, absCounts=False, chunkSize=1000000):
+	""" Reads a bedGraph in chunks of rows converted to compact arrays.
+
+	Args:
+		fileName (str): As in readBedGraph.
+
+		absCounts (bool): As in readBedGraph.
+
+		chunkSize (int): No. of rows read from the file at a time.
+
+	Yields:
+		list<str>, numpy.array<int>, numpy.array<int>, numpy.array<int>, \
+		numpy.array<int>: The chromosome and length of each run of rows on \
+						the same chromosome in the chunk, and the starts, ends \
+						and counts of the chunk (see bedGraphTrack).
+	"""
+	if bgzf.isBgzf(fileName):
+		for offset, text in bgzf.iterTextChunks(fileName,
+												chunkSize * bytesPerRow):
+			yield getChunkArrays(readText(text), absCounts)
+		return
+
+	# Chromosome names are read as str, else a numeric name such as '1' is
+	# an int in some chunks and a str in others
+	for chunk in pandas.read_csv(fileName, sep='\t', names=colNames,
+								 dtype={'chr': str}, chunksize=chunkSize):
+		yield getChunkArrays(chunk, absCounts)
+
+def readText(text):
+	""" Reads bedGraph lines decompressed from a BGZF file.
+	"""
+	return pandas.read_csv(io.BytesIO(text), sep='\t', names=colNames,
+						   dtype={'chr': str})
+
+def getChunkArrays(chunk, absCounts=False):
+	""" Converts a chunk of a bedGraph to compact arrays, as output by \
+	iterChunks.
+	"""
+	chroms = chunk['chr'].to_numpy()
+	blockStarts = numpy.flatnonzero(numpy.concatenate(([True],
+											 chroms[1:] != chroms[:-1])))
+	if len(chroms) == 0:
+		blockStarts = blockStarts[:0]
+	blockLens = numpy.diff(numpy.concatenate((blockStarts, [len(chunk)])))
+
+	return chroms[blockStarts].tolist(), blockLens, \
+		   bedGraphTrack.getCoordArray(chunk['start'].to_numpy()), \
+		   bedGraphTrack.getCoordArray(chunk['end'].to_numpy()), \
+		   bedGraphTrack.getCountArray(chunk['count'].to_numpy(), absCounts)
+
+def iterIndexedChunks(fileName, index, ranges, absCounts=False):
+	""" Reads uncompressed ranges of an indexed BGZF bedGraph, merging \
+	overlapping ranges, as chunks as output by iterChunks.
+
+	Args:
+		fileName (str): BGZF compressed bedGraph.
+
+		index (bgzf.BgzfIndex): Index of the bedGraph.
+
+		ranges (list<tuple<int, int>>): Uncompressed ranges of whole lines, \
+						as from index.getChromRange or index.getRegionRange, \
+						in the order of the file.
+
+		absCounts (bool): As in readBedGraph.
+
+	Yields:
+		int, tuple: The row in the bedGraph of the first line of each chunk, \
+					and the chunk.
+	"""
+	merged = []
+	for start, end in ranges:
+		if len(merged) > 0 and start <= merged[-1][1]:
+			merged[-1][1] = max(merged[-1][1], end)
+		else:
+			merged.append([start, end])
+
+	with ThreadPoolExecutor(bgzf.defaultThreads) as pool:
+		for start, end in merged:
+			if end > start:
+				yield index.getRangeRow(start), getChunkArrays(readText(
+						index.readRange(fileName, start, end, pool)), absCounts)
+
+def getTrackFromChunks(chunks, rowOffset=0, fileRows=None):
+	""" Joins chunks as output by iterChunks into a track, with rowOffset and \
+	fileRows as in bedGraphTrack.BedGraphTrack.
+	"""
+	blockNames = [chrom for chunk in chunks for chrom in chunk[0]]
+	blockLens = numpy.concatenate([chunk[1] for chunk in chunks] +
+								  [numpy.zeros(0, dtype=numpy.int64)])
+	columns = [[chunk[i] for chunk in chunks] for i in [2, 3, 4]]
+	columns[2] = bedGraphTrack.getCommonCountArrays(columns[2])
+
+	return bedGraphTrack.getTrackFromBlocks(
+							blockNames, blockLens,
+							*[numpy.concatenate(column) for column in columns],
+							rowOffset=rowOffset, fileRows=fileRows)
+
+def filterChunk(chunk, regions):
+	""" Keeps the rows of a chunk as output by iterChunks which overlap \
+	regions (a regionIndex.RegionIndex).
+
+	Returns:
+		tuple, numpy.array<int>: The chunk of the rows kept, and the row of \
+								 each in the chunk.
+	"""
+	blockNames, blockLens, starts, ends, counts = chunk
+	rowChroms = numpy.repeat(numpy.array(blockNames, dtype=object), blockLens)
+	keep = regions.getOverlapMask(rowChroms, starts, ends)
+	blockLens = numpy.array([blockKeep.sum() for blockKeep in numpy.split(
+							keep, numpy.cumsum(blockLens)[:-1])], dtype=numpy.int64)
+
+	return ([chrom for chrom, blockLen in zip(blockNames, blockLens)
+			 if blockLen > 0], blockLens[blockLens > 0],
+			starts[keep], ends[keep], counts[keep]), numpy.flatnonzero(keep)
+
+def readTrack(fileName, absCounts=False, chunkSize=1000000, useCache=True,
+			  regions=None):
+	""" Reads in a bedGraph file as a compact track, holding only one chunk \
+	of the file in pandas at a time.
+
+	Args:
+		fileName (str): As in readBedGraph, or a cache directory written by \
+						convertBedGraph.
+
+		absCounts (bool): As in readBedGraph.
+
+		chunkSize (int): As in iterChunks.
+
+		useCache (bool): Whether to memory-map the cache of the bedGraph \
+						 where there is an up to date cache, see \
+						 binaryCache.getCachePath.
+
+		regions (regionIndex.RegionIndex): Where given, only the rows \
+						overlapping the regions are kept from each chunk, \
+						with the row of each in the bedGraph as the fileRows \
+						of the track. A memory-mapped cache is not filtered, \
+						since only the rows used are read from it, and only \
+						the parts of an indexed BGZF bedGraph near the regions \
+						are read.
+
+	Returns:
+		bedGraphTrack.BedGraphTrack: The bedGraph.
+	"""
+	cacheDir = binaryCache.getCachePath(fileName) if useCache else None
+	if cacheDir is not None:
+		return binaryCache.readTrackCache(cacheDir, absCounts)
+
+	index = bgzf.readIndex(fileName) if regions is not None else None
+	if index is not None:
+		# Only the parts of the bedGraph near the regions
+		ranges = [index.getRegionRange(chrom, start, end)
+				  for chrom in index.chromNames if chrom in regions.regions
+				  for start, end in zip(*regions.regions[chrom])]
+		rowChunks = iterIndexedChunks(fileName, index, ranges, absCounts)
+	else:
+		rowChunks = iterRowChunks(iterChunks(fileName, absCounts, chunkSize))
+
+	chunks, fileRows = [], []
+	for chunkRow, chunk in rowChunks:
+		if regions is not None:
+			chunk, keptRows = filterChunk(chunk, regions)
+			fileRows.append(chunkRow + keptRows)
+		chunks.append(chunk)
+	if len(chunks) == 0:
+		return bedGraphTrack.getEmptyTrack()
+
+	return getTrackFromChunks(chunks, fileRows=numpy.concatenate(fileRows)
+										if regions is not None else None)
+
+def iterRowChunks(chunks):
+	""" Numbers chunks as output by iterChunks by the row in the bedGraph of \
+	their first row, as iterIndexedChunks.
+	"""
+	chunkRow = 0
+	for chunk in chunks:
+		yield chunkRow, chunk
+		chunkRow += len(chunk[2])
+
+def convertBedGraph(fileName, cacheDir=None, absCounts=False,
+					chunkSize=1000000):
+	""" Converts a bedGraph to a binary cache, which readTrack then \
+	memory-maps in place of reading the bedGraph.
+
+	Args:
+		fileName (str): As in readBedGraph.
+
+		cacheDir (str): Directory to write the cache to. Defaults to \
+						binaryCache.getDefaultCachePath(fileName), where it \
+						is found automatically by readTrack.
+
+		absCounts (bool): As in readBedGraph.
+
+		chunkSize (int): As in iterChunks.
+
+	Returns:
+		bedGraphTrack.BedGraphTrack: The converted bedGraph.
+	"""
+	if cacheDir is None:
+		cacheDir = binaryCache.getDefaultCachePath(fileName)
+
+	track = readTrack(fileName, absCounts, chunkSize, useCache=False)
+	binaryCache.writeTrackCache(track, cacheDir, source=fileName,
+								absCounts=absCounts)
+
+	return track
+
+def readChrom(fileName, chrom, absCounts=False, chunkSize=1000000):
+	""" Reads in the rows of one chromosome of a bedGraph. Only the part of \
+	an indexed BGZF bedGraph holding the chromosome is decompressed, and a \
+	cache is memory-mapped; otherwise the bedGraph is read up to the end of \
+	the chromosome.
+
+	Args:
+		fileName, absCounts, chunkSize: As in iterChroms.
+
+		chrom (str): The chromosome.
+
+	Returns:
+		bedGraphTrack.BedGraphTrack: The rows on the chromosome, with no rows \
+									 if the chromosome is not in the bedGraph.
+	"""
+	cacheDir = binaryCache.getCachePath(fileName)
+	if cacheDir is not None:
+		return binaryCache.readTrackCache(cacheDir, absCounts).getChrom(chrom)
+
+	index = bgzf.readIndex(fileName)
+	if index is not None:
+		chromRange = index.getChromRange(chrom)
+		if chromRange is None:
+			return bedGraphTrack.getEmptyTrack()
+		return getTrackFromChunks([chunk for chunkRow, chunk in
+								   iterIndexedChunks(fileName, index,
+													 [chromRange], absCounts)],
+								  rowOffset=index.getRangeRow(chromRange[0]))
+
+	for chromName, track in iterChroms(fileName, absCounts, chunkSize):
+		if chromName == chrom:
+			return track
+
+	return bedGraphTrack.getEmptyTrack()
+
+def iterChroms(fileName, absCounts=False, chunkSize=1000000):
+	""" Reads in a bedGraph one chromosome at a time, holding in memory only \
+	the rows of the current chromosome and one chunk of the file. Where the \
+	bedGraph has a cache, the chromosomes are views of the memory-mapped cache.
+
+	Args:
+		fileName (str): As in readTrack.
+
+		absCounts (bool): As in readBedGraph.
+
+		chunkSize (int): As in iterChunks.
+
+	Yields:
+		str, bedGraphTrack.BedGraphTrack: The chromosome name, and the rows on \
+				that chromosome. The rowOffset of the track is the row of the \
+				chromosome in the file.
+	"""
+	cacheDir = binaryCache.getCachePath(fileName)
+	if cacheDir is not None:
+		yield from binaryCache.readTrackCache(cacheDir, absCounts).iterChroms()
+		return
+
+	yield from iterChunkChroms(iterChunks(fileName, absCounts, chunkSize))
+
+def iterChunkChroms(chunks):
+	""" Joins chunks as output by iterChunks into one track per chromosome, \
+	holding in memory only the rows of the current chromosome and one chunk.
+
+	Args:
+		chunks (iterable<tuple>): Chunks as output by iterChunks, in the \
+								  order of the bedGraph.
+
+	Yields:
+		str, bedGraphTrack.BedGraphTrack: As in iterChroms.
+	"""
+	chrom, pending, rowOffset, nRows = None, [], 0, 0
+	for blockNames, blockLens, starts, ends, counts in chunks:
+		blockOffsets = numpy.concatenate(([0], numpy.cumsum(blockLens)))
+		for blocki, blockChrom in enumerate(blockNames):
+			if blockChrom != chrom and len(pending) > 0:
+				yield chrom, getTrackFromChunks(pending, rowOffset)
+				pending, rowOffset = [], nRows
+
+			chrom = blockChrom
+			start, end = blockOffsets[blocki], blockOffsets[blocki + 1]
+			pending.append(([chrom], [end - start], starts[start:end],
+							ends[start:end], counts[start:end]))
+			nRows += end - start
+
+	if len(pending) > 0:
+		yield chrom, getTrackFromChunks(pending, rowOffset)
+
+def iterStrandChroms(posFileName, negFileName, chunkSize=1000000,
+					 prefetchDepth=0, weights=None):
+	""" Reads in the + and - strand bedGraphs together one chromosome at a \
+	time. The - strand counts are made positive.
+
+	Assumes the chromosomes are in the same order in both bedGraphs; where a \
+	chromosome is missing from one strand it is given with no rows, once \
+	that strand has read a chromosome the other strand has after it; see \
+	replicatePooling.iterAlignedChroms.
+
+	Args:
+		posFileName (str or list<str>): + strand bedGraph, as in readTrack, \
+						or the bedGraphs of replicates to pool; see \
+						replicatePooling.
+
+		negFileName (str or list<str>): As for posFileName, except the - \
+										strand.
+
+		chunkSize (int): As in iterChroms.
+
+		prefetchDepth (int): Where above 0, each strand is read in a \
+						background thread up to this many chromosomes ahead, \
+						see iterPrefetched.
+
+		weights (list<float>): Weight of each replicate, where pooling \
+							   replicates; see replicatePooling.mergeIntervals.
+
+	Yields:
+		str, bedGraphTrack.BedGraphTrack, bedGraphTrack.BedGraphTrack: The \
+						chromosome name, and the rows on that chromosome for \
+						the + and - strand as output by iterChroms.
+	"""
+	yield from pairStrandChroms(
+			iterPrefetched(iterStrandSource(posFileName, False, chunkSize,
+											weights), prefetchDepth),
+			iterPrefetched(iterStrandSource(negFileName, True, chunkSize,
+											weights), prefetchDepth))
+
+def iterStrandSource(fileName, absCounts=False, chunkSize=1000000,
+					 weights=None):
+	""" Reads a strand one chromosome at a time as iterChroms, from a \
+	bedGraph or by pooling the bedGraphs of replicates.
+
+	Args:
+		fileName (str or list<str>): As posFileName in iterStrandChroms.
+
+		absCounts, chunkSize: As in iterChroms.
+
+		weights (list<float>): As in iterStrandChroms.
+	"""
+	if isinstance(fileName, str):
+		return iterChroms(fileName, absCounts, chunkSize)
+
+	from simplenexuscaller import replicatePooling
+	return replicatePooling.iterPooledChroms(fileName, absCounts, weights,
+											 chunkSize)
+
+def iterPrefetched(items, depth=1):
+	""" Iterates items in a background thread, reading up to depth items \
+	ahead of the consumer, such as to read the next chromosome of a bedGraph \
+	while the current one is called. Parsing in pandas and decompression \
+	release the GIL, so reading overlaps with the calling.
+
+	Args:
+		items (iterable): Items to read, such as from iterChroms.
+
+		depth (int): No. of items which may be queued for the consumer, \
+					 with one more being read. 0 to read the items in the \
+					 consumer's thread.
+
+	Yields:
+		object: The items, in order. Errors reading the items are raised \
+				in the consumer's thread.
+	"""
+	if depth <= 0:
+		yield from items
+		return
+
+	itemQueue = queue.Queue(depth)
+	stop = threading.Event() # Set once the consumer stops iterating
+	end = object()
+
+	def put(item):
+		while not stop.is_set():
+			try:
+				itemQueue.put(item, timeout=0.1)
+				return True
+			except queue.Full:
+				continue
+
+		return False
+
+	def read():
+		try:
+			for item in items:
+				if not put((item, None)):
+					return
+			put((end, None))
+		except BaseException as error:
+			put((end, error))
+
+	reader = threading.Thread(target=read, daemon=True)
+	reader.start()
+	try:
+		while True:
+			item, error = itemQueue.get()
+			if error is not None:
+				raise error
+			if item is end:
+				return
+			yield item
+	finally:
+		stop.set()
+		reader.join()
+
+def pairStrandChroms(posChroms, negChroms):
+	""" Pairs the chromosomes of the + and - strand, as in iterStrandChroms.
+
+	Args:
+		posChroms (iterable<tuple<str, bedGraphTrack.BedGraphTrack>>): The \
+						chromosomes of the + strand, as output by iterChroms.
+
+		negChroms (iterable<tuple<str, bedGraphTrack.BedGraphTrack>>): As for \
+						posChroms, except the - strand.
+
+	Yields:
+		str, bedGraphTrack.BedGraphTrack, bedGraphTrack.BedGraphTrack: As in \
+						iterStrandChroms.
+	"""
+	from simplenexuscaller import replicatePooling
+
+	# A chromosome missing from one strand is only yielded once the strand
+	# has passed it, so chromosomes read ahead stay in genome order
+	for chrom, tracks in replicatePooling.iterAlignedChroms([posChroms,
+															 negChroms]):
+		yield (chrom, *[bedGraphTrack.getEmptyTrack() if track is None
+						else track for track in tracks])
@@ -0,0 +1,260 @@
+""" A compact columnar representation of a bedGraph track, which the peak
+calling stages consume directly.
+
+Rather than a pandas.DataFrame with a Python string per row for the
+chromosome and int64 columns, chromosomes are stored as integer codes with a
+table of the first row of each chromosome, coordinates as int32 and counts as
+uint32 (or float32 for non-integer counts).
+"""
+
+import numpy
+
+def getCoordArray(coords):
+	""" Converts coordinates to int32, or int64 if they do not fit.
+	"""
+	coords = numpy.asarray(coords)
+	if len(coords) == 0 or coords.max() <= numpy.iinfo(numpy.int32).max:
+		return coords.astype(numpy.int32, copy=False)
+
+	return coords.astype(numpy.int64, copy=False)
+
+def getCountArray(counts, absCounts=False):
+	""" Converts counts to uint32 where they are non-negative integers, int32 \
+	for other integers, or float32.
+
+	Args:
+		counts (numpy.array): Counts of a bedGraph.
+
+		absCounts (bool): Whether to take the absolute value of the counts.
+	"""
+	counts = numpy.asarray(counts)
+	if absCounts:
+		counts = numpy.abs(counts)
+
+	if counts.dtype.kind == 'f':
+		if not numpy.all(numpy.mod(counts, 1) == 0):
+			return counts.astype(numpy.float32)
+
+	if len(counts) == 0 or counts.min() >= 0:
+		return counts.astype(numpy.uint32)
+
+	return counts.astype(numpy.int32)
+
+def getCommonCountArrays(countArrays):
+	""" Converts count arrays from getCountArray to a common type, such that \
+	they can be concatenated without being promoted to 64 bits.
+	"""
+	dtypes = set(counts.dtype for counts in countArrays)
+	if len(dtypes) <= 1:
+		return countArrays
+
+	if numpy.dtype(numpy.float32) in dtypes:
+		commonType = numpy.float32
+	else:
+		commonType = numpy.int32
+
+	return [counts.astype(commonType) for counts in countArrays]
+
+class BedGraphTrack(object):
+	""" Columns of a bedGraph sorted by chromosome, stored as arrays.
+
+	Construction is by contract, no error checking; see getTrackFromFrame and \
+	getTrackFromBlocks for constructing from other formats.
+	"""
+
+	def __init__(self, chromNames, chromOffsets, starts, ends, counts,
+				 rowOffset=0, chroms=None, fileRows=None):
+		""" BedGraphTrack object constructor.
+
+			Args:
+				chromNames (list<str>): Chromosome name of each code.
+
+				chromOffsets (numpy.array<int>): First row of each chromosome, \
+									followed by the number of rows; such that \
+									rows chromOffsets[i]:chromOffsets[i+1] are \
+									on chromosome chromNames[i].
+
+				starts (numpy.array<int>): Start of each position.
+
+				ends (numpy.array<int>): End of each position.
+
+				counts (numpy.array<int>): Counts of each position.
+
+				rowOffset (int): Row in the full bedGraph of the first row, \
+								 where the track is part of a larger bedGraph.
+
+				chroms (numpy.array<int>): Chromosome code of each position; \
+										   derived from chromOffsets if not \
+										   given.
+
+				fileRows (numpy.array<int>): Row in the full bedGraph of each \
+								position, where the positions are not \
+								consecutive rows of it, such as after keeping \
+								only the rows near regions. None where row i \
+								is rowOffset + i.
+		"""
+		self.chromNames = chromNames
+		self.chromOffsets = numpy.asarray(chromOffsets, dtype=numpy.int64)
+		self.starts = starts
+		self.ends = ends
+		self.counts = counts
+		self.rowOffset = rowOffset
+
+		if chroms is None:
+			codeType = numpy.int16 if len(chromNames) < 2**15 else numpy.int32
+			chroms = numpy.repeat(numpy.arange(len(chromNames), dtype=codeType),
+								  numpy.diff(self.chromOffsets))
+		self.chroms = chroms
+		self.fileRows = fileRows
+
+	def __len__(self):
+		return len(self.starts)
+
+	@property
+	def posLens(self):
+		""" Length of each position.
+		"""
+		return self.ends - self.starts
+
+	@property
+	def nbytes(self):
+		""" Memory used by the columns.
+		"""
+		return self.chroms.nbytes + self.starts.nbytes + self.ends.nbytes + \
+			   self.counts.nbytes + self.chromOffsets.nbytes
+
+	def getBedArrays(self):
+		""" Gets the columns in the format consumed by the calling stages.
+
+		Returns:
+			numpy.array<int>, list<str>, numpy.array<int>, numpy.array<int>, \
+			numpy.array<int>: The chromosome codes and the chromosome name of \
+							  each code, followed by the starts, ends and counts.
+		"""
+		return self.chroms, self.chromNames, self.starts, self.ends, \
+			   self.counts
+
+	def getFileRows(self, rows):
+		""" Gets the rows in the full bedGraph of rows of the track, \
+			numbered from rowOffset as in the output of the calling stages.
+		"""
+		if self.fileRows is None:
+			return rows
+
+		return self.fileRows[numpy.asarray(rows) - self.rowOffset]
+
+	def getRows(self, startRow, endRow):
+		""" Gets a track of rows startRow:endRow, which shares the arrays and \
+			chromosome codes of this track rather than copying them.
+		"""
+		chromOffsets = numpy.clip(self.chromOffsets - startRow, 0,
+								  endRow - startRow)
+		return BedGraphTrack(self.chromNames, chromOffsets,
+							 self.starts[startRow:endRow],
+							 self.ends[startRow:endRow],
+							 self.counts[startRow:endRow],
+							 rowOffset=self.rowOffset + startRow,
+							 chroms=self.chroms[startRow:endRow],
+							 fileRows=None if self.fileRows is None else
+									  self.fileRows[startRow:endRow])
+
+	def getChrom(self, chrom):
+		""" Gets the rows on a chromosome as a track, see getRows.
+		"""
+		if chrom not in self.chromNames:
+			return self.getRows(0, 0)
+
+		code = self.chromNames.index(chrom)
+		return self.getRows(self.chromOffsets[code],
+							self.chromOffsets[code + 1])
+
+	def iterChroms(self):
+		""" Yields the name and track of each chromosome with rows, in order.
+		"""
+		for code, chrom in enumerate(self.chromNames):
+			if self.chromOffsets[code + 1] > self.chromOffsets[code]:
+				yield chrom, self.getRows(self.chromOffsets[code],
+										  self.chromOffsets[code + 1])
+
+	def toFrame(self):
+		""" Returns the track as a bedGraph pandas.DataFrame with columns \
+			[chr, start, end, count], indexed by row in the full bedGraph.
+		"""
+		import pandas
+
+		chromNames = numpy.array(self.chromNames, dtype=object)
+		return pandas.DataFrame({'chr': chromNames[self.chroms],
+								 'start': self.starts, 'end': self.ends,
+								 'count': self.counts},
+								index=numpy.arange(len(self)) + self.rowOffset)
+
+def getTrackFromBlocks(blockNames, blockLens, starts, ends, counts,
+					   rowOffset=0, fileRows=None):
+	""" Constructs a track from runs of rows on the same chromosome.
+
+	Args:
+		blockNames (list<str>): Chromosome of each run of rows.
+
+		blockLens (list<int>): No. of rows in each run.
+
+		starts, ends, counts (numpy.array<int>): Columns of the bedGraph.
+
+		rowOffset, fileRows: As in BedGraphTrack.
+
+	Returns:
+		BedGraphTrack: The track, where neighbouring runs on the same \
+					   chromosome are joined.
+	"""
+	chromNames, chromLens = [], []
+	for chrom, blockLen in zip(blockNames, blockLens):
+		if len(chromNames) > 0 and chromNames[-1] == chrom:
+			chromLens[-1] += blockLen
+			continue
+
+		chromNames.append(chrom)
+		chromLens.append(blockLen)
+
+	if len(set(chromNames)) != len(chromNames):
+		raise ValueError("bedGraph must be sorted by chromosome, but found a "
+						 "chromosome after another chromosome.")
+
+	chromOffsets = numpy.concatenate(([0], numpy.cumsum(chromLens,
+														dtype=numpy.int64)))
+	return BedGraphTrack(chromNames, chromOffsets, getCoordArray(starts),
+						 getCoordArray(ends), counts, rowOffset=rowOffset,
+						 fileRows=fileRows)
+
+def getTrackFromFrame(bedFrame, absCounts=False, rowOffset=0):
+	""" Constructs a track from a bedGraph pandas.DataFrame.
+
+	Args:
+		bedFrame (pandas.DataFrame): Colnames are [chr, start, end, count], \
+									 sorted by chromosome.
+
+		absCounts (bool): As in getCountArray.
+
+		rowOffset (int): As in BedGraphTrack.
+
+	Returns:
+		BedGraphTrack: The bedGraph as a track.
+	"""
+	chroms = bedFrame.iloc[:, 0].to_numpy()
+	blockStarts = numpy.flatnonzero(numpy.concatenate(([True],
+												 chroms[1:] != chroms[:-1])))
+	if len(chroms) == 0:
+		blockStarts = blockStarts[:0]
+	blockLens = numpy.diff(numpy.concatenate((blockStarts, [len(chroms)])))
+
+	return getTrackFromBlocks(chroms[blockStarts].tolist(), blockLens,
+							  bedFrame.iloc[:, 1].to_numpy(),
+							  bedFrame.iloc[:, 2].to_numpy(),
+							  getCountArray(bedFrame.iloc[:, 3].to_numpy(),
+											absCounts),
+							  rowOffset=rowOffset)
+
+def getEmptyTrack():
+	""" Returns a track with no rows, for a chromosome missing on a strand.
+	"""
+	return BedGraphTrack([], [0], numpy.zeros(0, dtype=numpy.int32),
+						 numpy.zeros(0, dtype=numpy.int32),
+						 numpy.zeros(0, dtype=numpy.uint32))
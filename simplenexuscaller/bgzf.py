@@ -0,0 +1,446 @@
+""" Reading of BGZF compressed bedGraphs, with an index of the chromosomes and
+positions for reading only part of a bedGraph.
+
+BGZF (as written by bgzip) is a series of gzip members each holding up to
+64KB of the text, with the compressed size of each member in its header. The
+members can therefore be found without decompressing, and are decompressed in
+parallel with a thread pool; zlib releases the GIL while decompressing.
+
+The index, written by buildIndex to {bedGraph}.sni, records the compressed
+and uncompressed offset of each member, the uncompressed range of the lines
+of each chromosome, and the chromosome, start and offset of the first line
+starting in each member; like the linear index of tabix. The lines of a
+chromosome or region are then read by decompressing only the members which
+hold them.
+"""
+
+import io, os, struct, zlib
+import numpy
+from concurrent.futures import ThreadPoolExecutor
+from simplenexuscaller import binaryCache
+
+indexSuffix = '.sni'
+indexVersion = 2
+headerSize = 18
+maxBlockData = 65280 # Uncompressed bytes per member, as written by bgzip
+eofBlock = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+defaultThreads = os.cpu_count() or 1
+
+def getBlockSize(header):
+	""" Gets the size of a BGZF member from its header, or None where the \
+	header is not of a BGZF member.
+	"""
+	if len(header) < headerSize or header[:4] != b'\x1f\x8b\x08\x04':
+		return None
+
+	xlen = struct.unpack('<H', header[10:12])[0]
+	extra = header[12:12 + xlen]
+	while len(extra) >= 4:
+		subfieldLen = struct.unpack('<H', extra[2:4])[0]
+		if extra[:2] == b'BC' and subfieldLen == 2:
+			return struct.unpack('<H', extra[4:6])[0] + 1
+		extra = extra[4 + subfieldLen:]
+
+	return None
+
+def isBgzf(fileName):
+	""" Whether a file is BGZF compressed.
+	"""
+	if not os.path.isfile(fileName):
+		return False
+
+	with open(fileName, 'rb') as bgzfFile:
+		return getBlockSize(bgzfFile.read(headerSize)) is not None
+
+def iterBlocks(bgzfFile):
+	""" Yields the compressed members of an open BGZF file.
+	"""
+	while True:
+		header = bgzfFile.read(headerSize)
+		if len(header) == 0:
+			return
+
+		blockSize = getBlockSize(header)
+		if blockSize is None:
+			raise ValueError(f"{bgzfFile.name} is not BGZF compressed, or is "
+							 f"truncated.")
+		yield header + bgzfFile.read(blockSize - headerSize)
+
+def inflateBlock(block):
+	""" Decompresses a BGZF member.
+	"""
+	xlen = struct.unpack('<H', block[10:12])[0]
+	return zlib.decompress(block[12 + xlen:-8], -15)
+
+def inflateBlocks(blocks, pool):
+	""" Decompresses BGZF members in parallel, joining the text.
+	"""
+	return b''.join(pool.map(inflateBlock, blocks))
+
+def deflateBlock(data, level=6):
+	""" Compresses up to maxBlockData bytes as a BGZF member.
+	"""
+	compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+	compressed = compressor.compress(data) + compressor.flush()
+	header = b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00' + \
+			 struct.pack('<H', len(compressed) + 25)
+
+	return header + compressed + struct.pack('<II', zlib.crc32(data),
+											 len(data))
+
+class BgzfWriter(object):
+	""" Writes BGZF, compressing the members in parallel as the data of \
+	enough members is buffered.
+	"""
+
+	def __init__(self, fileName, threads=None, bufferBlocks=256):
+		""" BgzfWriter object constructor, which opens the file.
+
+			Args:
+				fileName (str): File to write to.
+
+				threads (int): No. of threads to compress with.
+
+				bufferBlocks (int): No. of members of data to buffer before \
+									compressing them.
+		"""
+		self.outFile = open(fileName, 'wb')
+		self.pool = ThreadPoolExecutor(threads or defaultThreads)
+		self.bufferBytes = maxBlockData * bufferBlocks
+		self.buffer = []
+		self.nBuffered = 0
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *excInfo):
+		self.close()
+
+	def write(self, data):
+		self.buffer.append(data)
+		self.nBuffered += len(data)
+		if self.nBuffered >= self.bufferBytes:
+			self.flush()
+
+	def flush(self):
+		""" Compresses and writes the buffered data.
+		"""
+		data = b''.join(self.buffer)
+		self.buffer, self.nBuffered = [], 0
+		self.outFile.write(b''.join(self.pool.map(
+							deflateBlock,
+							[data[start:start + maxBlockData] for start in
+							 range(0, len(data), maxBlockData)])))
+
+	def close(self):
+		if self.outFile.closed:
+			return
+		self.flush()
+		self.outFile.write(eofBlock)
+		self.outFile.close()
+		self.pool.shutdown()
+
+def writeBgzf(fileName, outFileName, threads=None):
+	""" Compresses a text or gzip file to BGZF, as bgzip does.
+	"""
+	import gzip
+
+	opener = gzip.open if isGzip(fileName) else open
+	with opener(fileName, 'rb') as inFile, \
+		 BgzfWriter(outFileName, threads) as outFile:
+		while True:
+			data = inFile.read(maxBlockData * 256)
+			if len(data) == 0:
+				break
+			outFile.write(data)
+
+def isGzip(fileName):
+	""" Whether a file is gzip compressed, including BGZF.
+	"""
+	with open(fileName, 'rb') as inFile:
+		return inFile.read(2) == b'\x1f\x8b'
+
+def iterTextChunks(fileName, chunkBytes=32000000, threads=None):
+	""" Reads a BGZF file as chunks of whole lines, decompressing the members \
+	of each chunk in parallel.
+
+	Args:
+		fileName (str): BGZF compressed file.
+
+		chunkBytes (int): Approximate no. of uncompressed bytes per chunk.
+
+		threads (int): No. of threads to decompress with.
+
+	Yields:
+		int, bytes: The uncompressed offset of the chunk, and its lines.
+	"""
+	blocksPerChunk = max(chunkBytes // maxBlockData, 1)
+	carry, offset = b'', 0
+	with open(fileName, 'rb') as bgzfFile, \
+		 ThreadPoolExecutor(threads or defaultThreads) as pool:
+		blocks = iterBlocks(bgzfFile)
+		while True:
+			chunkBlocks = [block for _, block in zip(range(blocksPerChunk),
+													 blocks)]
+			if len(chunkBlocks) == 0:
+				break
+
+			text = carry + inflateBlocks(chunkBlocks, pool)
+			lastLine = text.rfind(b'\n') + 1
+			if lastLine > 0:
+				yield offset, text[:lastLine]
+				carry, offset = text[lastLine:], offset + lastLine
+			else:
+				carry = text
+
+	if len(carry) > 0:
+		yield offset, carry
+
+def getLineOffsets(text):
+	""" Gets the offset of each line of text.
+	"""
+	newlines = numpy.flatnonzero(numpy.frombuffer(text, dtype=numpy.uint8) ==
+								 ord('\n'))
+	lineOffsets = numpy.concatenate(([0], newlines + 1))
+
+	return lineOffsets[lineOffsets < len(text)]
+
+class BgzfIndex(object):
+	""" The index of a BGZF bedGraph, as written by buildIndex.
+
+	Construction is by contract, no error checking.
+	"""
+
+	def __init__(self, blockOffsets, blockStarts, chromNames, chromStarts,
+				 chromEnds, lineOffsets, lineChroms, lineStarts, chromRows,
+				 lineRows):
+		""" BgzfIndex object constructor.
+
+			Args:
+				blockOffsets (numpy.array<int>): Offset of each member in the \
+												 file, followed by the file size.
+
+				blockStarts (numpy.array<int>): Uncompressed offset of each \
+								member, followed by the uncompressed size.
+
+				chromNames (list<str>): Chromosomes, in the order of the file.
+
+				chromStarts (numpy.array<int>): Uncompressed offset of the \
+												first line of each chromosome.
+
+				chromEnds (numpy.array<int>): Uncompressed offset of the end \
+											  of the last line of each chromosome.
+
+				lineOffsets (numpy.array<int>): Uncompressed offset of the first \
+								line starting in each member, or -1 where no \
+								line starts in the member.
+
+				lineChroms (numpy.array<int>): Chromosome index of each of \
+											   those lines.
+
+				lineStarts (numpy.array<int>): Start of each of those lines.
+
+				chromRows (numpy.array<int>): Row in the bedGraph of the first \
+											  line of each chromosome.
+
+				lineRows (numpy.array<int>): Row in the bedGraph of the first \
+											 line starting in each member, or \
+											 -1 where no line starts in it.
+		"""
+		self.blockOffsets = blockOffsets
+		self.blockStarts = blockStarts
+		self.chromNames = chromNames
+		self.chromStarts = chromStarts
+		self.chromEnds = chromEnds
+		self.lineOffsets = lineOffsets
+		self.lineChroms = lineChroms
+		self.lineStarts = lineStarts
+		self.chromRows = chromRows
+		self.lineRows = lineRows
+
+		# Members whose first line is on each chromosome, found when first used
+		self.chromLines = {}
+
+	def getChromRange(self, chrom):
+		""" Gets the uncompressed range of the lines of a chromosome, or None \
+		where the chromosome has no lines.
+		"""
+		if chrom not in self.chromNames:
+			return None
+
+		chromi = self.chromNames.index(chrom)
+		return int(self.chromStarts[chromi]), int(self.chromEnds[chromi])
+
+	def getRegionRange(self, chrom, start, end):
+		""" Gets an uncompressed range holding every line of a chromosome \
+		overlapping [start, end), or None where the chromosome has no lines. \
+		Lines are assumed sorted by start; the range can hold other lines.
+		"""
+		chromRange = self.getChromRange(chrom)
+		if chromRange is None:
+			return None
+
+		chromi = self.chromNames.index(chrom)
+		if chromi not in self.chromLines:
+			self.chromLines[chromi] = numpy.flatnonzero(
+						(self.lineChroms == chromi) & (self.lineOffsets >= 0))
+		onChrom = self.chromLines[chromi]
+		starts = self.lineStarts[onChrom]
+		before = numpy.searchsorted(starts, start, 'right') - 1
+		after = numpy.searchsorted(starts, end, 'left')
+		rangeStart = int(self.lineOffsets[onChrom[before]]) if before >= 0 \
+					 else chromRange[0]
+		rangeEnd = int(self.lineOffsets[onChrom[after]]) \
+				   if after < len(onChrom) else chromRange[1]
+
+		return rangeStart, rangeEnd
+
+	def getRangeRow(self, start):
+		""" Gets the row in the bedGraph of the line at the start of a range \
+		from getChromRange or getRegionRange.
+		"""
+		chromi = numpy.flatnonzero(self.chromStarts == start)
+		if len(chromi) > 0:
+			return int(self.chromRows[chromi[0]])
+
+		return int(self.lineRows[numpy.flatnonzero(self.lineOffsets ==
+												   start)[0]])
+
+	def readRange(self, fileName, start, end, pool):
+		""" Reads the uncompressed bytes [start, end) of a BGZF file, \
+		decompressing only the members holding them, in parallel.
+		"""
+		if end <= start:
+			return b''
+
+		firstBlock = numpy.searchsorted(self.blockStarts, start, 'right') - 1
+		lastBlock = numpy.searchsorted(self.blockStarts, end, 'left')
+		blockOffsets = self.blockOffsets[firstBlock:lastBlock + 1]
+		with open(fileName, 'rb') as bgzfFile:
+			bgzfFile.seek(blockOffsets[0])
+			data = bgzfFile.read(blockOffsets[-1] - blockOffsets[0])
+		blockOffsets = blockOffsets - blockOffsets[0]
+		blocks = [data[blockStart:blockEnd] for blockStart, blockEnd in
+				  zip(blockOffsets[:-1], blockOffsets[1:])]
+
+		text = inflateBlocks(blocks, pool)
+		textStart = start - self.blockStarts[firstBlock]
+		return text[textStart:textStart + end - start]
+
+def buildIndex(fileName, threads=None, chunkBytes=32000000):
+	""" Indexes a BGZF bedGraph sorted by chromosome and start, writing the \
+	index to {fileName}.sni.
+
+	Returns:
+		BgzfIndex: The index.
+	"""
+	import pandas
+
+	blockOffsets, blockSizes = [0], []
+	with open(fileName, 'rb') as bgzfFile:
+		for block in iterBlocks(bgzfFile):
+			blockOffsets.append(blockOffsets[-1] + len(block))
+			blockSizes.append(struct.unpack('<I', block[-4:])[0])
+	blockOffsets = numpy.array(blockOffsets, dtype=numpy.int64)
+	blockStarts = numpy.concatenate(([0], numpy.cumsum(blockSizes,
+													   dtype=numpy.int64)))
+
+	# Chromosome, start, offset and row of every line, one chunk at a time
+	chromNames, chromStarts, chromEnds, chromRows = [], [], [], []
+	firstLines = [] # The same for the first line of each member
+	chunkRow = 0 # Row of the first line of the chunk
+	for offset, text in iterTextChunks(fileName, chunkBytes, threads):
+		lines = pandas.read_csv(io.BytesIO(text), sep='\t', header=None,
+								usecols=[0, 1], dtype={0: str})
+		lineOffsets = offset + getLineOffsets(text)
+		chroms = lines.iloc[:, 0].to_numpy()
+		starts = lines.iloc[:, 1].to_numpy()
+		changes = numpy.flatnonzero(numpy.concatenate(
+						([True], chroms[1:] != chroms[:-1])))
+		changeChroms = []
+		for change in changes:
+			chrom = chroms[change]
+			if len(chromNames) == 0 or chromNames[-1] != chrom:
+				if chrom in chromNames:
+					raise ValueError("bedGraph must be sorted by chromosome, "
+									 "but found a chromosome after another "
+									 "chromosome.")
+				if len(chromNames) > 0:
+					chromEnds.append(int(lineOffsets[change]))
+				chromNames.append(chrom)
+				chromStarts.append(int(lineOffsets[change]))
+				chromRows.append(chunkRow + int(change))
+			changeChroms.append(len(chromNames) - 1)
+		lineChroms = numpy.array(changeChroms, dtype=numpy.int64)[
+						numpy.searchsorted(changes, numpy.arange(len(chroms)),
+										   'right') - 1]
+
+		# Members whose first line starts in this chunk
+		blockis = numpy.flatnonzero((blockStarts[:-1] >= offset) &
+									(blockStarts[:-1] < offset + len(text)))
+		for blocki, line in zip(blockis, numpy.searchsorted(
+										lineOffsets, blockStarts[blockis])):
+			if line < len(lineOffsets):
+				firstLines.append((blocki, int(lineOffsets[line]),
+								   int(lineChroms[line]), int(starts[line]),
+								   chunkRow + int(line)))
+		chunkRow += len(lines)
+	if len(chromNames) > 0:
+		chromEnds.append(int(blockStarts[-1]))
+
+	lineOffsets = numpy.full(len(blockSizes), -1, dtype=numpy.int64)
+	lineChroms = numpy.full(len(blockSizes), -1, dtype=numpy.int64)
+	lineStarts = numpy.full(len(blockSizes), -1, dtype=numpy.int64)
+	lineRows = numpy.full(len(blockSizes), -1, dtype=numpy.int64)
+	for blocki, lineOffset, chromi, start, row in firstLines: # Others are -1
+		lineOffsets[blocki], lineChroms[blocki], lineStarts[blocki], \
+			lineRows[blocki] = lineOffset, chromi, start, row
+
+	index = BgzfIndex(blockOffsets, blockStarts, chromNames,
+					  numpy.array(chromStarts, dtype=numpy.int64),
+					  numpy.array(chromEnds, dtype=numpy.int64),
+					  lineOffsets, lineChroms, lineStarts,
+					  numpy.array(chromRows, dtype=numpy.int64), lineRows)
+	writeIndex(index, fileName)
+
+	return index
+
+def writeIndex(index, fileName):
+	""" Writes an index to {fileName}.sni, with the size and modification \
+	time of the file so an out of date index is not used.
+	"""
+	source = binaryCache.getSourceStat(fileName)
+	with open(fileName + indexSuffix, 'wb') as indexFile:
+		numpy.savez(indexFile, version=indexVersion,
+					sourceSize=source['size'], sourceMtime=source['mtime_ns'],
+					blockOffsets=index.blockOffsets,
+					blockStarts=index.blockStarts,
+					chromNames=numpy.array(index.chromNames, dtype=str),
+					chromStarts=index.chromStarts, chromEnds=index.chromEnds,
+					lineOffsets=index.lineOffsets, lineChroms=index.lineChroms,
+					lineStarts=index.lineStarts, chromRows=index.chromRows,
+					lineRows=index.lineRows)
+
+def readIndex(fileName):
+	""" Reads the index of a BGZF bedGraph.
+
+	Returns:
+		BgzfIndex: The index, or None where the file has no index, or it was \
+				   built from a different version of the file.
+	"""
+	indexFileName = fileName + indexSuffix
+	if not os.path.isfile(indexFileName) or not os.path.isfile(fileName):
+		return None
+
+	with numpy.load(indexFileName) as index:
+		source = binaryCache.getSourceStat(fileName)
+		if int(index['version']) != indexVersion or \
+		   int(index['sourceSize']) != source['size'] or \
+		   int(index['sourceMtime']) != source['mtime_ns']:
+			return None
+
+		return BgzfIndex(index['blockOffsets'], index['blockStarts'],
+						 index['chromNames'].tolist(), index['chromStarts'],
+						 index['chromEnds'], index['lineOffsets'],
+						 index['lineChroms'], index['lineStarts'],
+						 index['chromRows'], index['lineRows'])
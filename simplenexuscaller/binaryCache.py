@@ -0,0 +1,149 @@
+""" An on-disk binary cache of a converted bedGraph, which is memory-mapped
+rather than parsed when calling peaks.
+
+A cache is a directory holding each column of a bedGraphTrack.BedGraphTrack
+as a .npy file, and an index.json with the chromosome names, the first row of
+each chromosome, and the size and modification time of the bedGraph it was
+converted from. Loading a cache maps the columns with numpy.load(mmap_mode='r'),
+so startup does not depend on the size of the bedGraph and concurrent runs on
+the same cache share the columns through the page cache.
+"""
+
+import json, os, shutil
+import numpy
+from simplenexuscaller import bedGraphTrack
+
+cacheSuffix = '.snc'
+cacheVersion = 1
+columnNames = ['chroms', 'starts', 'ends', 'counts']
+
+def getDefaultCachePath(fileName):
+	""" Gets the path of the cache of a bedGraph, next to the bedGraph.
+	"""
+	return fileName + cacheSuffix
+
+def getSourceStat(fileName):
+	""" Gets the size and modification time of a bedGraph, used to detect a \
+	cache which is out of date.
+	"""
+	stat = os.stat(fileName)
+	return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def readCacheIndex(cacheDir):
+	""" Reads the index.json of a cache, or returns None if cacheDir is not a \
+	cache of this version.
+	"""
+	indexFileName = os.path.join(cacheDir, 'index.json')
+	if not os.path.isfile(indexFileName):
+		return None
+
+	with open(indexFileName) as indexFile:
+		index = json.load(indexFile)
+	if index.get('version') != cacheVersion:
+		return None
+
+	return index
+
+def isTrackCache(path):
+	""" Whether path is a cache directory written by writeTrackCache.
+	"""
+	return os.path.isdir(path) and readCacheIndex(path) is not None
+
+def writeTrackCache(track, cacheDir, source=None, absCounts=False):
+	""" Writes a track to a cache directory.
+
+	The cache is written to a temporary directory which is then renamed, so \
+	runs reading the cache never see a partly written cache.
+
+	Args:
+		track (bedGraphTrack.BedGraphTrack): The track to write.
+
+		cacheDir (str): Directory to write the cache to; replaced if it exists.
+
+		source (str): The bedGraph the track was read from, recorded so that \
+					  getCachePath can tell if the cache is out of date.
+
+		absCounts (bool): Whether the absolute value of the counts was taken, \
+						  as in bedGraphReader.readBedGraph.
+	"""
+	index = {'version': cacheVersion,
+			 'chromNames': list(track.chromNames),
+			 'chromOffsets': [int(offset) for offset in track.chromOffsets],
+			 'nRows': len(track),
+			 'absCounts': bool(absCounts),
+			 'source': None}
+	if source is not None:
+		index['source'] = {'fileName': os.path.abspath(source),
+						   **getSourceStat(source)}
+
+	tmpDir = f'{cacheDir}.tmp{os.getpid()}'
+	if os.path.exists(tmpDir):
+		shutil.rmtree(tmpDir)
+	os.makedirs(tmpDir)
+
+	columns = dict(zip(columnNames, [track.chroms, track.starts, track.ends,
+									 track.counts]))
+	for name, column in columns.items():
+		numpy.save(os.path.join(tmpDir, f'{name}.npy'),
+				   numpy.ascontiguousarray(column))
+	with open(os.path.join(tmpDir, 'index.json'), 'w') as indexFile:
+		json.dump(index, indexFile)
+
+	if os.path.exists(cacheDir):
+		shutil.rmtree(cacheDir)
+	os.rename(tmpDir, cacheDir)
+
+def readTrackCache(cacheDir, absCounts=False):
+	""" Memory-maps a cache written by writeTrackCache as a track.
+
+	Args:
+		cacheDir (str): The cache directory.
+
+		absCounts (bool): Whether to take the absolute value of the counts; \
+						  only copies the counts where the cache has negative \
+						  counts.
+
+	Returns:
+		bedGraphTrack.BedGraphTrack: The track, with read-only columns mapped \
+									 from the cache files.
+	"""
+	index = readCacheIndex(cacheDir)
+	columns = {name: numpy.load(os.path.join(cacheDir, f'{name}.npy'),
+								mmap_mode='r')
+			   for name in columnNames}
+
+	counts = columns['counts']
+	if absCounts and counts.dtype.kind != 'u':
+		counts = bedGraphTrack.getCountArray(counts, absCounts=True)
+
+	return bedGraphTrack.BedGraphTrack(index['chromNames'],
+									   numpy.array(index['chromOffsets'],
+												   dtype=numpy.int64),
+									   columns['starts'], columns['ends'],
+									   counts, chroms=columns['chroms'])
+
+def getCachePath(fileName):
+	""" Gets the cache to load for an input.
+
+	Args:
+		fileName (str): Either a cache directory, or a bedGraph which may have \
+						a cache at getDefaultCachePath(fileName).
+
+	Returns:
+		str: The cache directory, or None if fileName is a bedGraph without a \
+			 cache, or whose cache was converted from a different version of \
+			 the bedGraph.
+	"""
+	if isTrackCache(fileName):
+		return fileName
+
+	cacheDir = getDefaultCachePath(fileName)
+	if not os.path.isfile(fileName) or not isTrackCache(cacheDir):
+		return None
+
+	source = readCacheIndex(cacheDir)['source']
+	if source is None or getSourceStat(fileName) != {
+							'size': source['size'], 'mtime_ns': source['mtime_ns']}:
+		return None
+
+	return cacheDir
@@ -6,9 +6,160 @@ for each signal range.
 It also resolves 'dual' boundaries, which are cases where two signal ranges \
 occur very close to one another, indicating they are not likely different \
 boundaries or are quite possibly two different boundaries.
+
+The functions on pandas frames are wrappers of those on arrays, such that \
+pandas is only imported when they are used.
 """
 
-import numpy, pandas
+import numpy
+
+def getChromCodes(chroms):
+	""" Encodes the chromosome of each position as an integer code.
+
+	Args:
+		chroms ( numpy.array<str> ): Chromosome of each position, with the \
+									positions of a chromosome in a row.
+
+	Returns:
+		numpy.array<int>, list<str>: Code of each position, and the chromosome \
+									 name of each code in order of appearance.
+	"""
+
+	chroms = numpy.asarray(chroms)
+	if len(chroms) == 0:
+		return numpy.zeros(0, dtype=numpy.int32), []
+
+	# Only need to lookup the name of each block of positions on a chromosome
+	blockStarts = numpy.flatnonzero(numpy.concatenate(([True],
+												  chroms[1:] != chroms[:-1])))
+	blockLens = numpy.diff(numpy.concatenate((blockStarts, [len(chroms)])))
+
+	chromNames = []
+	chromIndex = {}
+	blockCodes = []
+	for chrom in chroms[blockStarts].tolist():
+		if chrom not in chromIndex:
+			chromIndex[chrom] = len(chromNames)
+			chromNames.append(chrom)
+		blockCodes.append(chromIndex[chrom])
+
+	codes = numpy.repeat(numpy.array(blockCodes, dtype=numpy.int32), blockLens)
+
+	return codes, chromNames
+
+class Boundaries(object):
+	""" Boundaries stored as arrays rather than as a bed formatted \
+	pandas.DataFrame, so the boundaries can be passed between stages \
+	without building a frame.
+
+	Construction is by contract, no error checking.
+	"""
+
+	def __init__(self, chroms, starts, ends, counts, originIndex, chromNames):
+		""" Boundaries object constructor.
+
+			Args:
+				chroms (numpy.array<int>): Chromosome code of each boundary.
+
+				starts (numpy.array<int>): Start of each boundary.
+
+				ends (numpy.array<int>): End of each boundary.
+
+				counts (numpy.array<int>): Counts at each boundary.
+
+				originIndex (numpy.array<int>): Row index where each boundary \
+											can be found in the bedFrame.
+
+				chromNames (list<str>): Chromosome name of each code.
+		"""
+		self.chroms = chroms
+		self.starts = starts
+		self.ends = ends
+		self.counts = counts
+		self.originIndex = originIndex
+		self.chromNames = chromNames
+
+	def __len__(self):
+		return len(self.starts)
+
+	def subset(self, index):
+		""" Subsets the boundaries to those selected by index, which is \
+			either a boolean mask or array of integer positions.
+		"""
+		return Boundaries(self.chroms[index], self.starts[index],
+						  self.ends[index], self.counts[index],
+						  self.originIndex[index], self.chromNames)
+
+	def toFrame(self):
+		""" Returns boundaries in the format of getBoundaries.
+		"""
+		import pandas
+
+		chromNames = numpy.array(self.chromNames, dtype=object)
+		boundaryFrame = pandas.DataFrame({'chr': chromNames[self.chroms],
+										  'start': self.starts,
+										  'end': self.ends,
+										  'count': self.counts,
+										  'originIndex': self.originIndex},
+										 index=self.originIndex)
+
+		return boundaryFrame
+
+def concatBoundaries(boundariesList, chromNames):
+	""" Concatenates boundaries, such as those called on each chromosome.
+
+	Args:
+		boundariesList ( list<Boundaries> ): Boundaries to concatenate, which \
+											use the chromosome codes of \
+											chromNames.
+
+		chromNames ( list<str> ): Chromosome name of each code.
+
+	Returns:
+		Boundaries: The boundaries in the order of boundariesList.
+	"""
+
+	if len(boundariesList) == 0:
+		empty = numpy.zeros(0, dtype=numpy.int64)
+		return Boundaries(empty.astype(numpy.int32), empty, empty, empty,
+						  empty, chromNames)
+
+	columns = [numpy.concatenate([getattr(boundaries, column)
+								  for boundaries in boundariesList])
+			   for column in ['chroms', 'starts', 'ends', 'counts',
+							  'originIndex']]
+
+	return Boundaries(*columns, chromNames)
+
+def getBoundaryArrays(signalStarts, signalSummits, chroms, chromNames,
+					  starts, ends, counts):
+	""" Gets the boundaries as in getBoundaries, but from the columns of the \
+	bedGraph as arrays.
+
+	Args:
+		signalStarts ( numpy.array<int> ): Row where each signal range starts.
+
+		signalSummits ( numpy.array<int> ): As in getBoundaries.
+
+		chroms ( numpy.array<int> ): Chromosome code of each position, as \
+									 output by getChromCodes.
+
+		chromNames ( list<str> ): Chromosome name of each code.
+
+		starts ( numpy.array<int> ): Start of each position.
+
+		ends ( numpy.array<int> ): End of each position.
+
+		counts ( numpy.array<int> ): Counts of each position.
+
+	Returns:
+		Boundaries: The positions where the summits of the signal ranges occur.
+	"""
+
+	rows = numpy.asarray(signalStarts, dtype=numpy.int64) + signalSummits
+
+	return Boundaries(chroms[rows], starts[rows], ends[rows], counts[rows],
+					  rows, chromNames)
 
 def getBoundaries(signalRanges, signalSummits, bedFrame):
 	""" Gets the positions where the signal range signal is largest, \
@@ -37,16 +188,96 @@ def getBoundaries(signalRanges, signalSummits, bedFrame):
 						where that position can be found in the original bedFrame.
 	"""
 
-	boundaries = []
-	for i, (start, end) in enumerate(signalRanges):
-		boundaries.append(start + signalSummits[i])
+	signalRanges = numpy.asarray(signalRanges, dtype=numpy.int64).reshape(-1, 2)
+	boundaries = signalRanges[:, 0] + numpy.asarray(signalSummits,
+													dtype=numpy.int64)
 
-	boundaryFrame = bedFrame.iloc[boundaries, :]
-	boundaryFrame.loc[:,'originIndex'] = list(boundaryFrame.index)
+	boundaryFrame = bedFrame.iloc[boundaries, :].copy()
+	boundaryFrame['originIndex'] = boundaryFrame.index.to_numpy()
 
 	return boundaryFrame
 
-# TODO impliment the other options.
+def getDualBoundaryMask(chroms, starts, counts, strand, distLimit, method):
+	""" Finds which boundaries are kept when resolving dual boundaries, for \
+	all boundaries in a single pass.
+
+	Neighbouring boundaries on the same chromosome within distLimit of one \
+	another are paired from left to right, such that in a row of several \
+	close boundaries the first is paired with the second, the third with the \
+	fourth, and so on. One boundary of each pair is then removed according \
+	to the method.
+
+	Args:
+		chroms ( numpy.array<int> ): Chromosome code of each boundary.
+
+		starts ( numpy.array<int> ): Start of each boundary, in genome order.
+
+		counts ( numpy.array<int> ): Counts at each boundary.
+
+		strand ( str ): As in resolveDualBoundaries.
+
+		distLimit ( int ): As in resolveDualBoundaries.
+
+		method ( str ): As in resolveDualBoundaries.
+
+	Returns:
+		numpy.array<bool>: Whether each boundary is kept.
+	"""
+
+	if method not in ('largestSignal', 'wide', 'narrow'):
+		raise ValueError(f"Unknown dual boundary method '{method}', expected "
+						 f"one of 'largestSignal', 'wide', 'narrow'.")
+
+	chroms = numpy.asarray(chroms)
+	starts = numpy.asarray(starts)
+	counts = numpy.asarray(counts)
+	keep = numpy.ones(len(starts), dtype=bool)
+	if len(starts) < 2:
+		return keep
+
+	# If two neighbouring boundaries are within a certain range of one another
+	dual = (chroms[1:] == chroms[:-1]) & \
+		   (starts[1:] - starts[:-1] <= distLimit)
+
+	# Pairing every other dual in a row, starting from the first in the row
+	dualIndex = numpy.arange(len(dual))
+	lastNotDual = numpy.maximum.accumulate(numpy.where(dual, -1, dualIndex))
+	pairs = numpy.flatnonzero(dual & ((dualIndex - lastNotDual) % 2 == 1))
+
+	# Whether the first (upstream) boundary of each pair is the one kept
+	if method == 'largestSignal':
+		keepFirst = counts[pairs] >= counts[pairs + 1]
+	else:
+		keepFirst = numpy.full(len(pairs), (method == 'wide') == (strand == '+'))
+
+	keep[pairs[keepFirst] + 1] = False
+	keep[pairs[~keepFirst]] = False
+
+	return keep
+
+def resolveDualBoundaryArrays(boundaries, strand, distLimit, method):
+	""" Resolves dual boundaries as in resolveDualBoundaries, but for \
+	boundaries as output by getBoundaryArrays.
+
+	Args:
+		boundaries ( Boundaries ): Boundaries in genome order.
+
+		strand ( str ): As in resolveDualBoundaries.
+
+		distLimit ( int ): As in resolveDualBoundaries.
+
+		method ( str ): As in resolveDualBoundaries.
+
+	Returns:
+		Boundaries: Same as the boundaries, except any dual boundaries \
+					removed so now only one boundary remains.
+	"""
+
+	keep = getDualBoundaryMask(boundaries.chroms, boundaries.starts,
+							   boundaries.counts, strand, distLimit, method)
+
+	return boundaries.subset(keep)
+
 # TODO consider may represent different binding events from cellular \
 #  heterogeneity in the sample which may result in a slightly different binding \
 #  position.
@@ -57,10 +288,10 @@ def resolveDualBoundaries(boundaries, strand, distLimit, method):
 		1) 'largestSignal' takes the boundary with the largest number of counts.
 
 		2) 'wide' takes the boundary which is 5' most for + strand, and 3' \
-					most for - strand. (Currently not implimented)
+					most for - strand.
 
 		3) 'narrow' takes the boundary which is 3' most for + strand, and 5' \
-					most for - strand. (Currently not implimented)
+					most for - strand.
 
 	Args:
 		boundaries ( pandas.DataFrame ): Bed format, rows are positions \
@@ -81,9 +312,12 @@ def resolveDualBoundaries(boundaries, strand, distLimit, method):
 						  removed so now only one boundary remains.
 	"""
 
-	if method == 'largestSignal':
-		return resolveBoundariesWithSignal(boundaries, distLimit)
+	chroms = getChromCodes(boundaries['chr'].to_numpy())[0]
+	keep = getDualBoundaryMask(chroms, boundaries['start'].to_numpy(),
+							   boundaries['count'].to_numpy(), strand,
+							   distLimit, method)
 
+	return boundaries.loc[keep, :].reset_index(drop=True)
 
 def resolveBoundariesWithSignal(boundaries, distLimit):
 	""" Resolves the occurence of dual boundaries which are neighbouring to \
@@ -103,28 +337,4 @@ def resolveBoundariesWithSignal(boundaries, distLimit):
 						  removed so now only one boundary remains.
 	"""
 
-	# Resolving dual boundaries by taking the one with largest counts
-	boundaryValues = boundaries.values
-	collapsedBoundaries = []
-	rowi = 0
-	while rowi < boundaries.shape[0]-1:
-		pos1 = boundaryValues[rowi, :]
-		pos2 = boundaryValues[rowi + 1, :]
-
-		# If two boundaries are within a certain range from one another
-		chromEqual = pos1[0] == pos2[0] #chromosomes are same
-		withinRange = pos2[1] - pos1[1] <= distLimit
-		if chromEqual and withinRange:
-			posCounts = numpy.array([pos1[2], pos2[2]])
-			maxPos = numpy.where(posCounts == max(posCounts))[0][0]
-			collapsedBoundaries.append( [pos1, pos2][maxPos] ) #add boundary
-			rowi += 2 # skip over the next position
-
-		else:
-			collapsedBoundaries.append( pos1 ) #adding in the boundary
-			rowi += 1 # go to the next position
-
-	collapsedBoundaries = pandas.DataFrame(collapsedBoundaries,
-									  				 columns=boundaries.columns)
-
-	return collapsedBoundaries
+	return resolveDualBoundaries(boundaries, '+', distLimit, 'largestSignal')
@@ -4,17 +4,116 @@ downstream negative strand boundary. Any resulting binding sites (peaks) with
 a distance greater than a particular cutoff are excluded, since these are
 called as being far too long to be reasonably considered a binding site for
 the TF.
+
+The functions on pandas frames are wrappers of those on arrays, such that
+pandas is only imported when they are used.
 """
 
-import numpy, pandas
+import numpy
+from simplenexuscaller import callBoundaries
+
+def matchBoundaries(posChroms, posStarts, negChroms, negStarts, maxWidth=None):
+	""" For each boundary on the + strand, finds the closest downstream \
+	boundary on the - strand on the same chromosome. All + strand boundaries \
+	are matched with a single numpy.searchsorted over the - strand boundaries \
+	sorted by chromosome then start.
+
+	Args:
+		posChroms (numpy.array<int>): Chromosome code of each + strand \
+									  boundary.
+
+		posStarts (numpy.array<int>): Start of each + strand boundary.
+
+		negChroms (numpy.array<int>): Chromosome code of each - strand \
+									  boundary, using the same codes as \
+									  posChroms.
+
+		negStarts (numpy.array<int>): Start of each - strand boundary.
+
+		maxWidth (int): If given, only keeps matches with a width less than \
+						maxWidth.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>: Index of the + strand boundary and \
+						of the matched - strand boundary for each peak, in the \
+						order of the + strand boundaries.
+	"""
+
+	posChroms = numpy.asarray(posChroms, dtype=numpy.int64)
+	posStarts = numpy.asarray(posStarts, dtype=numpy.int64)
+	negChroms = numpy.asarray(negChroms, dtype=numpy.int64)
+	negStarts = numpy.asarray(negStarts, dtype=numpy.int64)
+	if len(posStarts) == 0 or len(negStarts) == 0:
+		return numpy.zeros(0, dtype=numpy.int64), \
+			   numpy.zeros(0, dtype=numpy.int64)
+
+	# Keys which order boundaries by chromosome then start, so searching for
+	# a key only finds - strand boundaries on the same chromosome.
+	span = max(posStarts.max(), negStarts.max()) + 1
+	negOrder = numpy.lexsort((negStarts, negChroms))
+	negKeys = negChroms[negOrder] * span + negStarts[negOrder]
+	posKeys = posChroms * span + posStarts
+
+	# First - strand boundary downstream of each + strand boundary
+	downstream = numpy.searchsorted(negKeys, posKeys, side='right')
+	matched = downstream < len(negKeys)
+	matched[matched] = negChroms[negOrder[downstream[matched]]] == \
+					   posChroms[matched]
+
+	posIndex = numpy.flatnonzero(matched)
+	negIndex = negOrder[downstream[posIndex]]
+
+	if maxWidth is not None:
+		narrow = negStarts[negIndex] - posStarts[posIndex] < maxWidth
+		posIndex, negIndex = posIndex[narrow], negIndex[narrow]
+
+	return posIndex, negIndex
+
+def getSharedChromCodes(posChroms, negChroms):
+	""" Encodes the chromosome names of the + and - strand boundaries with the \
+	same codes.
+
+	Args:
+		posChroms (numpy.array<str>): Chromosome of each + strand boundary.
+
+		negChroms (numpy.array<str>): Chromosome of each - strand boundary.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>, list<str>: The + and - strand \
+						chromosome codes, and the chromosome name of each code.
+	"""
+
+	chroms, chromNames = callBoundaries.getChromCodes(
+							numpy.concatenate((numpy.asarray(posChroms),
+											   numpy.asarray(negChroms))))
+
+	return chroms[:len(posChroms)], chroms[len(posChroms):], chromNames
+
+def getChromCodeMap(chromNames, otherNames):
+	""" Maps chromosome codes from one set of chromosome names to another.
+
+	Args:
+		chromNames (list<str>): Chromosome name of each code to map to.
+
+		otherNames (list<str>): Chromosome name of each code to map from.
+
+	Returns:
+		numpy.array<int>: Code in chromNames for each code in otherNames, \
+						  where chromosomes missing from chromNames are \
+						  given codes not in chromNames.
+	"""
+
+	chromIndex = {chrom: code for code, chrom in enumerate(chromNames)}
+	codeMap = [chromIndex.get(chrom, len(chromNames) + code)
+			   for code, chrom in enumerate(otherNames)]
+
+	return numpy.array(codeMap, dtype=numpy.int64)
 
 #TODO sanity check where mix these two around... should give same results.
-def getCandidatePeaks(posBoundaries, negBoundaries):
+def getCandidatePeaks(posBoundaries, negBoundaries, maxWidth=None):
 	""" For each boundary on the + strand, match to closest downstream boundary \
-	on - strand. Note that the positions of the boundaries are specified in a \
-	particular order, this allows for the first negative boundary downstream \
-	of the positive boundary on the same chromosome can be taken as the \
-	closest matching boundary.
+	on - strand. The first negative boundary downstream of the positive \
+	boundary on the same chromosome is taken as the closest matching boundary.
 
 	Args:
 		posBoundaries (pandas.DataFrame): Specify locations of a called tf \
@@ -27,38 +126,54 @@ def getCandidatePeaks(posBoundaries, negBoundaries):
 		negBoundaries (pandas.DataFrame): Same as posBoundaries, except \
 									  specifies TF binding boundary on - strand.
 
+		maxWidth (int): If given, only returns peaks with width less than \
+						maxWidth.
+
 	Returns:
-		list<list<str, int, int, int, int, int>>): List of called tf binding \
+		numpy.array<object>: Rows of called tf binding \
 						events 'peaks'. Each peak specified by: \
 						 [chrom, start, end, width, originIndex1, originIndex2].
 	"""
-	peaks = []
-	lastNegi = 0 #Keeps track of the last position detected downstream of +
-				 #strand position.
-	for posi in range(posBoundaries.shape[0]):
-		posBoundary = posBoundaries.values[posi, :] #+ strand tf boundary
-		# posStart = posBoundary[1]
-		#
-		# # Getting positions downstream...
-		# negStarts = negBoundaries.loc[:,'start'].values
-		# negIndicesDownstream = numpy.where(negStarts > posStart)[0]
-
-		for negi in range(lastNegi, negBoundaries.shape[0]): #negIndicesDownstream:
-			negBoundary = negBoundaries.values[negi, :] #- strand tf boundary
-
-			# if on the same chromosome and - boundary downstream of +
-			chromEqual = posBoundary[0] == negBoundary[0]
-			isDownstream = negBoundary[1] > posBoundary[1]
-			if chromEqual and isDownstream:
-				# chrom, start, end, width, originIndex1, originIndex2
-				peak = [posBoundary[0], posBoundary[1], negBoundary[1],
-						negBoundary[1]-posBoundary[1],
-						posBoundary[-1], negBoundary[-1]]
-				peaks.append(peak)
-				lastNegi = negi
-				break
-
-	return numpy.array(peaks)
+
+	posIndex, negIndex, chromNames = getPeakIndices(posBoundaries,
+													negBoundaries, maxWidth)
+
+	posStarts = posBoundaries['start'].to_numpy()[posIndex]
+	negStarts = negBoundaries['start'].to_numpy()[negIndex]
+	peaks = numpy.empty((len(posIndex), 6), dtype=object)
+	peaks[:, 0] = posBoundaries['chr'].to_numpy()[posIndex]
+	peaks[:, 1] = posStarts
+	peaks[:, 2] = negStarts
+	peaks[:, 3] = negStarts - posStarts
+	peaks[:, 4] = posBoundaries['originIndex'].to_numpy()[posIndex]
+	peaks[:, 5] = negBoundaries['originIndex'].to_numpy()[negIndex]
+
+	return peaks
+
+def getPeakIndices(posBoundaries, negBoundaries, maxWidth=None):
+	""" Matches the + and - strand boundaries as in getCandidatePeaks.
+
+	Args:
+		posBoundaries (pandas.DataFrame): As indicated in 'getCandidatePeaks'.
+		negBoundaries (pandas.DataFrame): As indicated in 'getCandidatePeaks'.
+		maxWidth (int): As indicated in 'getCandidatePeaks'.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>, list<str>: Row positions of the \
+						matched + and - strand boundaries as in \
+						matchBoundaries, and the names of the chromosomes.
+	"""
+
+	posChroms, negChroms, chromNames = getSharedChromCodes(
+											posBoundaries['chr'].to_numpy(),
+											negBoundaries['chr'].to_numpy())
+	posIndex, negIndex = matchBoundaries(posChroms,
+										 posBoundaries['start'].to_numpy(),
+										 negChroms,
+										 negBoundaries['start'].to_numpy(),
+										 maxWidth)
+
+	return posIndex, negIndex, chromNames
 
 def getPeaks(posBoundaries, negBoundaries, maxWidth):
 	""" Calls peaks by matching tf binding boundaries on + strand with closest \
@@ -72,17 +187,200 @@ def getPeaks(posBoundaries, negBoundaries, maxWidth):
 	Returns:
 		pandas.DataFrame: Dataframe of called tf binding events \
 							('peaks'). Each peak specified by per row as: \
-							[chrom, start, end, originIndex1, originIndex2].
+							[chrom, start, end, width, originIndex1, \
+							originIndex2].
 	"""
 
-	# Getting candidate peaks #
-	peaks = getCandidatePeaks(posBoundaries, negBoundaries)
+	import pandas
 
-	# Getting candidates which meet minWidth threshold #
-	widths = peaks[:, 3].transpose().astype(int)
-	widthBool = widths < maxWidth
-	peakBed = pandas.DataFrame(peaks[widthBool,:],
-							   columns=['chr', 'start', 'end', 'width',
-										'originIndex1', 'originIndex2'])
+	posIndex, negIndex, chromNames = getPeakIndices(posBoundaries,
+													negBoundaries, maxWidth)
+
+	posStarts = posBoundaries['start'].to_numpy()[posIndex].astype(numpy.int64)
+	negStarts = negBoundaries['start'].to_numpy()[negIndex].astype(numpy.int64)
+	peakBed = pandas.DataFrame({
+				'chr': posBoundaries['chr'].to_numpy()[posIndex],
+				'start': posStarts,
+				'end': negStarts,
+				'width': negStarts - posStarts,
+				'originIndex1': posBoundaries['originIndex'].to_numpy(
+											)[posIndex].astype(numpy.int64),
+				'originIndex2': negBoundaries['originIndex'].to_numpy(
+											)[negIndex].astype(numpy.int64)})
 
 	return peakBed
+
+def matchBoundaryArrays(posBoundaries, negBoundaries, maxWidth):
+	""" Matches boundaries as output by callBoundaries.getBoundaryArrays, \
+	see matchBoundaries.
+
+	Args:
+		posBoundaries (callBoundaries.Boundaries): + strand boundaries.
+		negBoundaries (callBoundaries.Boundaries): - strand boundaries.
+		maxWidth (int): Maximum width a peak is allowed to be.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>: As output by matchBoundaries.
+	"""
+
+	codeMap = getChromCodeMap(posBoundaries.chromNames,
+							  negBoundaries.chromNames)
+
+	return matchBoundaries(posBoundaries.chroms, posBoundaries.starts,
+						   codeMap[negBoundaries.chroms], negBoundaries.starts,
+						   maxWidth)
+
+def getBoundaryPeaks(posBoundaries, negBoundaries, maxWidth):
+	""" Calls peaks as in getPeaks, but for boundaries as output by \
+	callBoundaries.getBoundaryArrays.
+
+	Args:
+		posBoundaries (callBoundaries.Boundaries): + strand boundaries.
+		negBoundaries (callBoundaries.Boundaries): - strand boundaries.
+		maxWidth (int): Maximum width a peak is allowed to be.
+
+	Returns:
+		pandas.DataFrame: As indicated in 'getPeaks'.
+	"""
+
+	posIndex, negIndex = matchBoundaryArrays(posBoundaries, negBoundaries,
+											 maxWidth)
+
+	return getPeakFrame(posBoundaries, negBoundaries, posIndex, negIndex)
+
+class Peaks(object):
+	""" Peaks stored as arrays rather than as a pandas.DataFrame, as output \
+	by the calling stages on arrays.
+
+	Construction is by contract, no error checking.
+	"""
+
+	def __init__(self, chroms, starts, ends, posCounts, negCounts,
+				 originIndex1, originIndex2, chromNames):
+		""" Peaks object constructor.
+
+			Args:
+				chroms (numpy.array<int>): Chromosome code of each peak.
+
+				starts (numpy.array<int>): Start of the + strand boundary of \
+										   each peak.
+
+				ends (numpy.array<int>): Start of the - strand boundary of \
+										 each peak.
+
+				posCounts (numpy.array<int>): Counts at the + strand boundary.
+
+				negCounts (numpy.array<int>): Counts at the - strand boundary.
+
+				originIndex1 (numpy.array<int>): Row of the + strand boundary \
+												 in the + strand bedGraph.
+
+				originIndex2 (numpy.array<int>): Row of the - strand boundary \
+												 in the - strand bedGraph.
+
+				chromNames (list<str>): Chromosome name of each code.
+		"""
+		self.chroms = chroms
+		self.starts = starts
+		self.ends = ends
+		self.posCounts = posCounts
+		self.negCounts = negCounts
+		self.originIndex1 = originIndex1
+		self.originIndex2 = originIndex2
+		self.chromNames = chromNames
+
+	def __len__(self):
+		return len(self.starts)
+
+	@property
+	def widths(self):
+		return self.ends - self.starts
+
+	def subset(self, index):
+		""" Subsets the peaks to those selected by index, which is either a \
+			boolean mask or array of integer positions.
+		"""
+		return Peaks(self.chroms[index], self.starts[index], self.ends[index],
+					 self.posCounts[index], self.negCounts[index],
+					 self.originIndex1[index], self.originIndex2[index],
+					 self.chromNames)
+
+	def toFrame(self):
+		""" Returns the peaks in the format of getPeakFrame.
+		"""
+		import pandas
+
+		chromNames = numpy.array(self.chromNames, dtype=object)
+		peakBed = pandas.DataFrame({'chr': chromNames[self.chroms],
+									'start': self.starts,
+									'end': self.ends,
+									'width': self.widths,
+									'posCount': self.posCounts,
+									'negCount': self.negCounts,
+									'originIndex1': self.originIndex1,
+									'originIndex2': self.originIndex2})
+
+		return peakBed
+
+def getPeakArrays(posBoundaries, negBoundaries, posIndex, negIndex):
+	""" Gets the peaks for matched boundaries.
+
+	Args:
+		posBoundaries (callBoundaries.Boundaries): + strand boundaries.
+		negBoundaries (callBoundaries.Boundaries): - strand boundaries.
+		posIndex (numpy.array<int>): As output by matchBoundaries.
+		negIndex (numpy.array<int>): As output by matchBoundaries.
+
+	Returns:
+		Peaks: The peaks, on the chromosome codes of posBoundaries.
+	"""
+
+	return Peaks(posBoundaries.chroms[posIndex],
+				 posBoundaries.starts[posIndex].astype(numpy.int64),
+				 negBoundaries.starts[negIndex].astype(numpy.int64),
+				 posBoundaries.counts[posIndex], negBoundaries.counts[negIndex],
+				 posBoundaries.originIndex[posIndex],
+				 negBoundaries.originIndex[negIndex], posBoundaries.chromNames)
+
+def concatPeaks(peaksList, chromNames):
+	""" Concatenates peaks, such as those called on each chromosome.
+
+	Args:
+		peaksList (list<Peaks>): Peaks to concatenate, which use the \
+								 chromosome codes of chromNames.
+
+		chromNames (list<str>): Chromosome name of each code.
+
+	Returns:
+		Peaks: The peaks in the order of peaksList.
+	"""
+
+	if len(peaksList) == 0:
+		empty = numpy.zeros(0, dtype=numpy.int64)
+		return Peaks(empty.astype(numpy.int32), empty, empty, empty, empty,
+					 empty, empty, chromNames)
+
+	columns = [numpy.concatenate([getattr(peaks, column)
+								  for peaks in peaksList])
+			   for column in ['chroms', 'starts', 'ends', 'posCounts',
+							  'negCounts', 'originIndex1', 'originIndex2']]
+
+	return Peaks(*columns, chromNames)
+
+def getPeakFrame(posBoundaries, negBoundaries, posIndex, negIndex):
+	""" Gets the peaks for matched boundaries in the format of getPeaks.
+
+	Args:
+		posBoundaries (callBoundaries.Boundaries): + strand boundaries.
+		negBoundaries (callBoundaries.Boundaries): - strand boundaries.
+		posIndex (numpy.array<int>): As output by matchBoundaries.
+		negIndex (numpy.array<int>): As output by matchBoundaries.
+
+	Returns:
+		pandas.DataFrame: As indicated in 'getPeaks', with the counts at \
+						the + and - strand boundaries in columns posCount \
+						and negCount after width.
+	"""
+
+	return getPeakArrays(posBoundaries, negBoundaries, posIndex,
+						 negIndex).toFrame()
@@ -54,6 +54,44 @@ def getSignalsInRange(counts, cuttoffs, returnNumber=True):
 
 	return nSignals
 
+def getRangeSummitArray(counts, starts, ends):
+	""" Vectorized implementation of getRangeSummits, which calls the summit \
+	of every signal range in one pass over the counts.
+
+	Args:
+		counts (numpy.array<int>): As in getSignalsInRange.
+
+		starts (numpy.array<int>): Row where each signal range starts.
+
+		ends (numpy.array<int>): Row where each signal range ends; each range \
+								 must contain atleast one row.
+
+	Returns:
+		numpy.array<int>: As in getRangeSummits; where ties occur the first \
+						  position with the maximum count is the summit.
+	"""
+
+	starts = numpy.asarray(starts, dtype=numpy.int64)
+	ends = numpy.asarray(ends, dtype=numpy.int64)
+	if len(starts) == 0:
+		return numpy.zeros(0, dtype=numpy.int64)
+
+	# Laying the rows of the ranges out one after the other
+	rangeLens = ends - starts
+	rangeOffsets = numpy.concatenate(([0], numpy.cumsum(rangeLens)[:-1]))
+	rows = numpy.arange(rangeOffsets[-1] + rangeLens[-1]) - \
+		   numpy.repeat(rangeOffsets - starts, rangeLens)
+	rangeCounts = numpy.asarray(counts)[rows]
+
+	# First position in each range which has the maximum count
+	maxCounts = numpy.maximum.reduceat(rangeCounts, rangeOffsets)
+	maxLocs = numpy.flatnonzero(rangeCounts ==
+								numpy.repeat(maxCounts, rangeLens))
+	rangeIds = numpy.repeat(numpy.arange(len(starts)), rangeLens)[maxLocs]
+	firstMax = numpy.concatenate(([True], rangeIds[1:] != rangeIds[:-1]))
+
+	return maxLocs[firstMax] - rangeOffsets
+
 def getRangeSummits(counts, signalRanges):
 	""" Calls the position with the largest signal in the signalRanges.
 
@@ -70,14 +108,87 @@ def getRangeSummits(counts, signalRanges):
 					count is in that signal range.
 	"""
 
-	signalSummits = []
-	for (start, end) in signalRanges:
-		maxSignal = max( counts[start:end] )
-		signalSummit = numpy.where(counts[start:end]
-								   == maxSignal)[0][0]
-		signalSummits.append( signalSummit )
+	signalRanges = numpy.asarray(signalRanges, dtype=numpy.int64).reshape(-1, 2)
+	signalSummits = getRangeSummitArray(counts, signalRanges[:, 0],
+										signalRanges[:, 1])
+
+	return signalSummits.tolist()
+
+def getSignalRangeArrays(posChroms, posLens, signals,
+						 nInRowCutoff, falseInRowUpper, skipFirst=False):
+	""" Vectorized implementation of callSignalRanges, which scales linearly \
+	with the number of positions.
+
+	Consecutive signals are linked into the same run when they are on the \
+	same chromosome and the summed length of the no signal positions between \
+	them is no more than falseInRowUpper. Runs spanning at least nInRowCutoff \
+	positions are called as signal ranges.
+
+	Note that extending a signal range stops at a chromosome change, and a \
+	signal at the first position of a chromosome is not used as a start if \
+	the previous signal range ended directly before it. This edge case is \
+	resolved for the (rare) runs where it applies.
+
+	Args:
+		posChroms ( numpy.array<str> ): As in callSignalRanges.
+
+		posLens ( numpy.array<int> ): As in callSignalRanges.
+
+		signals ( numpy.array<bool> ): As in callSignalRanges.
+
+		skipFirst ( bool ): Whether the first position is directly after a \
+							called signal range, such as when calling the \
+							signal ranges one chromosome at a time.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>: The startRows and endRows of the \
+						signal ranges, as indicated in output of \
+						callSignalRangesBed.
+	"""
+
+	signals = numpy.asarray(signals, dtype=bool)
+	signalLocs = numpy.flatnonzero(signals)
+	if len(signalLocs) == 0:
+		return numpy.zeros(0, dtype=numpy.int64), \
+			   numpy.zeros(0, dtype=numpy.int64)
+
+	posChroms = numpy.asarray(posChroms)
+	posLens = numpy.asarray(posLens, dtype=numpy.int64)
+
+	# Chromosome segment of each position, which increments on chrom change
+	chromChange = posChroms[1:] != posChroms[:-1]
+	segments = numpy.concatenate(([0], numpy.cumsum(chromChange)))
+
+	# Length of no signal positions between each pair of consecutive signals
+	cumLens = numpy.concatenate(([0], numpy.cumsum(posLens)))
+	lefts, rights = signalLocs[:-1], signalLocs[1:]
+	falseInRow = cumLens[rights] - cumLens[lefts + 1]
+	linked = (falseInRow <= falseInRowUpper) & \
+			 (segments[lefts] == segments[rights])
+
+	# Runs of linked signals
+	runFirsts = numpy.flatnonzero(numpy.concatenate(([True], ~linked)))
+	runLasts = numpy.concatenate((runFirsts[1:] - 1, [len(signalLocs) - 1]))
+	starts = signalLocs[runFirsts]
+	ends = signalLocs[runLasts] + 1
+	called = ends - starts >= nInRowCutoff
+
+	# Signals directly after a called range are skipped as starts, which only
+	# occurs on chromosome change. The range then starts at the next signal.
+	skipRuns = numpy.flatnonzero(starts[1:] == ends[:-1]) + 1
+	if skipFirst and starts[0] == 0:
+		skipRuns = numpy.concatenate(([0], skipRuns))
+	for runi in skipRuns:
+		if runi > 0 and not called[runi - 1]:
+			continue
+
+		if runFirsts[runi] == runLasts[runi]:
+			called[runi] = False
+		else:
+			starts[runi] = signalLocs[runFirsts[runi] + 1]
+			called[runi] = ends[runi] - starts[runi] >= nInRowCutoff
 
-	return signalSummits
+	return starts[called], ends[called]
 
 def callSignalRanges(posChroms, posLens, signals,
 					 nInRowCutoff, falseInRowUpper):
@@ -97,39 +208,10 @@ def callSignalRanges(posChroms, posLens, signals,
 															callSignalRangesBed.
 	"""
 
-	signalLocs = numpy.where(signals)[0]
-
-	# resolving multiple 'peaks' in a row by taking the one with the highest value
-	signalRanges = [] #stores signal width
-	for start in signalLocs:
-		# Checking the start not already within a signal range
-		if len(signalRanges) > 0 and \
-				start >= signalRanges[-1][0] and start <= signalRanges[-1][1]:
-			continue
-
-		chrom = posChroms[start]
-		end = start + 1
-		falseInRow = 0
-		falseInRowPosCounts = 0
-		while falseInRow <= falseInRowUpper and end < len(signals) and \
-			  chrom == posChroms[end]:
+	starts, ends = getSignalRangeArrays(posChroms, posLens, signals,
+										nInRowCutoff, falseInRowUpper)
 
-			if end not in signalLocs:
-				falseInRow += posLens[end] #consider how long there is no signal
-				falseInRowPosCounts += 1
-			else:
-				falseInRow = 0
-				falseInRowPosCounts = 0
-
-			end += 1
-
-
-		nInRow = end - falseInRowPosCounts - start
-		if nInRow >= nInRowCutoff:
-			rangeEnd = end - falseInRowPosCounts
-			signalRanges.append((start, rangeEnd))
-
-	return signalRanges
+	return list(zip(starts.tolist(), ends.tolist()))
 
 
 def callSignalRangesBed(bedFrame, cutoff, falseInRowUpper, nInRowCutoff):
@@ -176,19 +258,53 @@ def callSignalRangesBed(bedFrame, cutoff, falseInRowUpper, nInRowCutoff):
 						the identified boundary.
 	"""
 
-	counts = bedFrame.values[:,3].astype(int) #Counts per position
-	chroms = bedFrame.values[:,0].astype(str) #Chromosome of position
+	counts = bedFrame.iloc[:, 3].to_numpy() #Counts per position
+	chroms = bedFrame.iloc[:, 0].to_numpy() #Chromosome of position
 	#Lengths of each position
-	posLens = bedFrame.values[:,2].astype(int) - bedFrame.values[:,1].astype(int)
+	posLens = bedFrame.iloc[:, 2].to_numpy() - bedFrame.iloc[:, 1].to_numpy()
+
+	starts, ends, summits = callSignalRangeArrays(counts, chroms, posLens,
+												  cutoff, falseInRowUpper,
+												  nInRowCutoff)
+
+	return list(zip(starts.tolist(), ends.tolist())), summits.tolist()
+
+def callSignalRangeArrays(counts, chroms, posLens,
+						  cutoff, falseInRowUpper, nInRowCutoff,
+						  skipFirst=False):
+	""" Calls signal ranges and their summits as in callSignalRangesBed, but \
+	from the columns of the bedGraph as arrays and returning arrays.
+
+	Args:
+		counts (numpy.array<int>): Counts per position.
+
+		chroms (numpy.array<str>): Chromosome of each position.
+
+		posLens (numpy.array<int>): Length of each position.
+
+		cutoff (int): As in callSignalRangesBed.
+
+		falseInRowUpper (int): As in callSignalRangesBed.
+
+		nInRowCutoff (int): As in callSignalRangesBed.
+
+		skipFirst (bool): As in getSignalRangeArrays.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>, numpy.array<int>: The startRows, \
+						endRows and summits of the signal ranges, as \
+						indicated in output of callSignalRangesBed.
+	"""
 
 	# Getting positions which have values greater than the cutoff
 	signals = getSignalsInRange(counts, [cutoff], returnNumber=False)[0]
 
 	# Calling the signalRanges
-	signalRanges = callSignalRanges(chroms, posLens, signals,
-									nInRowCutoff, falseInRowUpper)
+	starts, ends = getSignalRangeArrays(chroms, posLens, signals,
+										nInRowCutoff, falseInRowUpper,
+										skipFirst)
 
 	# Calling the summits
-	signalSummits = getRangeSummits(counts, signalRanges)
+	summits = getRangeSummitArray(counts, starts, ends)
 
-	return signalRanges, signalSummits
+	return starts, ends, summits
@@ -0,0 +1,204 @@
+""" Checkpoints of the results of the peak calling stages, so that a run which
+is killed can be rerun skipping the stages (or with --streaming, the
+chromosomes) already completed.
+
+Each result is saved as an entry directory holding its arrays as .npy files
+and an entry.json with the chromosome names, like a binaryCache. Entries are
+written to a temporary directory which is then renamed, so a killed run never
+leaves a partial entry, and are loaded with numpy.load(mmap_mode='r'), so
+loading does not depend on the size of the result. An entry is named by a
+hash of the stage, the parameters the stage depends on and a key of the
+inputs; results of other inputs or parameters are therefore not loaded, but
+remain in the directory until it is removed.
+"""
+
+import hashlib, json, os, shutil
+import numpy
+from simplenexuscaller import binaryCache, callBoundaries, callPeaks
+
+checkpointVersion = 1
+strandNames = {'+': 'pos', '-': 'neg'}
+boundaryColumns = ['chroms', 'starts', 'ends', 'counts', 'originIndex']
+peakColumns = ['chroms', 'starts', 'ends', 'posCounts', 'negCounts',
+			   'originIndex1', 'originIndex2']
+
+def getFileKey(fileNames, weights=None):
+	""" Gets a key of input files from their size and modification time, as \
+	for binaryCache; for a cache directory, of its index.json. Weights of \
+	pooled replicates, where given, are part of the key.
+	"""
+	fileStats = []
+	for fileName in fileNames:
+		if binaryCache.isTrackCache(fileName):
+			fileName = os.path.join(fileName, 'index.json')
+		fileStats.append({'fileName': os.path.abspath(fileName),
+						  **binaryCache.getSourceStat(fileName)})
+
+	key = fileStats if weights is None else {'files': fileStats,
+											 'weights': list(weights)}
+	return hashlib.sha1(json.dumps(key).encode()).hexdigest()
+
+def getTrackKey(tracks):
+	""" Gets a key of tracks in memory by hashing their columns.
+	"""
+	digest = hashlib.sha1()
+	for track in tracks:
+		digest.update(json.dumps(list(track.chromNames)).encode())
+		for column in [track.chroms, track.starts, track.ends, track.counts]:
+			column = numpy.ascontiguousarray(column)
+			digest.update(column.dtype.str.encode())
+			digest.update(memoryview(column).cast('B'))
+
+	return digest.hexdigest()
+
+class Checkpoint(object):
+	""" A directory of checkpointed stage results for one set of inputs.
+	"""
+
+	def __init__(self, checkpointDir, inputKey):
+		""" Checkpoint object constructor, which creates the directory.
+
+			Args:
+				checkpointDir (str): Directory to save the entries in.
+
+				inputKey (str): Key of the inputs, as from getFileKey or \
+								getTrackKey.
+		"""
+		self.checkpointDir = checkpointDir
+		self.inputKey = inputKey
+		os.makedirs(checkpointDir, exist_ok=True)
+
+	def getEntryPath(self, stage, key):
+		""" Gets the entry directory of a stage for key, the parameters the \
+		stage depends on.
+		"""
+		entryKey = json.dumps({'version': checkpointVersion,
+							   'input': self.inputKey, 'stage': stage,
+							   'key': list(key)})
+		digest = hashlib.sha1(entryKey.encode()).hexdigest()[:20]
+
+		return os.path.join(self.checkpointDir, f'{stage}_{digest}')
+
+	def save(self, stage, key, arrays, meta):
+		""" Saves arrays and a JSON serialisable dict meta as an entry.
+		"""
+		entryPath = self.getEntryPath(stage, key)
+		tmpPath = f'{entryPath}.tmp{os.getpid()}'
+		if os.path.exists(tmpPath):
+			shutil.rmtree(tmpPath)
+		os.makedirs(tmpPath)
+
+		for name, array in arrays.items():
+			numpy.save(os.path.join(tmpPath, f'{name}.npy'),
+					   numpy.ascontiguousarray(array))
+		with open(os.path.join(tmpPath, 'entry.json'), 'w') as entryFile:
+			json.dump({'stage': stage, 'key': list(key),
+					   'arrays': list(arrays), **meta}, entryFile)
+
+		if os.path.exists(entryPath):
+			shutil.rmtree(entryPath)
+		os.rename(tmpPath, entryPath)
+
+	def load(self, stage, key):
+		""" Loads an entry saved by save.
+
+		Returns:
+			dict<str, numpy.array>, dict: The read-only memory-mapped arrays \
+						and the meta of the entry, or None if it was not saved.
+		"""
+		entryPath = self.getEntryPath(stage, key)
+		entryFileName = os.path.join(entryPath, 'entry.json')
+		if not os.path.isfile(entryFileName):
+			return None
+
+		with open(entryFileName) as entryFile:
+			meta = json.load(entryFile)
+		arrays = {name: numpy.load(os.path.join(entryPath, f'{name}.npy'),
+								   mmap_mode='r')
+				  for name in meta['arrays']}
+
+		return arrays, meta
+
+	def saveSignals(self, key, signalResults):
+		""" Saves the signal stage results of NexusAnalysis.callPeaks; the \
+		signal ranges, summits and boundaries of each strand.
+		"""
+		arrays, meta = {}, {}
+		for strand, (signalRanges, summits, bounds) in zip(['+', '-'],
+														   signalResults):
+			name = strandNames[strand]
+			arrays[f'{name}_signalRanges'] = signalRanges
+			arrays[f'{name}_summits'] = summits
+			addColumns(arrays, meta, f'{name}_bounds', bounds,
+					   boundaryColumns)
+		self.save('signals', key, arrays, meta)
+
+	def loadSignals(self, key):
+		""" Loads results saved by saveSignals, or returns None.
+		"""
+		entry = self.load('signals', key)
+		if entry is None:
+			return None
+
+		arrays, meta = entry
+		return tuple((arrays[f'{name}_signalRanges'], arrays[f'{name}_summits'],
+					  callBoundaries.Boundaries(*getColumns(
+									arrays, meta, f'{name}_bounds',
+									boundaryColumns)))
+					 for name in strandNames.values())
+
+	def saveBoundaries(self, key, boundaryResults):
+		""" Saves the resolved boundaries of each strand.
+		"""
+		arrays, meta = {}, {}
+		for strand, boundaries in zip(['+', '-'], boundaryResults):
+			addColumns(arrays, meta, strandNames[strand], boundaries,
+					   boundaryColumns)
+		self.save('boundaries', key, arrays, meta)
+
+	def loadBoundaries(self, key):
+		""" Loads results saved by saveBoundaries, or returns None.
+		"""
+		entry = self.load('boundaries', key)
+		if entry is None:
+			return None
+
+		return tuple(callBoundaries.Boundaries(*getColumns(*entry, name,
+														   boundaryColumns))
+					 for name in strandNames.values())
+
+	def savePeaks(self, key, peaks, meta=None):
+		""" Saves callPeaks.Peaks, with optional JSON serialisable meta.
+		"""
+		arrays, peakMeta = {}, dict(meta or {})
+		addColumns(arrays, peakMeta, 'peaks', peaks, peakColumns)
+		self.save('peaks', key, arrays, peakMeta)
+
+	def loadPeaks(self, key):
+		""" Loads peaks saved by savePeaks.
+
+		Returns:
+			callPeaks.Peaks, dict: The peaks and the meta saved with them, or \
+								   None.
+		"""
+		entry = self.load('peaks', key)
+		if entry is None:
+			return None
+
+		return callPeaks.Peaks(*getColumns(*entry, 'peaks', peakColumns)), \
+			   entry[1]
+
+def addColumns(arrays, meta, name, columnStore, columns):
+	""" Adds the columns and chromosome names of callBoundaries.Boundaries or \
+	callPeaks.Peaks to the arrays and meta of an entry.
+	"""
+	for column in columns:
+		arrays[f'{name}_{column}'] = getattr(columnStore, column)
+	meta[f'{name}_chromNames'] = list(columnStore.chromNames)
+
+def getColumns(arrays, meta, name, columns):
+	""" Gets the constructor arguments of callBoundaries.Boundaries or \
+	callPeaks.Peaks added to an entry by addColumns.
+	"""
+	return [arrays[f'{name}_{column}'] for column in columns] + \
+		   [meta[f'{name}_chromNames']]
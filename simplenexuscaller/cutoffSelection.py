@@ -0,0 +1,140 @@
+""" Selects the cutoff number of counts for a position to be a signal from the
+distribution of the counts, rather than it being set by hand for each library.
+
+The counts are summarised in one pass as a histogram of the no. of bases with
+each count, from which the no. of bases at or above every possible cutoff is a
+cumulative sum; so selecting among k cutoffs is O(n + k), rather than the
+O(n * k) of callSignals.getSignalsInRange(counts, cutoffs).
+"""
+
+import numpy
+
+cutoffMethods = ['poisson', 'quantile']
+
+# Default level of each method, see selectCutoffFromHistogram #
+defaultLevels = {'poisson': 1e-5, 'quantile': 1e-3}
+
+def getCountHistogram(counts, posLens, histogram=None):
+	""" Gets the no. of bases with each count.
+
+	Args:
+		counts (numpy.array<int>): Counts per position; non-integer counts \
+								   are rounded down, which does not change \
+								   which positions are at or above an integer \
+								   cutoff.
+
+		posLens (numpy.array<int>): Length of each position, so that a zero \
+									count row over a large region is weighted \
+									by the bases it covers.
+
+		histogram (numpy.array<int>): Histogram of other counts to add to, \
+									  such as of the other strand or of \
+									  previous chromosomes.
+
+	Returns:
+		numpy.array<int>: No. of bases with a count of each index.
+	"""
+	counts = numpy.asarray(counts)
+	if counts.dtype.kind == 'f':
+		counts = numpy.floor(counts)
+	counts = counts.astype(numpy.int64, copy=False)
+
+	minLength = 1 if histogram is None else len(histogram)
+	countHistogram = numpy.bincount(counts, weights=posLens,
+									minlength=minLength).astype(numpy.int64)
+	if histogram is not None:
+		countHistogram[:len(histogram)] += histogram
+
+	return countHistogram
+
+def getBasesAtCutoffs(histogram):
+	""" Gets the no. of bases at or above each cutoff.
+
+	Args:
+		histogram (numpy.array<int>): As output by getCountHistogram.
+
+	Returns:
+		numpy.array<int>: No. of bases with a count >= the index, i.e. the \
+						  no. of signal bases with that cutoff.
+	"""
+	return numpy.cumsum(histogram[::-1])[::-1]
+
+def getPoissonTail(meanCount, maxCount):
+	""" Gets P(X >= k) for X ~ Poisson(meanCount), for k from 0 to past \
+	maxCount and far enough into the tail that it is negligible.
+	"""
+	# Probabilities in log space to avoid underflow
+	nTerms = int(max(maxCount, meanCount + 20 * numpy.sqrt(meanCount))) + 21
+	k = numpy.arange(nTerms)
+	logFactorials = numpy.concatenate(([0], numpy.cumsum(numpy.log(k[1:]))))
+	probs = numpy.exp(k * numpy.log(meanCount) - meanCount - logFactorials)
+
+	return numpy.cumsum(probs[::-1])[::-1]
+
+def selectCutoffFromHistogram(histogram, method='poisson', level=None):
+	""" Selects a cutoff from a histogram of the counts.
+
+	Args:
+		histogram (numpy.array<int>): As output by getCountHistogram.
+
+		method (str): 'poisson' models the background counts per base as \
+					  Poisson with the mean count per base, and selects the \
+					  smallest cutoff at which a background base is a signal \
+					  with probability <= level. 'quantile' selects the \
+					  smallest cutoff at which the fraction of bases which are \
+					  signals is <= level.
+
+		level (float): See method; defaults to defaultLevels[method].
+
+	Returns:
+		int, dict: The cutoff, and a summary of the selection with the \
+				   method, level, cutoff, no. of bases, mean count per base \
+				   and the no. and fraction of bases which are signals.
+	"""
+	if method not in cutoffMethods:
+		raise ValueError(f"Unknown cutoff method '{method}'; expected one of "
+						 f"{cutoffMethods}.")
+	if level is None:
+		level = defaultLevels[method]
+
+	basesAtCutoffs = getBasesAtCutoffs(histogram)
+	nBases = int(basesAtCutoffs[0])
+	meanCount = float(numpy.dot(numpy.arange(len(histogram)), histogram) /
+					  max(nBases, 1))
+
+	# Fraction of bases (or background bases) at or above cutoffs from 1 up
+	if method == 'poisson' and meanCount > 0:
+		tail = getPoissonTail(meanCount, len(histogram))[1:]
+	elif method == 'poisson':
+		tail = numpy.zeros(1)
+	else:
+		# Up to one above the largest count, where there are no signals
+		tail = numpy.concatenate((basesAtCutoffs[1:], [0])) / max(nBases, 1)
+	cutoff = int(numpy.argmax(tail <= level)) + 1
+
+	signalBases = int(basesAtCutoffs[cutoff]) if cutoff < len(histogram) else 0
+	return cutoff, {'method': method, 'level': level, 'cutoff': cutoff,
+					'nBases': nBases, 'meanCount': meanCount,
+					'signalBases': signalBases,
+					'signalFraction': signalBases / max(nBases, 1)}
+
+def selectCutoff(tracks, method='poisson', level=None):
+	""" Selects a cutoff from the counts of tracks, see \
+	selectCutoffFromHistogram.
+
+	Args:
+		tracks (iterable<BedGraphTrack>): Tracks whose counts are pooled, such \
+										  as the + and - strand.
+
+		method (str): As in selectCutoffFromHistogram.
+
+		level (float): As in selectCutoffFromHistogram.
+
+	Returns:
+		int, dict: As output by selectCutoffFromHistogram.
+	"""
+	histogram = None
+	for track in tracks:
+		histogram = getCountHistogram(track.counts, track.posLens, histogram)
+
+	return selectCutoffFromHistogram(histogram, method, level)
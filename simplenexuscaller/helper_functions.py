@@ -3,12 +3,12 @@
 ################################################################################
 							#Saving functions.
 ################################################################################
-import pickle
-import numpy, pandas
+# pickle and matplotlib are imported by the functions using them, so importing
+# the module does not load them.
 import os
-import matplotlib.pyplot as plt
 
 def saveAsPickle(pickleName, singleCellAnalysisObjects):
+	import pickle
 
 	max_bytes = 2 ** 31 - 1
 
@@ -21,6 +21,7 @@ def saveAsPickle(pickleName, singleCellAnalysisObjects):
 
 #loadType=slow is for large files
 def loadPickle(pickleName, loadType='fast'):
+	import pickle
 
 	if loadType=='slow':
 		"""
@@ -44,6 +45,8 @@ def loadPickle(pickleName, loadType='fast'):
 			return pickle.load(input)
 
 def plotSignalRange(signalRanges, counts, peakN, buffer):
+	import matplotlib.pyplot as plt
+
 	loc1, loc2 = signalRanges[peakN]
 	loc1, loc2 = loc1 - buffer, loc2 + buffer
 	plt.bar(list(range(loc1, loc2)), counts[loc1:loc2])
@@ -0,0 +1,186 @@
+""" Records the time, memory and throughput of each peak calling stage in a
+RunReport, which the CLI writes as a JSON run report.
+
+Stages are recorded with RunReport.stage, which times the stage and records
+the peak RSS of the process once the stage is done. A profiler can be attached
+to the report, to profile each stage, such as cProfile or a sampling profiler
+with the same enable/disable interface.
+"""
+
+import contextlib, datetime, io, json, logging, platform, time
+
+try:
+	import resource
+except ImportError: # Not available on Windows
+	resource = None
+
+logger = logging.getLogger(__name__)
+
+def getPeakRss():
+	""" Gets the peak resident set size of the process in bytes, or None \
+	where it can not be measured.
+	"""
+	if resource is None:
+		return None
+
+	maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# Reported in kilobytes on Linux, bytes on macOS
+	return maxRss if platform.system() == 'Darwin' else maxRss * 1024
+
+class StageRecord(object):
+	""" The measures of one stage of a run.
+
+	Construction is by contract, no error checking.
+	"""
+
+	def __init__(self, stage, strand=None, chrom=None, inputRows=None):
+		""" StageRecord object constructor.
+
+			Args:
+				stage (str): Name of the stage.
+
+				strand (str): '+' or '-' where the stage is of one strand.
+
+				chrom (str): Chromosome where the stage is of one chromosome.
+
+				inputRows (int): No. of rows input to the stage.
+		"""
+		self.stage = stage
+		self.strand = strand
+		self.chrom = chrom
+		self.inputRows = inputRows
+		self.outputs = None
+		self.outputType = None
+		self.cached = False
+		self.wallSeconds = None
+		self.cpuSeconds = None
+		self.peakRssBytes = None
+
+	def setOutput(self, outputs, outputType):
+		""" Sets the no. of outputs of the stage, e.g. (1520, 'boundaries').
+		"""
+		self.outputs = int(outputs)
+		self.outputType = outputType
+
+	@property
+	def rowsPerSecond(self):
+		""" Throughput of the stage, or None where not known.
+		"""
+		if self.inputRows is None or not self.wallSeconds:
+			return None
+
+		return self.inputRows / self.wallSeconds
+
+	def toDict(self):
+		return {'stage': self.stage, 'strand': self.strand, 'chrom': self.chrom,
+				'inputRows': self.inputRows, 'outputs': self.outputs,
+				'outputType': self.outputType, 'cached': self.cached,
+				'wallSeconds': self.wallSeconds, 'cpuSeconds': self.cpuSeconds,
+				'peakRssBytes': self.peakRssBytes,
+				'rowsPerSecond': self.rowsPerSecond}
+
+class RunReport(object):
+	""" The stage records and metadata of a run.
+	"""
+
+	def __init__(self, profiler=None):
+		""" RunReport object constructor.
+
+			Args:
+				profiler (str or object): 'cProfile' to profile the stages \
+							with cProfile, or a profiler with enable() and \
+							disable() methods, such as a sampling profiler; \
+							enabled while each stage runs. None to not profile.
+		"""
+		if profiler == 'cProfile':
+			import cProfile
+			profiler = cProfile.Profile()
+
+		self.profiler = profiler
+		self.records = []
+		self.metadata = {}
+		self.startTime = datetime.datetime.now()
+		self.startWall = time.perf_counter()
+
+	@contextlib.contextmanager
+	def stage(self, stage, strand=None, chrom=None, inputRows=None):
+		""" Records a stage, run in the body of the with statement.
+
+		Args:
+			stage, strand, chrom, inputRows: As in StageRecord.
+
+		Yields:
+			StageRecord: The record, to set the outputs of.
+		"""
+		record = StageRecord(stage, strand, chrom, inputRows)
+		wallStart, cpuStart = time.perf_counter(), time.process_time()
+		if self.profiler is not None:
+			self.profiler.enable()
+		try:
+			yield record
+		finally:
+			if self.profiler is not None:
+				self.profiler.disable()
+			record.wallSeconds = time.perf_counter() - wallStart
+			record.cpuSeconds = time.process_time() - cpuStart
+			record.peakRssBytes = getPeakRss()
+			self.records.append(record)
+
+			logger.debug(f"{stage}{'' if strand is None else ' ' + strand}"
+						 f"{'' if chrom is None else ' ' + chrom}: "
+						 f"{record.wallSeconds:.3f}s")
+
+	def addCached(self, stage, strand=None, outputs=None, outputType=None):
+		""" Records a stage whose result was reused from a cache.
+		"""
+		record = StageRecord(stage, strand)
+		record.cached = True
+		record.wallSeconds, record.cpuSeconds = 0.0, 0.0
+		if outputs is not None:
+			record.setOutput(outputs, outputType)
+		self.records.append(record)
+
+	def getProfileStats(self, nFunctions=30):
+		""" Gets the functions with the most cumulative time, where profiled \
+		with cProfile.
+
+		Returns:
+			str: The pstats listing, or None where not profiled with cProfile.
+		"""
+		if self.profiler is None or not hasattr(self.profiler, 'create_stats'):
+			return None
+
+		import pstats
+		statsText = io.StringIO()
+		stats = pstats.Stats(self.profiler, stream=statsText)
+		stats.sort_stats('cumulative').print_stats(nFunctions)
+
+		return statsText.getvalue()
+
+	def toDict(self):
+		""" Gets the report as a dict, as written by writeJson.
+		"""
+		return {'start': self.startTime.isoformat(),
+				'wallSeconds': time.perf_counter() - self.startWall,
+				'peakRssBytes': getPeakRss(),
+				'metadata': self.metadata,
+				'stages': [record.toDict() for record in self.records],
+				'profile': self.getProfileStats()}
+
+	def writeJson(self, fileName):
+		""" Writes the report as JSON.
+		"""
+		with open(fileName, 'w') as reportFile:
+			json.dump(self.toDict(), reportFile, indent=1, default=str)
+
+@contextlib.contextmanager
+def recordStage(report, stage, strand=None, chrom=None, inputRows=None):
+	""" As RunReport.stage, except where report is None the stage is not \
+	recorded, for stages which are optionally instrumented.
+	"""
+	if report is None:
+		yield StageRecord(stage, strand, chrom, inputRows)
+		return
+
+	with report.stage(stage, strand, chrom, inputRows) as record:
+		yield record
@@ -1,22 +1,251 @@
-from simplenexuscaller import callSignals, callBoundaries, callPeaks
+from collections import OrderedDict
+import logging
+import numpy, pandas
+from simplenexuscaller import callBoundaries, callPeaks, bedGraphReader, \
+							  cutoffSelection, nexusEngine, peakWriter, \
+							  regionIndex, signalIndex
+from simplenexuscaller.bedGraphTrack import BedGraphTrack, getTrackFromFrame
+from simplenexuscaller.checkpoint import Checkpoint, getTrackKey
+from simplenexuscaller.instrumentation import RunReport, recordStage
+from simplenexuscaller.nexusEngine import resolveStrand, callStrand
+
+logger = logging.getLogger(__name__)
+
+class StageCache(object):
+	""" A least recently used cache of the results of a peak calling stage, \
+	keyed by the parameters the stage depends on.
+	"""
+
+	def __init__(self, maxSize):
+		""" StageCache object constructor.
+
+			Args:
+				maxSize (int): No. of results kept, after which the least \
+							   recently used result is evicted.
+		"""
+		self.maxSize = maxSize
+		self.results = OrderedDict()
+
+	def __len__(self):
+		return len(self.results)
+
+	def get(self, key):
+		""" Gets the result for key, or None if it is not cached.
+		"""
+		if key not in self.results:
+			return None
+
+		self.results.move_to_end(key)
+		return self.results[key]
+
+	def put(self, key, result):
+		""" Caches the result for key, evicting the least recently used results \
+		beyond maxSize.
+		"""
+		self.results[key] = result
+		self.results.move_to_end(key)
+		while len(self.results) > self.maxSize:
+			self.results.popitem(last=False)
+
+	def clear(self):
+		self.results.clear()
+
+def callPeaksByChromosome(strandChroms, cutoff=10, falseInRowUpper=10,
+						  nInRowCutoff=2, distLimit=40, maxWidth=100,
+						  dualMethod='largestSignal', report=None,
+						  checkpoint=None, score=False):
+	""" Calls peaks one chromosome at a time as in \
+	nexusEngine.callPeakArraysByChromosome, so only one chromosome needs to \
+	be held in memory. Gives the same peaks as NexusAnalysis.callPeaks.
+
+	Args:
+		strandChroms (iterable<tuple<str, BedGraphTrack, BedGraphTrack>>):
+						The chromosome name, and the + and - strand track \
+						of that chromosome, for each chromosome in genome \
+						order; such as from bedGraphReader.iterStrandChroms. \
+						The track rowOffset gives the row in the whole bedGraph.
+
+		cutoff, falseInRowUpper, nInRowCutoff, distLimit, maxWidth, \
+		dualMethod: As in NexusAnalysis.callPeaks.
+
+		report (instrumentation.RunReport): Report to record the stages of \
+											each chromosome in, or None.
+
+		checkpoint (checkpoint.Checkpoint): Checkpoint to save the peaks of \
+						each chromosome to once called, or None; see \
+						nexusEngine.callPeakArraysByChromosome.
+
+		score (bool): Whether to add the columns of NexusAnalysis.scorePeaks, \
+					  from a signal index of each chromosome.
+
+	Yields:
+		str, pandas.DataFrame: The chromosome name and the peaks called on \
+							   the chromosome, as output by \
+							   NexusAnalysis.callPeaks.
+	"""
+	chromTracks = {}
+	def keepTracks(strandChroms):
+		# Only the chromosome being called is kept, as each chromosome's
+		# peaks are yielded before the next chromosome is read
+		for chrom, pos, neg in strandChroms:
+			chromTracks.clear()
+			chromTracks[chrom] = (pos, neg)
+			yield chrom, pos, neg
+
+	if score:
+		strandChroms = keepTracks(strandChroms)
+	for chrom, peaks in nexusEngine.callPeakArraysByChromosome(
+								strandChroms, cutoff, falseInRowUpper,
+								nInRowCutoff, distLimit, maxWidth, dualMethod,
+								report, checkpoint):
+		peaks = peaks.toFrame()
+		if score:
+			peaks = getScoredPeaks(peaks, *[signalIndex.getSignalIndex(track)
+											for track in chromTracks[chrom]])
+		yield chrom, peaks
+
+def getScoredPeaks(peaks, posIndex, negIndex):
+	""" Adds the total counts over each peak on each strand to the peaks; \
+	see NexusAnalysis.scorePeaks.
+
+	Args:
+		peaks (pandas.DataFrame): Peaks as output by NexusAnalysis.callPeaks.
+
+		posIndex, negIndex (signalIndex.SignalIndex): Signal index of the + \
+						and - strand.
+	"""
+	chroms = peaks['chr'].to_numpy()
+	starts = peaks['start'].to_numpy()
+	# A peak covers the bases from its start to its end inclusive
+	ends = peaks['end'].to_numpy() + 1
+	scored = peaks.assign(posSignal=posIndex.getSignal(chroms, starts, ends),
+						  negSignal=negIndex.getSignal(chroms, starts, ends))
+	scored['signal'] = scored['posSignal'] + scored['negSignal']
+
+	return scored
+
+def callPeaksInRegions(pos, neg, regions, cutoff=10, falseInRowUpper=10,
+					   nInRowCutoff=2, distLimit=40, maxWidth=100,
+					   dualMethod='largestSignal', report=None):
+	""" Calls peaks overlapping a set of regions, calling only the rows \
+	within regionIndex.getRegionMargin of a region. Each region, after \
+	expanding by the margin and merging, is called separately.
+
+	The peaks are approximate: they are those of NexusAnalysis.callPeaks \
+	overlapping the regions, except near a signal range linked across a gap \
+	with no rows, or a chain of dual boundaries, reaching past the margin; \
+	see regionIndex. Call the whole genome and keep the peaks overlapping \
+	the regions for exact peaks.
+
+	Args:
+		pos (BedGraphTrack): + strand, sorted by position within each \
+							 chromosome.
+
+		neg (BedGraphTrack): As for pos, except the - strand.
+
+		regions (regionIndex.RegionIndex): The regions.
+
+		cutoff, falseInRowUpper, nInRowCutoff, distLimit, maxWidth, \
+		dualMethod: As in NexusAnalysis.callPeaks.
+
+		report (instrumentation.RunReport): Report to record the calling in \
+											as one stage, or None.
+
+	Returns:
+		pandas.DataFrame: The peaks overlapping the regions, as output by \
+						  NexusAnalysis.callPeaks.
+	"""
+	params = {'cutoff': cutoff, 'falseInRowUpper': falseInRowUpper,
+			  'nInRowCutoff': nInRowCutoff, 'distLimit': distLimit,
+			  'dualMethod': dualMethod}
+	windows = regions.expand(regionIndex.getRegionMargin(falseInRowUpper,
+														 maxWidth, distLimit))
+	posWindows = windows.getRowWindows(pos)
+	negWindows = windows.getRowWindows(neg)
+	nRows = sum(int(numpy.diff(rows).sum())
+				for strandWindows in [posWindows, negWindows]
+				for rows in strandWindows.values())
+
+	# Chromosomes in the order of the bedGraph
+	chromOrder = {chrom: code for code, chrom in enumerate(pos.chromNames)}
+	chroms = sorted(windows.regions,
+					key=lambda chrom: chromOrder.get(chrom, len(chromOrder)))
+
+	with recordStage(report, 'regionPeaks', inputRows=nRows) as record:
+		emptyPeaks = callPeaks.getBoundaryPeaks(
+							*[callBoundaries.concatBoundaries([], [])] * 2, 0)
+		peaksList = []
+		for chrom in chroms:
+			for posRows, negRows in zip(posWindows[chrom], negWindows[chrom]):
+				strandBoundaries = []
+				for strand, track, rows in [('+', pos, posRows),
+											('-', neg, negRows)]:
+					window = track.getRows(*rows)
+					if len(window) == 0:
+						strandBoundaries.append(
+								callBoundaries.concatBoundaries([], [chrom]))
+						continue
+
+					boundaries = callStrand(window.getBedArrays(), strand,
+											rowOffset=window.rowOffset,
+											**params)[3]
+					# Rows of a track read near the regions are renumbered
+					boundaries.originIndex = window.getFileRows(
+													boundaries.originIndex)
+					strandBoundaries.append(boundaries)
+
+				peaks = callPeaks.getBoundaryPeaks(*strandBoundaries, maxWidth)
+				if len(peaks) > 0:
+					peaksList.append(peaks)
+
+		peaks = pandas.concat(peaksList, ignore_index=True) \
+				if len(peaksList) > 0 else emptyPeaks
+		# Peaks cover the bases from the + to the - strand boundary start
+		peaks = peaks.loc[regions.getOverlapMask(peaks['chr'].to_numpy(),
+												 peaks['start'].to_numpy(),
+												 peaks['end'].to_numpy() + 1)
+						  ].reset_index(drop=True)
+		record.setOutput(len(peaks), 'peaks')
+
+	return peaks
+
+def getStrandTrack(strand, absCounts=False, weights=None):
+	""" Gets the track of a strand as given to NexusAnalysis, pooling a \
+	list of replicates.
+	"""
+	if isinstance(strand, list):
+		from simplenexuscaller import replicatePooling
+		return replicatePooling.poolTracks([getStrandTrack(replicate, absCounts)
+											for replicate in strand], weights)
+	if isinstance(strand, str):
+		return bedGraphReader.readTrack(strand, absCounts=absCounts)
+	if not isinstance(strand, BedGraphTrack):
+		return getTrackFromFrame(strand)
+
+	return strand
 
 class NexusAnalysis(object):
 	""" A datastructure for holding nexus bedGraph data and performing \
 	the analysis on them by using callSignals, callBoundaries, and callPeaks.
 	Stores all of the intermediate states that the data passes through on way \
-	to peak calling.
+	to peak calling. The results of each stage are also cached by the \
+	parameters they depend on, so calling again with only some parameters \
+	changed reruns only the stages those parameters affect.
 
 	Construction is by contract, no error checking.
 	"""
 
 	pos = None
 	neg = None
+	cutoffSummary = None
+	report = None
+	peaks = None
 
-	def __init__(self, pos, neg):
+	def __init__(self, pos, neg, cacheSize=8, weights=None):
 		""" NexusAnalysis object constructor.
 
 			Args:
-				pos (pandas.DataFrame):
+				pos (BedGraphTrack, pandas.DataFrame or str):
 								Bedgraph of ChIP-nexus counts on the positive \
 								strand. Ascending order of the genome \
 								positions. Columns are ['chr', 'start', 'end', \
@@ -27,19 +256,121 @@ class NexusAnalysis(object):
 								refer to one specific base. Where count is \
 								zero for a particular row, will refer to a large \
 								region of bases where there are non-zero counts \
-								until the next position where a count occurs.
+								until the next position where a count occurs. \
+								A pandas.DataFrame is converted to a \
+								BedGraphTrack, which is what is stored. A str \
+								is a bedGraph file name or cache directory, \
+								read with bedGraphReader.readTrack such that a \
+								converted cache is memory-mapped.
+
+				neg (BedGraphTrack, pandas.DataFrame or str): Same as pos, \
+								except on the negative strand.
+
+								Either may instead be a list of the above, one \
+								per replicate, which are pooled into one \
+								track by summing their counts; see \
+								replicatePooling.
+
+				cacheSize (int): No. of parameter sets to keep the results \
+								 of for each stage; see StageCache.
+
+				weights (list<float>): Weight of each replicate where pos \
+									   and neg are lists; see \
+									   replicatePooling.mergeIntervals.
+		"""
+		self.pos = getStrandTrack(pos, weights=weights)
+		self.neg = getStrandTrack(neg, absCounts=True, weights=weights)
+
+		# Stage results, keyed by the parameters of the stage and the stages
+		# before it.
+		self.signalCache = StageCache(cacheSize)
+		self.boundaryCache = StageCache(cacheSize)
+		self.peakCache = StageCache(cacheSize)
+		# Signal index of each strand, built on the first query
+		self.signalIndexes = {}
+
+	def clearCache(self):
+		""" Clears the cached stage results and signal indexes, such as after \
+		changing pos or neg.
+		"""
+		for cache in [self.signalCache, self.boundaryCache, self.peakCache]:
+			cache.clear()
+		self.signalIndexes.clear()
+
+	def getSignalIndex(self, strand):
+		""" Gets the signal index of the '+' or '-' strand, building it on \
+		first use; see signalIndex.
+		"""
+		if strand not in self.signalIndexes:
+			track = self.pos if strand == '+' else self.neg
+			self.signalIndexes[strand] = signalIndex.getSignalIndex(track)
+
+		return self.signalIndexes[strand]
+
+	def regionSignal(self, chrom, start, end, strand='both'):
+		""" Gets the total counts over regions from a cumulative count index \
+		of each strand, in O(log n) time per region for n rows whatever its \
+		length.
+
+		Args:
+			chrom (str or numpy.array<str>): Chromosome of each region.
 
-				neg (pandas.DataFrame): Same as pos, except on the negative strand.
+			start (int or numpy.array<int>): Start of each region.
+
+			end (int or numpy.array<int>): End of each region, exclusive.
+
+			strand (str): '+' or '-' for the counts of one strand, or 'both' \
+						  for the sum of both strands.
+
+		Returns:
+			numpy.array: Total counts of each region, or a number for a single \
+						 region; see signalIndex.SignalIndex.getSignal.
 		"""
-		self.pos = pos
-		self.neg = neg
+		if strand not in ['+', '-', 'both']:
+			raise ValueError(f"strand must be '+', '-' or 'both', "
+							 f"not '{strand}'.")
+
+		strands = ['+', '-'] if strand == 'both' else [strand]
+		return sum(self.getSignalIndex(strand).getSignal(chrom, start, end)
+				   for strand in strands)
+
+	def scorePeaks(self, peaks=None):
+		""" Adds the total counts over each peak to the peaks, as columns \
+		posSignal and negSignal of each strand and signal of both, for \
+		ranking and filtering peaks. A peak covers the bases from its start \
+		to its end inclusive.
+
+		Args:
+			peaks (pandas.DataFrame): Peaks as output by callPeaks; by \
+									  default self.peaks, which is replaced by \
+									  the scored peaks.
+
+		Returns:
+			pandas.DataFrame: The peaks with the score columns.
+		"""
+		scorePeaks = peaks is None
+		if scorePeaks:
+			peaks = self.peaks
+
+		scored = getScoredPeaks(peaks, self.getSignalIndex('+'),
+								self.getSignalIndex('-'))
+		if scorePeaks:
+			self.peaks = scored
+
+		return scored
 
 	def callPeaks(self, cutoff=10, falseInRowUpper=10, nInRowCutoff=2,
-				  distLimit=40, maxWidth=100):
+				  distLimit=40, maxWidth=100, dualMethod='largestSignal',
+				  threads=1, tileRows=None, cutoffMethod='poisson',
+				  cutoffLevel=None, report=None, checkpoint=None):
 		""" Performs peak calling on ChIP-nexus data.
 
 		Args:
-			cutoff (int): No. of counts to be considered signal
+			cutoff (int or str): No. of counts to be considered signal, or \
+								 'auto' to select the cutoff from the \
+								 distribution of the counts of both strands; \
+								 the selection is stored as \
+								 self.cutoffSummary.
 
 			falseInRowUpper (int): No. of no signals in row before terminate.
 
@@ -54,59 +385,288 @@ class NexusAnalysis(object):
 			maxWidth (int): Maximum width a peak is allowed to be. \
 							Recommend to set this about 2-3 times the TF \
 							binding site width.
+
+			dualMethod (str): Method to resolve dual boundaries, either \
+							'largestSignal', 'wide' or 'narrow'; see \
+							callBoundaries.resolveDualBoundaries.
+
+			threads (int): No. of processes to call peaks with. Above 1, each \
+						   chromosome is called separately in a process pool; \
+						   see parallelCalling.
+
+			tileRows (int): Where given with threads above 1, chromosomes \
+							are split into tiles of at least this many rows \
+							called separately, rather than calling each \
+							chromosome as one task; see tiling.
+
+			cutoffMethod (str): Where cutoff is 'auto', the method of \
+								cutoffSelection.selectCutoffFromHistogram.
+
+			cutoffLevel (float): Where cutoff is 'auto', the level of \
+								 cutoffSelection.selectCutoffFromHistogram.
+
+			report (instrumentation.RunReport): Report to record the time, \
+								memory and outputs of each stage in; a new \
+								report if None. Stored as self.report, with \
+								the parameters and no. of peaks as metadata.
+
+			checkpoint (checkpoint.Checkpoint or str): Checkpoint to save the \
+								result of each stage to, or a directory to \
+								save them to keyed by a hash of pos and neg. \
+								Stages not in the StageCache are loaded from \
+								the checkpoint where saved by an earlier run \
+								with the same inputs and parameters.
+
+		Returns:
+			pandas.DataFrame: The peaks, also stored as self.peaks. Since the \
+							  peaks are cached for later calls with the same \
+							  parameters, the frame should not be modified.
+		"""
+
+		if report is None:
+			report = RunReport()
+		self.report = report
+
+		if cutoff == 'auto':
+			with report.stage('selectCutoff',
+							  inputRows=len(self.pos) + len(self.neg)):
+				cutoff = self.selectCutoff(cutoffMethod, cutoffLevel)
+			report.metadata['cutoffSelection'] = self.cutoffSummary
+			logger.info(f"Selected a cutoff of {cutoff} counts, at which "
+						f"{self.cutoffSummary['signalFraction']:.2e} of bases "
+						f"are signals.")
+
+		params = {'cutoff': cutoff, 'falseInRowUpper': falseInRowUpper,
+				  'nInRowCutoff': nInRowCutoff, 'distLimit': distLimit,
+				  'dualMethod': dualMethod}
+		report.metadata['params'] = {**params, 'maxWidth': maxWidth,
+									 'threads': threads, 'tileRows': tileRows}
+		report.metadata['inputRows'] = {'+': len(self.pos), '-': len(self.neg)}
+
+		signalKey = (cutoff, falseInRowUpper, nInRowCutoff)
+		boundaryKey = signalKey + (distLimit, dualMethod)
+		peakKey = boundaryKey + (maxWidth,)
+		signalResults = self.signalCache.get(signalKey)
+		boundaryResults = self.boundaryCache.get(boundaryKey)
+		peakIndex = None
+
+		if isinstance(checkpoint, str):
+			checkpoint = Checkpoint(checkpoint,
+									getTrackKey([self.pos, self.neg]))
+		if checkpoint is not None:
+			if signalResults is None:
+				signalResults = checkpoint.loadSignals(signalKey)
+				if signalResults is not None:
+					logger.info("Loaded TF signals and binding boundaries from "
+								"the checkpoint.")
+					self.signalCache.put(signalKey, signalResults)
+			if signalResults is not None and boundaryResults is None:
+				boundaryResults = checkpoint.loadBoundaries(boundaryKey)
+				if boundaryResults is not None:
+					self.boundaryCache.put(boundaryKey, boundaryResults)
+
+		if signalResults is None:
+			posArrays = self.pos.getBedArrays()
+			negArrays = self.neg.getBedArrays()
+
+			if threads > 1:
+				from simplenexuscaller import parallelCalling
+
+				logger.info(f"Calling TF signals and binding boundaries on each "
+							f"{'chromosome' if tileRows is None else 'tile'} "
+							f"with {threads} processes...")
+				with report.stage('callStrandsParallel',
+								  inputRows=len(self.pos) + len(self.neg)
+								  ) as record:
+					posResult, negResult, peakIndex = \
+						parallelCalling.callStrandsParallel(posArrays,
+															negArrays, maxWidth,
+															threads, tileRows,
+															**params)
+					record.setOutput(len(posResult[3]) + len(negResult[3]),
+									 'boundaries')
+			else:
+				logger.info("Calling TF signals and binding boundaries...")
+				posResult = callStrand(posArrays, '+', report=report, **params)
+				negResult = callStrand(negArrays, '-', report=report, **params)
+
+			signalResults = (posResult[:3], negResult[:3])
+			boundaryResults = (posResult[3], negResult[3])
+			self.signalCache.put(signalKey, signalResults)
+			self.boundaryCache.put(boundaryKey, boundaryResults)
+			if checkpoint is not None:
+				checkpoint.saveSignals(signalKey, signalResults)
+				checkpoint.saveBoundaries(boundaryKey, boundaryResults)
+
+		else:
+			for strand, strandResults in zip(['+', '-'], signalResults):
+				report.addCached('signalRanges', strand,
+								 len(strandResults[0]), 'signalRanges')
+				report.addCached('boundaries', strand, len(strandResults[2]),
+								 'boundaries')
+
+			if boundaryResults is None:
+				logger.info("Resolving dual boundaries of cached TF binding "
+							"boundaries...")
+				boundaryResults = tuple(
+						resolveStrand(strandResults[2], strand, distLimit,
+									  dualMethod, report)
+						for strand, strandResults in zip(['+', '-'],
+														 signalResults))
+				self.boundaryCache.put(boundaryKey, boundaryResults)
+				if checkpoint is not None:
+					checkpoint.saveBoundaries(boundaryKey, boundaryResults)
+			else:
+				for strand, boundaries in zip(['+', '-'], boundaryResults):
+					report.addCached('dualResolution', strand, len(boundaries),
+									 'boundaries')
+
+		self.signalRanges, self.signalSummits, self.posBounds = \
+			signalResults[0]
+		self.signalRangesNeg, self.signalSummitsNeg, self.negBounds = \
+			signalResults[1]
+		self.posBoundaries, self.negBoundaries = boundaryResults
+
+		logger.info("TF boundaries detected on + and - strand (respectively):")
+		logger.info(f"{len(self.posBoundaries)} {len(self.negBoundaries)}")
+		logger.info("Numbers should be roughly the same if chosen parameters "
+					"are good for the dataset.\n")
+
+		peaks = self.peakCache.get(peakKey)
+		if peaks is None and checkpoint is not None:
+			peakArrays = checkpoint.loadPeaks(peakKey)
+			if peakArrays is not None:
+				peaks = peakArrays[0].toFrame()
+				self.peakCache.put(peakKey, peaks)
+				report.addCached('peaks', outputs=len(peaks),
+								 outputType='peaks')
+		elif peaks is not None:
+			report.addCached('peaks', outputs=len(peaks), outputType='peaks')
+
+		if peaks is None:
+			logger.info("Calling peaks...\n")
+			# Call peaks by matching tf binding boundaries on + strand with
+			# closest boundary on - strand, and filtering these based on a
+			# minimum width.
+			with report.stage('peaks',
+							  inputRows=len(self.posBoundaries) +
+										len(self.negBoundaries)) as record:
+				if peakIndex is None:
+					peakIndex = callPeaks.matchBoundaryArrays(
+											self.posBoundaries,
+											self.negBoundaries, maxWidth)
+				peakArrays = callPeaks.getPeakArrays(self.posBoundaries,
+													 self.negBoundaries,
+													 *peakIndex)
+				peaks = peakArrays.toFrame()
+				record.setOutput(len(peaks), 'peaks')
+			self.peakCache.put(peakKey, peaks)
+			if checkpoint is not None:
+				checkpoint.savePeaks(peakKey, peakArrays)
+
+		self.peaks = peaks
+		report.metadata['peaks'] = len(peaks)
+		logger.info(f"Detected {len(self.peaks)} peaks.")
+
+		return self.peaks
+
+	def callRegionPeaks(self, regions, cutoff=10, falseInRowUpper=10,
+						nInRowCutoff=2, distLimit=40, maxWidth=100,
+						dualMethod='largestSignal', cutoffMethod='poisson',
+						cutoffLevel=None, report=None):
+		""" Calls the peaks overlapping a set of regions, only calling the \
+		rows near the regions; see callPeaksInRegions, including where the \
+		peaks are approximate. The stage results are not cached or stored.
+
+		Args:
+			regions (regionIndex.RegionIndex or str): The regions, or a bed \
+						file of the regions read with regionIndex.readRegions.
+
+			cutoff, falseInRowUpper, nInRowCutoff, distLimit, maxWidth, \
+			dualMethod, cutoffMethod, cutoffLevel, report: As in callPeaks. \
+						A cutoff of 'auto' is selected from the rows of pos \
+						and neg as stored, rather than only those near the \
+						regions.
+
+		Returns:
+			pandas.DataFrame: The peaks, also stored as self.peaks.
 		"""
+		if isinstance(regions, str):
+			regions = regionIndex.readRegions(regions)
+		if report is None:
+			report = RunReport()
+		self.report = report
+
+		if cutoff == 'auto':
+			with report.stage('selectCutoff',
+							  inputRows=len(self.pos) + len(self.neg)):
+				cutoff = self.selectCutoff(cutoffMethod, cutoffLevel)
+			report.metadata['cutoffSelection'] = self.cutoffSummary
+
+		params = {'cutoff': cutoff, 'falseInRowUpper': falseInRowUpper,
+				  'nInRowCutoff': nInRowCutoff, 'distLimit': distLimit,
+				  'maxWidth': maxWidth, 'dualMethod': dualMethod}
+		report.metadata['params'] = params
+		report.metadata['regions'] = {'regions': len(regions),
+									  'bases': regions.nBases}
 
-		print("Calling TF signals...")
-		# Calling 'signals' (defined as positions which could indicate an
-		# instance where the edge of a TF bound to the DNA has been detected.)
-		self.signalRanges, self.signalSummits = \
-			callSignals.callSignalRangesBed(self.pos,
-										  cutoff, falseInRowUpper, nInRowCutoff)
-
-		self.signalRangesNeg, self.signalSummitsNeg = \
-			callSignals.callSignalRangesBed(self.neg,
-										  cutoff, falseInRowUpper, nInRowCutoff)
-
-		print("Calling TF binding boundaries...")
-		# Calling the 'boundaries' (where the most likely \
-		# (or atleast most frequent) position where the edge of the
-		# TF binding occurs for each signal range.)
-		self.posBounds = callBoundaries.getBoundaries(self.signalRanges,
-												 	  self.signalSummits,
-												 	  self.pos)
-		self.negBounds = callBoundaries.getBoundaries(self.signalRangesNeg,
-												 	  self.signalSummitsNeg,
-												 	  self.neg)
-
-		print("Resolving dual boundaries...\n")
-		self.posBoundaries = callBoundaries.resolveBoundariesWithSignal(
-																self.posBounds,
-																distLimit)
-		self.negBoundaries = callBoundaries.resolveBoundariesWithSignal(
-																self.negBounds,
-																distLimit)
-		print("TF boundaries detected on + and - strand (respectively):")
-		print(self.posBoundaries.shape[0], self.negBoundaries.shape[0])
-		print("Numbers should be roughly the same if chosen parameters are good"
-			  " for the dataset.\n")
-
-		print("Calling peaks...\n")
-		# Call peaks by matching tf binding boundaries on + strand with closest
-		# boundary on - strand, and filtering these based on a minimum width.
-		self.peaks = callPeaks.getPeaks(self.posBoundaries, self.negBoundaries,
-										maxWidth)
-		print(f"Detected {len(self.peaks)} peaks.")
+		logger.info(f"Calling peaks in {len(regions)} regions...")
+		self.peaks = callPeaksInRegions(self.pos, self.neg, regions,
+										report=report, **params)
+		report.metadata['peaks'] = len(self.peaks)
+		logger.info(f"Detected {len(self.peaks)} peaks.")
 
 		return self.peaks
 
-	def write(self, fileName):
-		""" Writes the peaks to a bed file with columns: chr, start, end.
+	def selectCutoff(self, method='poisson', level=None):
+		""" Selects the cutoff from the distribution of the counts of both \
+		strands, storing the selection as self.cutoffSummary; see \
+		cutoffSelection.selectCutoffFromHistogram.
+
+		Returns:
+			int: The cutoff.
+		"""
+		cutoff, self.cutoffSummary = cutoffSelection.selectCutoff(
+											[self.pos, self.neg], method, level)
+
+		return cutoff
+
+	def sweepPeaks(self, grid, threads=1):
+		""" Calls peaks for each combination of a grid of parameters, sharing \
+		the stages common to several combinations; see parameterSweep.
+
+		Args:
+			grid (dict<str, list>): Values of each parameter of callPeaks to \
+									call peaks with, e.g. {'cutoff': [5, 10], \
+									'maxWidth': [50, 100]}. Parameters missing \
+									from the grid take the default of callPeaks.
+
+			threads (int): No. of processes to call the combinations with.
+
+		Returns:
+			pandas.DataFrame, list<pandas.DataFrame>: A summary of each \
+							combination and the peaks of each combination, \
+							as output by parameterSweep.sweepPeaks.
+		"""
+		from simplenexuscaller import parameterSweep
+
+		return parameterSweep.sweepPeaks(self.pos, self.neg, grid, threads)
+
+	def write(self, fileName, peakFormat='bed', compression='none'):
+		""" Writes the peaks to a bed file, by default with columns: chr, \
+		start, end.
+
+		Args:
+			fileName (str): File to write to.
+
+			peakFormat (str): One of peakWriter.peakFormats.
+
+			compression (str): One of peakWriter.compressions.
 		"""
 		if type(self.peaks) == type(None):
-			print("Need to call callPeaks() first.")
+			logger.warning("Need to call callPeaks() first.")
 			return
 
-		peakBedFile = self.peaks.loc[:, ['chr', 'start', 'end']]
-		peakBedFile.to_csv(fileName, sep='\t', index=False, header=False)
+		peakWriter.writePeaks(self.peaks, fileName, peakFormat, compression)
 
 
@@ -0,0 +1,236 @@
+""" Core engine which calls peaks on the columns of the bedGraphs as plain
+numpy arrays, without pandas. Each stage takes and returns arrays, or the
+callBoundaries.Boundaries and callPeaks.Peaks which hold them, so the arrays
+pass between stages without conversion to frames. NexusAnalysis and the
+functions on pandas frames in callSignals, callBoundaries and callPeaks are
+wrappers of these.
+
+To embed the caller, such as on tracks already in memory:
+
+	from simplenexuscaller import nexusEngine
+	peaks = nexusEngine.callPeakArrays(pos.getBedArrays(),
+									   neg.getBedArrays(), cutoff=5)
+
+where pos and neg are bedGraphTrack.BedGraphTrack, or the bedArrays are
+built directly; see callStrandSignals.
+"""
+
+import numpy
+from simplenexuscaller import callSignals, callBoundaries, callPeaks
+from simplenexuscaller.instrumentation import recordStage
+
+def callStrandSignals(bedArrays, cutoff, falseInRowUpper, nInRowCutoff,
+					  skipFirst=False, rowOffset=0, report=None, strand=None,
+					  chrom=None):
+	""" Calls the signal ranges and boundaries for one strand.
+
+	Args:
+		bedArrays (tuple): Strand columns as output by \
+						   BedGraphTrack.getBedArrays.
+
+		cutoff, falseInRowUpper, nInRowCutoff: As in NexusAnalysis.callPeaks.
+
+		skipFirst (bool): As in callSignals.getSignalRangeArrays.
+
+		rowOffset (int): Added to the output row indices, for where the \
+						 bedArrays are part of a larger bedGraph.
+
+		report (instrumentation.RunReport): Report to record the stages in, \
+											or None to not record them.
+
+		strand, chrom (str): Strand and chromosome the stages are recorded \
+							 as being of.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>, callBoundaries.Boundaries: Signal \
+						ranges as rows of [startRow, endRow], the summit of \
+						each range, and the boundaries.
+	"""
+	chroms, chromNames, starts, ends, counts = bedArrays
+
+	# Calling 'signals' (defined as positions which could indicate an
+	# instance where the edge of a TF bound to the DNA has been detected.)
+	with recordStage(report, 'signalRanges', strand, chrom,
+					 len(counts)) as record:
+		rangeStarts, rangeEnds, summits = callSignals.callSignalRangeArrays(
+										counts, chroms, ends - starts,
+										cutoff, falseInRowUpper, nInRowCutoff,
+										skipFirst)
+		record.setOutput(len(rangeStarts), 'signalRanges')
+
+	# Calling the 'boundaries' (where the most likely \
+	# (or atleast most frequent) position where the edge of the
+	# TF binding occurs for each signal range.)
+	with recordStage(report, 'boundaries', strand, chrom,
+					 len(rangeStarts)) as record:
+		bounds = callBoundaries.getBoundaryArrays(rangeStarts, summits,
+												  *bedArrays)
+		record.setOutput(len(bounds), 'boundaries')
+
+	signalRanges = numpy.column_stack((rangeStarts, rangeEnds)) + rowOffset
+	bounds.originIndex += rowOffset
+
+	return signalRanges, summits, bounds
+
+def resolveStrand(bounds, strand, distLimit, dualMethod, report=None,
+				  chrom=None):
+	""" Resolves the dual boundaries of one strand, as in \
+	callBoundaries.resolveDualBoundaryArrays; recording the stage in report \
+	as in callStrandSignals.
+	"""
+	with recordStage(report, 'dualResolution', strand, chrom,
+					 len(bounds)) as record:
+		boundaries = callBoundaries.resolveDualBoundaryArrays(
+											bounds, strand, distLimit, dualMethod)
+		record.setOutput(len(boundaries), 'boundaries')
+
+	return boundaries
+
+def callStrand(bedArrays, strand, cutoff, falseInRowUpper, nInRowCutoff,
+			   distLimit, dualMethod, skipFirst=False, rowOffset=0,
+			   report=None, chrom=None):
+	""" Calls the signal ranges, boundaries and resolves the dual boundaries \
+	for one strand.
+
+	Args:
+		bedArrays (tuple): Strand columns as output by \
+						   BedGraphTrack.getBedArrays.
+
+		strand (str): Whether the strand is + or -.
+
+		cutoff, falseInRowUpper, nInRowCutoff, distLimit, dualMethod: As in \
+													NexusAnalysis.callPeaks.
+
+		skipFirst, rowOffset, report, chrom: As in callStrandSignals.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>, callBoundaries.Boundaries, \
+		callBoundaries.Boundaries: Output of callStrandSignals, followed by \
+						the boundaries after resolving dual boundaries.
+	"""
+	signalRanges, summits, bounds = callStrandSignals(
+										bedArrays, cutoff, falseInRowUpper,
+										nInRowCutoff, skipFirst, rowOffset,
+										report, strand, chrom)
+	boundaries = resolveStrand(bounds, strand, distLimit, dualMethod, report,
+							   chrom)
+
+	return signalRanges, summits, bounds, boundaries
+
+def callPeakArrays(pos, neg, cutoff=10, falseInRowUpper=10, nInRowCutoff=2,
+				   distLimit=40, maxWidth=100, dualMethod='largestSignal',
+				   report=None):
+	""" Calls peaks on the columns of the + and - strand bedGraphs.
+
+	Args:
+		pos (tuple): + strand columns as output by \
+					 BedGraphTrack.getBedArrays; the chromosome codes, \
+					 the chromosome name of each code, starts, ends and \
+					 counts. Positions are in ascending order within each \
+					 chromosome.
+
+		neg (tuple): As for pos, except the - strand with counts as \
+					 absolute values.
+
+		cutoff, falseInRowUpper, nInRowCutoff, distLimit, maxWidth, \
+		dualMethod: As in NexusAnalysis.callPeaks.
+
+		report (instrumentation.RunReport): Report to record the stages in, \
+											or None.
+
+	Returns:
+		callPeaks.Peaks: The peaks, on the chromosome codes of pos.
+	"""
+	params = {'cutoff': cutoff, 'falseInRowUpper': falseInRowUpper,
+			  'nInRowCutoff': nInRowCutoff, 'distLimit': distLimit,
+			  'dualMethod': dualMethod}
+	posBoundaries = callStrand(pos, '+', report=report, **params)[3]
+	negBoundaries = callStrand(neg, '-', report=report, **params)[3]
+
+	with recordStage(report, 'peaks', inputRows=len(posBoundaries) +
+												len(negBoundaries)) as record:
+		peakIndex = callPeaks.matchBoundaryArrays(posBoundaries, negBoundaries,
+												  maxWidth)
+		peaks = callPeaks.getPeakArrays(posBoundaries, negBoundaries,
+										*peakIndex)
+		record.setOutput(len(peaks), 'peaks')
+
+	return peaks
+
+def callPeakArraysByChromosome(strandChroms, cutoff=10, falseInRowUpper=10,
+								nInRowCutoff=2, distLimit=40, maxWidth=100,
+								dualMethod='largestSignal', report=None,
+								checkpoint=None):
+	""" Calls peaks one chromosome at a time, so only one chromosome needs to \
+	be held in memory. Gives the same peaks as NexusAnalysis.callPeaks.
+
+	Args:
+		strandChroms (iterable<tuple<str, BedGraphTrack, BedGraphTrack>>):
+						The chromosome name, and the + and - strand track \
+						of that chromosome, for each chromosome in genome \
+						order; such as from bedGraphReader.iterStrandChroms. \
+						The track rowOffset gives the row in the whole bedGraph.
+
+		cutoff, falseInRowUpper, nInRowCutoff, distLimit, maxWidth, \
+		dualMethod: As in NexusAnalysis.callPeaks.
+
+		report (instrumentation.RunReport): Report to record the stages of \
+											each chromosome in, or None.
+
+		checkpoint (checkpoint.Checkpoint): Checkpoint to save the peaks of \
+						each chromosome to once called, or None. Chromosomes \
+						saved by an earlier run with the same inputs and \
+						parameters are loaded rather than called.
+
+	Yields:
+		str, callPeaks.Peaks: The chromosome name and the peaks called on \
+							  the chromosome.
+	"""
+	params = {'cutoff': cutoff, 'falseInRowUpper': falseInRowUpper,
+			  'nInRowCutoff': nInRowCutoff, 'distLimit': distLimit,
+			  'dualMethod': dualMethod}
+
+	# Whether the last signal range of the previous chromosome ended on its
+	# last position, see callSignals.getSignalRangeArrays.
+	skipFirst = {'+': False, '-': False}
+	strandBoundaries = {}
+	for chrom, pos, neg in strandChroms:
+		chromKey = tuple(params.values()) + (maxWidth, chrom)
+		saved = None if checkpoint is None else checkpoint.loadPeaks(chromKey)
+		if saved is not None:
+			peaks, meta = saved
+			skipFirst = meta['skipFirst']
+			yield chrom, peaks
+			continue
+
+		for strand, track in [('+', pos), ('-', neg)]:
+			if len(track) == 0:
+				strandBoundaries[strand] = callBoundaries.concatBoundaries(
+																[], [chrom])
+				continue
+
+			signalRanges, summits, bounds, boundaries = callStrand(
+									track.getBedArrays(), strand,
+									skipFirst=skipFirst[strand],
+									rowOffset=track.rowOffset, report=report,
+									chrom=chrom, **params)
+			skipFirst[strand] = len(signalRanges) > 0 and \
+							signalRanges[-1, 1] == track.rowOffset + len(track)
+			strandBoundaries[strand] = boundaries
+
+		with recordStage(report, 'peaks', chrom=chrom,
+						 inputRows=len(strandBoundaries['+']) +
+								   len(strandBoundaries['-'])) as record:
+			peakIndex = callPeaks.matchBoundaryArrays(strandBoundaries['+'],
+													  strandBoundaries['-'],
+													  maxWidth)
+			peaks = callPeaks.getPeakArrays(strandBoundaries['+'],
+											strandBoundaries['-'], *peakIndex)
+			record.setOutput(len(peaks), 'peaks')
+
+		if checkpoint is not None:
+			checkpoint.savePeaks(chromKey, peaks, {'skipFirst': {
+									strand: bool(skip)
+									for strand, skip in skipFirst.items()}})
+		yield chrom, peaks
+
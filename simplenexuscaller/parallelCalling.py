@@ -0,0 +1,407 @@
+""" Calls peaks on each chromosome separately in a process pool.
+
+Each stage of the peak calling stops at chromosome boundaries; signal ranges
+are not extended onto another chromosome, and dual boundaries and matched
++/- strand boundaries must be on the same chromosome. Calling each chromosome
+separately and merging the results in genome order therefore gives the same
+result as calling the whole genome at once. Large chromosomes can instead be
+split into tiles, see tiling, which are then called as the chromosomes are.
+
+The bedGraph columns are placed in shared memory, so the worker processes read
+them directly rather than having them pickled for each chromosome. Columns
+memory-mapped from a binaryCache are instead mapped from the cache files by
+each worker.
+"""
+
+import mmap
+import numpy
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from simplenexuscaller import callSignals, callBoundaries, callPeaks, tiling
+from simplenexuscaller.nexusEngine import callStrand
+
+# Shared arrays attached to by each worker process #
+workerBlocks = None
+workerArrays = None
+workerSpecKey = None
+
+class SharedArrays(object):
+	""" Copies numpy arrays into shared memory blocks, which worker processes \
+	attach to with attachSharedArrays. Arrays which are memory-mapped files \
+	are not copied, but mapped again by the workers.
+	"""
+
+	def __init__(self, arrays):
+		""" SharedArrays object constructor.
+
+			Args:
+				arrays (dict<str, numpy.array>): Numeric arrays to share.
+		"""
+		self.blocks = []
+		self.spec = {}
+		for name, array in arrays.items():
+			if isinstance(array, numpy.memmap) and \
+			   isinstance(array.base, mmap.mmap):
+				self.spec[name] = ('file', array.filename, array.offset,
+								   array.shape, array.dtype.str)
+				continue
+
+			array = numpy.ascontiguousarray(array)
+			block = shared_memory.SharedMemory(create=True,
+											   size=max(array.nbytes, 1))
+			numpy.ndarray(array.shape, dtype=array.dtype,
+						  buffer=block.buf)[:] = array
+
+			self.blocks.append(block)
+			self.spec[name] = ('shared', block.name, array.shape,
+							   array.dtype.str)
+
+	@property
+	def nbytes(self):
+		""" Shared memory used by the copied arrays.
+		"""
+		return sum(block.size for block in self.blocks)
+
+	def close(self):
+		""" Frees the shared memory blocks.
+		"""
+		for block in self.blocks:
+			block.close()
+			block.unlink()
+		self.blocks = []
+
+def attachSharedArrays(spec):
+	""" Attaches to arrays shared by SharedArrays.
+
+	Args:
+		spec (dict): SharedArrays.spec.
+
+	Returns:
+		list<shared_memory.SharedMemory>, dict<str, numpy.array>: The shared \
+						memory blocks, which must be kept open while using \
+						the arrays, and the arrays.
+	"""
+	blocks, arrays = [], {}
+	for name, (kind, *arraySpec) in spec.items():
+		if kind == 'file':
+			fileName, offset, shape, dtype = arraySpec
+			arrays[name] = numpy.memmap(fileName, dtype=dtype, mode='r',
+										offset=offset, shape=shape)
+			continue
+
+		blockName, shape, dtype = arraySpec
+		block = shared_memory.SharedMemory(name=blockName)
+		arrays[name] = numpy.ndarray(shape, dtype=dtype, buffer=block.buf)
+		blocks.append(block)
+
+	return blocks, arrays
+
+def initWorker(spec):
+	""" Attaches a worker process to the shared bedGraph columns.
+	"""
+	global workerBlocks, workerArrays
+	workerBlocks, workerArrays = attachSharedArrays(spec)
+
+def attachWorker(specKey, spec):
+	""" Attaches a worker process to the arrays of spec, unless already \
+	attached, detaching from the arrays it was attached to before. For pools \
+	shared by several SharedArrays, such as in batchCalling.
+	"""
+	global workerBlocks, workerArrays, workerSpecKey
+	if specKey == workerSpecKey:
+		return
+
+	workerArrays = None
+	for block in workerBlocks or []:
+		block.close()
+	workerBlocks, workerArrays = attachSharedArrays(spec)
+	workerSpecKey = specKey
+
+def getChromBlocks(chroms):
+	""" Gets the first row of each chromosome.
+
+	Args:
+		chroms (numpy.array<int>): Chromosome code of each position.
+
+	Returns:
+		numpy.array<int>: First row of each chromosome, followed by the number \
+						  of rows.
+	"""
+	blockStarts = numpy.flatnonzero(numpy.concatenate(([True],
+												 chroms[1:] != chroms[:-1])))
+	if len(numpy.unique(chroms[blockStarts])) != len(blockStarts):
+		raise ValueError("bedGraph must be sorted by chromosome to call each "
+						 "chromosome separately.")
+
+	return numpy.concatenate((blockStarts, [len(chroms)]))
+
+def getStrandBlock(strand, blockStarts, blocki, chromNames):
+	""" Gets the bedGraph columns of one chromosome from the shared arrays, \
+	in the format of BedGraphTrack.getBedArrays.
+	"""
+	start, end = blockStarts[blocki], blockStarts[blocki + 1]
+
+	return workerArrays[f'{strand}Chroms'][start:end], chromNames, \
+		   workerArrays[f'{strand}Starts'][start:end], \
+		   workerArrays[f'{strand}Ends'][start:end], \
+		   workerArrays[f'{strand}Counts'][start:end]
+
+def getSkipFirst(strand, blockStarts, blocki, chromNames,
+				 cutoff, falseInRowUpper, nInRowCutoff):
+	""" Whether the first position of a chromosome directly follows a signal \
+	range called at the end of the previous chromosome; see \
+	callSignals.getSignalRangeArrays.
+	"""
+	if blocki == 0:
+		return False
+
+	# Only possible where the last position of the previous chromosome and the
+	# first position of this chromosome are both signals.
+	counts = workerArrays[f'{strand}Counts']
+	start = blockStarts[blocki]
+	if counts[start - 1] < cutoff or counts[start] < cutoff:
+		return False
+
+	chroms, chromNames, starts, ends, counts = getStrandBlock(
+											strand, blockStarts, blocki - 1,
+											chromNames)
+	signals = callSignals.getSignalsInRange(counts, [cutoff],
+											returnNumber=False)[0]
+	prevSkipFirst = getSkipFirst(strand, blockStarts, blocki - 1, chromNames,
+								 cutoff, falseInRowUpper, nInRowCutoff)
+	rangeStarts, rangeEnds = callSignals.getSignalRangeArrays(
+										chroms, ends - starts, signals,
+										nInRowCutoff, falseInRowUpper,
+										prevSkipFirst)
+
+	return len(rangeEnds) > 0 and rangeEnds[-1] == len(chroms)
+
+def callStrandBlock(strand, blockStarts, blocki, chromNames, params):
+	""" Calls one chromosome of a strand with nexusEngine.callStrand, \
+	returning row indices into the whole strand.
+	"""
+	skipFirst = getSkipFirst(strand, blockStarts, blocki, chromNames,
+							 params['cutoff'], params['falseInRowUpper'],
+							 params['nInRowCutoff'])
+	bedArrays = getStrandBlock(strand, blockStarts, blocki, chromNames)
+
+	return callStrand(bedArrays, '+' if strand == 'pos' else '-',
+					  skipFirst=skipFirst, rowOffset=blockStarts[blocki],
+					  **params)
+
+def callChromosome(posBlock, negBlock, posChromNames, negChromNames,
+				   maxWidth, params):
+	""" Calls the + and - strand of one chromosome in a worker process.
+
+	Args:
+		posBlock (tuple): (blockStarts, blocki) for the chromosome on the + \
+						  strand, or None if the chromosome has no positions.
+
+		negBlock (tuple): As for posBlock, except on the - strand.
+
+		posChromNames (list<str>): Chromosome names of the + strand codes.
+
+		negChromNames (list<str>): Chromosome names of the - strand codes.
+
+		maxWidth (int): As in NexusAnalysis.callPeaks.
+
+		params (dict): Other parameters of nexusEngine.callStrand.
+
+	Returns:
+		tuple, tuple, tuple: Output of callStrandBlock on the + and - strand \
+					(or None), and the peaks as output by \
+					callPeaks.matchBoundaryArrays (or None).
+	"""
+	posResult, negResult, peakIndex = None, None, None
+	if posBlock is not None:
+		posResult = callStrandBlock('pos', *posBlock, posChromNames, params)
+	if negBlock is not None:
+		negResult = callStrandBlock('neg', *negBlock, negChromNames, params)
+
+	if posResult is not None and negResult is not None:
+		peakIndex = callPeaks.matchBoundaryArrays(posResult[3], negResult[3],
+												  maxWidth)
+
+	return posResult, negResult, peakIndex
+
+def callSharedChromosome(specKey, spec, *args):
+	""" Runs callChromosome on the arrays of spec, in a worker process of a \
+	pool not initialised with them; see attachWorker.
+	"""
+	attachWorker(specKey, spec)
+
+	return callChromosome(*args)
+
+def mergeStrandResults(results, chromNames):
+	""" Merges the output of callStrandBlock for each chromosome, in genome \
+	order, into the output of nexusEngine.callStrand.
+	"""
+	signalRanges = numpy.concatenate([result[0] for result in results] +
+									 [numpy.zeros((0, 2), dtype=numpy.int64)])
+	summits = numpy.concatenate([result[1] for result in results] +
+								[numpy.zeros(0, dtype=numpy.int64)])
+	bounds = callBoundaries.concatBoundaries([result[2] for result in results],
+											 chromNames)
+	boundaries = callBoundaries.concatBoundaries(
+										[result[3] for result in results],
+										chromNames)
+
+	return signalRanges, summits, bounds, boundaries
+
+def getChromosomeTasks(posChroms, posChromNames, negChroms, negChromNames):
+	""" Gets a task per chromosome, pairing the + and - strand by name.
+
+	Args:
+		posChroms (numpy.array<int>): + strand chromosome codes.
+
+		posChromNames (list<str>): Chromosome names of the + strand codes.
+
+		negChroms, negChromNames: As for posChroms and posChromNames, except \
+								  the - strand.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>, list<tuple>: The first row of each \
+				chromosome on the + and - strand as output by getChromBlocks, \
+				and (posBlocki, negBlocki) for each chromosome, where the \
+				block index is None for a chromosome missing on the strand. \
+				Sorted by the no. of rows, largest first, to balance the load.
+	"""
+	posBlockStarts = getChromBlocks(posChroms)
+	negBlockStarts = getChromBlocks(negChroms)
+
+	negBlocks = {negChromNames[negChroms[start]]: blocki
+				 for blocki, start in enumerate(negBlockStarts[:-1])}
+	tasks = []
+	for blocki, start in enumerate(posBlockStarts[:-1]):
+		negBlocki = negBlocks.pop(posChromNames[posChroms[start]], None)
+		tasks.append((blocki, negBlocki))
+	tasks.extend([(None, negBlocki) for negBlocki in negBlocks.values()])
+
+	def taskRows(task):
+		posBlocki, negBlocki = task
+		nRows = 0
+		if posBlocki is not None:
+			nRows += posBlockStarts[posBlocki+1] - posBlockStarts[posBlocki]
+		if negBlocki is not None:
+			nRows += negBlockStarts[negBlocki+1] - negBlockStarts[negBlocki]
+		return nRows
+
+	return posBlockStarts, negBlockStarts, sorted(tasks, key=taskRows,
+												  reverse=True)
+
+def getTaskBlocks(task, posBlockStarts, negBlockStarts):
+	""" Gets the posBlock and negBlock arguments of callChromosome for a task.
+	"""
+	posBlocki, negBlocki = task
+	return None if posBlocki is None else (posBlockStarts, posBlocki), \
+		   None if negBlocki is None else (negBlockStarts, negBlocki)
+
+def mergeChromosomeResults(results, posChromNames, negChromNames):
+	""" Merges the output of callChromosome for each task, in genome order.
+
+	Args:
+		results (dict<tuple, tuple>): Output of callChromosome for each task \
+									  as output by getChromosomeTasks.
+
+		posChromNames, negChromNames: As in getChromosomeTasks.
+
+	Returns:
+		tuple, tuple, tuple: As output by callStrandsParallel.
+	"""
+	posResults, negResults = {}, {}
+	for (posBlocki, negBlocki), (posResult, negResult, _) in results.items():
+		if posBlocki is not None:
+			posResults[posBlocki] = posResult
+		if negBlocki is not None:
+			negResults[negBlocki] = negResult
+
+	posOrder = sorted(posResults)
+	negOrder = sorted(negResults)
+	posResult = mergeStrandResults([posResults[blocki] for blocki in posOrder],
+								   posChromNames)
+	negResult = mergeStrandResults([negResults[blocki] for blocki in negOrder],
+								   negChromNames)
+
+	# Peak indices offset by the boundaries on the chromosomes before
+	posOffsets = dict(zip(posOrder, numpy.cumsum(
+					[0] + [len(posResults[blocki][3]) for blocki in posOrder])))
+	negOffsets = dict(zip(negOrder, numpy.cumsum(
+					[0] + [len(negResults[blocki][3]) for blocki in negOrder])))
+	posIndex, negIndex = [numpy.zeros(0, dtype=numpy.int64)], \
+						 [numpy.zeros(0, dtype=numpy.int64)]
+	# Peaks in genome order of the + strand, as from matching the whole genome
+	# at once
+	for posBlocki, negBlocki in sorted(task for task in results
+									   if task[0] is not None):
+		peakIndex = results[(posBlocki, negBlocki)][2]
+		if peakIndex is not None:
+			posIndex.append(peakIndex[0] + posOffsets[posBlocki])
+			negIndex.append(peakIndex[1] + negOffsets[negBlocki])
+
+	return posResult, negResult, (numpy.concatenate(posIndex),
+								  numpy.concatenate(negIndex))
+
+def callStrandsParallel(posArrays, negArrays, maxWidth, threads,
+						tileRows=None, **params):
+	""" Calls each chromosome separately in a process pool, giving the same \
+	result as calling both strands with nexusEngine.callStrand followed by \
+	callPeaks.matchBoundaryArrays.
+
+	Args:
+		posArrays (tuple): + strand columns as output by \
+						   BedGraphTrack.getBedArrays.
+
+		negArrays (tuple): As for posArrays, except the - strand.
+
+		maxWidth (int): As in NexusAnalysis.callPeaks.
+
+		threads (int): No. of worker processes.
+
+		tileRows (int): Where given, chromosomes are split into tiles of at \
+						least this many rows of both strands, each called as \
+						a separate task; see tiling.getTileTasks.
+
+		params: cutoff, falseInRowUpper, nInRowCutoff, distLimit and \
+				dualMethod as in NexusAnalysis.callPeaks.
+
+	Returns:
+		tuple, tuple, tuple: Output of nexusEngine.callStrand for the + and \
+					- strand, and the output of callPeaks.matchBoundaryArrays.
+	"""
+	posChroms, posChromNames = posArrays[0], posArrays[1]
+	negChroms, negChromNames = negArrays[0], negArrays[1]
+	if tileRows is not None:
+		posBlockStarts, negBlockStarts, tasks = tiling.getTileTasks(
+								posArrays, negArrays, tileRows, params['cutoff'],
+								params['falseInRowUpper'], params['distLimit'],
+								maxWidth)
+	else:
+		posBlockStarts, negBlockStarts, tasks = getChromosomeTasks(
+								posChroms, posChromNames, negChroms, negChromNames)
+
+	sharedArrays = SharedArrays(getSharedStrandArrays(posArrays, negArrays))
+	try:
+		with ProcessPoolExecutor(max_workers=min(threads, max(len(tasks), 1)),
+								 initializer=initWorker,
+								 initargs=(sharedArrays.spec,)) as pool:
+			futures = {task: pool.submit(callChromosome,
+										 *getTaskBlocks(task, posBlockStarts,
+														negBlockStarts),
+										 posChromNames, negChromNames,
+										 maxWidth, params)
+					   for task in tasks}
+			results = {task: future.result()
+					   for task, future in futures.items()}
+	finally:
+		sharedArrays.close()
+
+	return mergeChromosomeResults(results, posChromNames, negChromNames)
+
+def getSharedStrandArrays(posArrays, negArrays):
+	""" Gets the columns of both strands keyed as the worker processes read \
+	them, for SharedArrays.
+	"""
+	return {'posChroms': posArrays[0], 'posStarts': posArrays[2],
+			'posEnds': posArrays[3], 'posCounts': posArrays[4],
+			'negChroms': negArrays[0], 'negStarts': negArrays[2],
+			'negEnds': negArrays[3], 'negCounts': negArrays[4]}
@@ -0,0 +1,237 @@
+""" Calls peaks for each combination of a grid of parameters, sharing the
+stages common to several combinations.
+
+The signals of every cutoff are found in one call to
+callSignals.getSignalsInRange. Combinations with the same cutoff,
+falseInRowUpper and nInRowCutoff then share the signal ranges and boundaries,
+and those which also have the same distLimit and dualMethod share the resolved
+boundaries; only the matching of boundaries is run for every combination. Each
+set of combinations sharing the signal ranges is called as one task, in a
+process pool if more than one process is used.
+"""
+
+import itertools
+import numpy, pandas
+from concurrent.futures import ProcessPoolExecutor
+from simplenexuscaller import callSignals, callBoundaries, callPeaks, \
+							  parallelCalling, peakWriter
+
+paramNames = ['cutoff', 'falseInRowUpper', 'nInRowCutoff', 'distLimit',
+			  'maxWidth', 'dualMethod']
+
+# Defaults of NexusAnalysis.callPeaks, for parameters missing from a grid #
+defaultParams = {'cutoff': 10, 'falseInRowUpper': 10, 'nInRowCutoff': 2,
+				 'distLimit': 40, 'maxWidth': 100, 'dualMethod': 'largestSignal'}
+
+def getParamSets(grid):
+	""" Gets every combination of a grid of parameters.
+
+	Args:
+		grid (dict<str, list>): Values of each parameter of \
+								NexusAnalysis.callPeaks to call peaks with; \
+								parameters missing from the grid take the \
+								default of NexusAnalysis.callPeaks.
+
+	Returns:
+		list<dict>: The parameters of each combination.
+	"""
+	unknownParams = set(grid) - set(paramNames)
+	if len(unknownParams) > 0:
+		raise ValueError(f"Unknown parameters in grid: {sorted(unknownParams)}; "
+						 f"expected some of {paramNames}.")
+
+	values = [list(grid.get(name, [defaultParams[name]])) for name in paramNames]
+	return [dict(zip(paramNames, combo)) for combo in itertools.product(*values)]
+
+def getSignalTasks(paramSets):
+	""" Groups combinations which share the signal ranges.
+
+	Returns:
+		dict<tuple, list<int>>: The index of each combination in paramSets, \
+								keyed by (cutoff, falseInRowUpper, nInRowCutoff).
+	"""
+	tasks = {}
+	for parami, params in enumerate(paramSets):
+		signalKey = (params['cutoff'], params['falseInRowUpper'],
+					 params['nInRowCutoff'])
+		tasks.setdefault(signalKey, []).append(parami)
+
+	return tasks
+
+def getSweepArrays(pos, neg, cutoffs):
+	""" Gets the columns of each strand and the signals of each cutoff.
+
+	Args:
+		pos (BedGraphTrack): + strand.
+
+		neg (BedGraphTrack): - strand.
+
+		cutoffs (list<int>): Cutoffs of the grid.
+
+	Returns:
+		dict<str, numpy.array>, dict<str, list<str>>: The chroms, starts, ends \
+				and counts of each strand, keyed as '{strand}Chroms' etc. where \
+				strand is 'pos' or 'neg', along with '{strand}Signals', a \
+				matrix of the signals of each cutoff as rows; and the \
+				chromosome names of each strand.
+	"""
+	arrays, chromNames = {}, {}
+	for strand, track in [('pos', pos), ('neg', neg)]:
+		chroms, chromNames[strand], starts, ends, counts = track.getBedArrays()
+		signals = callSignals.getSignalsInRange(counts, cutoffs,
+												returnNumber=False)
+		arrays.update({f'{strand}Chroms': chroms, f'{strand}Starts': starts,
+					   f'{strand}Ends': ends, f'{strand}Counts': counts,
+					   f'{strand}Signals': numpy.array(signals, dtype=bool
+											  ).reshape(len(cutoffs), len(counts))})
+
+	return arrays, chromNames
+
+def sweepSignalTask(arrays, chromNames, cutoffi, paramSets):
+	""" Calls the peaks of combinations sharing the signal ranges.
+
+	Args:
+		arrays (dict<str, numpy.array>): As output by getSweepArrays.
+
+		chromNames (dict<str, list<str>>): As output by getSweepArrays.
+
+		cutoffi (int): Row of the signals of the cutoff in arrays.
+
+		paramSets (list<dict>): Combinations with the same cutoff, \
+								falseInRowUpper and nInRowCutoff.
+
+	Returns:
+		list<tuple<int, int, pandas.DataFrame>>: No. of + and - strand \
+					boundaries after resolving dual boundaries, and the peaks \
+					as output by NexusAnalysis.callPeaks, for each combination.
+	"""
+	falseInRowUpper = paramSets[0]['falseInRowUpper']
+	nInRowCutoff = paramSets[0]['nInRowCutoff']
+
+	strandBounds = {}
+	for strand, strandName in [('+', 'pos'), ('-', 'neg')]:
+		chroms = arrays[f'{strandName}Chroms']
+		starts = arrays[f'{strandName}Starts']
+		ends = arrays[f'{strandName}Ends']
+		counts = arrays[f'{strandName}Counts']
+
+		rangeStarts, rangeEnds = callSignals.getSignalRangeArrays(
+								chroms, ends - starts,
+								arrays[f'{strandName}Signals'][cutoffi],
+								nInRowCutoff, falseInRowUpper)
+		summits = callSignals.getRangeSummitArray(counts, rangeStarts, rangeEnds)
+		strandBounds[strand] = callBoundaries.getBoundaryArrays(
+									rangeStarts, summits, chroms,
+									chromNames[strandName], starts, ends, counts)
+
+	resolved, results = {}, []
+	for params in paramSets:
+		resolveKey = (params['distLimit'], params['dualMethod'])
+		if resolveKey not in resolved:
+			resolved[resolveKey] = [callBoundaries.resolveDualBoundaryArrays(
+										strandBounds[strand], strand, *resolveKey)
+									for strand in ['+', '-']]
+
+		posBoundaries, negBoundaries = resolved[resolveKey]
+		peaks = callPeaks.getBoundaryPeaks(posBoundaries, negBoundaries,
+										   params['maxWidth'])
+		results.append((len(posBoundaries), len(negBoundaries), peaks))
+
+	return results
+
+def sweepSignalTaskWorker(chromNames, cutoffi, paramSets):
+	""" Runs sweepSignalTask in a worker process, on the arrays shared by \
+	sweepPeaks.
+	"""
+	return sweepSignalTask(parallelCalling.workerArrays, chromNames, cutoffi,
+						   paramSets)
+
+def sweepPeaks(pos, neg, grid, threads=1):
+	""" Calls peaks for each combination of a grid of parameters.
+
+	Args:
+		pos (BedGraphTrack): + strand, as stored by NexusAnalysis.
+
+		neg (BedGraphTrack): - strand, as stored by NexusAnalysis.
+
+		grid (dict<str, list>): As in getParamSets.
+
+		threads (int): No. of processes to call the combinations with.
+
+	Returns:
+		pandas.DataFrame, list<pandas.DataFrame>: A summary with a row per \
+				combination, with the parameters followed by the no. of \
+				boundaries on the + and - strand, the boundaryBalance \
+				((+ - -) / (+ + -), 0 where balanced) and the no. of peaks; \
+				and the peaks of each combination, as output by \
+				NexusAnalysis.callPeaks.
+	"""
+	paramSets = getParamSets(grid)
+	cutoffs = sorted(set(params['cutoff'] for params in paramSets))
+	cutoffIndex = {cutoff: cutoffi for cutoffi, cutoff in enumerate(cutoffs)}
+	arrays, chromNames = getSweepArrays(pos, neg, cutoffs)
+	tasks = getSignalTasks(paramSets)
+
+	taskArgs = {signalKey: (chromNames, cutoffIndex[signalKey[0]],
+							[paramSets[parami] for parami in paramIndices])
+				for signalKey, paramIndices in tasks.items()}
+	if threads > 1:
+		sharedArrays = parallelCalling.SharedArrays(arrays)
+		try:
+			with ProcessPoolExecutor(max_workers=min(threads, len(tasks)),
+									 initializer=parallelCalling.initWorker,
+									 initargs=(sharedArrays.spec,)) as pool:
+				futures = {signalKey: pool.submit(sweepSignalTaskWorker, *args)
+						   for signalKey, args in taskArgs.items()}
+				taskResults = {signalKey: future.result()
+							   for signalKey, future in futures.items()}
+		finally:
+			sharedArrays.close()
+	else:
+		taskResults = {signalKey: sweepSignalTask(arrays, *args)
+					   for signalKey, args in taskArgs.items()}
+
+	# Results in the order of the combinations #
+	results = [None] * len(paramSets)
+	for signalKey, paramIndices in tasks.items():
+		for parami, result in zip(paramIndices, taskResults[signalKey]):
+			results[parami] = result
+
+	summary = pandas.DataFrame(paramSets, columns=paramNames)
+	summary['posBoundaries'] = [result[0] for result in results]
+	summary['negBoundaries'] = [result[1] for result in results]
+	nBoundaries = summary['posBoundaries'] + summary['negBoundaries']
+	summary['boundaryBalance'] = (summary['posBoundaries'] -
+								  summary['negBoundaries']) / \
+								 nBoundaries.where(nBoundaries > 0, 1)
+	summary['peaks'] = [len(result[2]) for result in results]
+
+	return summary, [result[2] for result in results]
+
+def getSweepFileName(output, params):
+	""" Gets the peak file name of a combination of parameters.
+	"""
+	return f"{output}_c{params['cutoff']}_f{params['falseInRowUpper']}" \
+		   f"_n{params['nInRowCutoff']}_d{params['distLimit']}" \
+		   f"_m{params['maxWidth']}_{params['dualMethod']}.bed"
+
+def writeSweep(summary, peaksList, output):
+	""" Writes the peaks of each combination to a bed file, and the summary \
+	with the file name of each combination to {output}_summary.tsv.
+
+	Args:
+		summary (pandas.DataFrame): As output by sweepPeaks.
+
+		peaksList (list<pandas.DataFrame>): As output by sweepPeaks.
+
+		output (str): Prefix of the output files.
+	"""
+	fileNames = []
+	for params, peaks in zip(summary.loc[:, paramNames].to_dict('records'),
+							 peaksList):
+		fileName = getSweepFileName(output, params)
+		peakWriter.writePeaks(peaks, fileName)
+		fileNames.append(fileName)
+
+	summary.assign(fileName=fileNames).to_csv(f'{output}_summary.tsv',
+											  sep='\t', index=False)
@@ -0,0 +1,143 @@
+""" Lazy generator pipeline which calls peaks from iterables of bedGraph records
+or chunks, yielding the peaks of each chromosome as soon as it is called.
+
+Each stage is a generator transforming the output of the stage before, so only
+the chromosome being called and one chunk of each strand are held in memory,
+and nothing is read until the peaks are iterated:
+
+	records -> iterRecordChunks -> bedGraphReader.iterChunkChroms
+			-> bedGraphReader.pairStrandChroms
+			-> nexusEngine.callPeakArraysByChromosome
+
+To call peaks on records from another source, such as a tabix query or a
+stream of alignments already counted:
+
+	from simplenexuscaller import peakPipeline
+	for chrom, peaks in peakPipeline.iterPeaks(posRecords, negRecords,
+											   cutoff=5):
+		...
+
+Inputs are assumed to be sorted as for bedGraphReader.iterStrandChroms.
+"""
+
+import itertools
+import numpy
+from simplenexuscaller import bedGraphReader, bedGraphTrack, nexusEngine
+
+def iterRecordChunks(records, absCounts=False, chunkSize=100000):
+	""" Batches bedGraph records into chunks of compact arrays.
+
+	Args:
+		records (iterable<tuple>): (chr, start, end, count) of each row.
+
+		absCounts (bool): As in bedGraphReader.readBedGraph.
+
+		chunkSize (int): No. of records per chunk.
+
+	Yields:
+		tuple: Chunks as output by bedGraphReader.iterChunks.
+	"""
+	records = iter(records)
+	while True:
+		batch = list(itertools.islice(records, chunkSize))
+		if len(batch) == 0:
+			return
+
+		chroms, starts, ends, counts = zip(*batch)
+		chroms = numpy.array(chroms, dtype=object)
+		blockStarts = numpy.flatnonzero(numpy.concatenate(([True],
+												 chroms[1:] != chroms[:-1])))
+		blockLens = numpy.diff(numpy.concatenate((blockStarts, [len(batch)])))
+		yield chroms[blockStarts].tolist(), blockLens, \
+			  bedGraphTrack.getCoordArray(starts), \
+			  bedGraphTrack.getCoordArray(ends), \
+			  bedGraphTrack.getCountArray(counts, absCounts)
+
+def iterSourceChunks(source, absCounts=False, chunkSize=100000):
+	""" Gets chunks as output by bedGraphReader.iterChunks from a source of \
+	one strand, read lazily.
+
+	Args:
+		source (str, or iterable): A bedGraph file name; or an iterable of \
+						(chr, start, end, count) records, of chunks as output \
+						by bedGraphReader.iterChunks, or of pandas frames \
+						with columns [chr, start, end, count].
+
+		absCounts (bool): As in bedGraphReader.readBedGraph.
+
+		chunkSize (int): No. of rows per chunk, where read from a file or \
+						 batched from records.
+	"""
+	if isinstance(source, str):
+		return bedGraphReader.iterChunks(source, absCounts, chunkSize)
+
+	items = iter(source)
+	first = next(items, None)
+	if first is None:
+		return iter([])
+	items = itertools.chain([first], items)
+
+	if hasattr(first, 'columns'):
+		return (bedGraphReader.getChunkArrays(frame, absCounts)
+				for frame in items)
+	if isinstance(first[0], str):
+		return iterRecordChunks(items, absCounts, chunkSize)
+	if absCounts:
+		return ((blockNames, blockLens, starts, ends,
+				 bedGraphTrack.getCountArray(counts, absCounts))
+				for blockNames, blockLens, starts, ends, counts in items)
+
+	return items
+
+def iterPeaks(pos, neg, cutoff=10, falseInRowUpper=10, nInRowCutoff=2,
+			  distLimit=40, maxWidth=100, dualMethod='largestSignal',
+			  chunkSize=100000, prefetchDepth=0, asFrames=False, report=None,
+			  checkpoint=None):
+	""" Calls peaks lazily, yielding the peaks of each chromosome once the \
+	chromosome has been read from both strands. Gives the same peaks as \
+	NexusAnalysis.callPeaks.
+
+	Args:
+		pos (str, or iterable): The + strand, as a source for \
+								iterSourceChunks.
+
+		neg (str, or iterable): As for pos, except the - strand, whose counts \
+								may be negative.
+
+		cutoff, falseInRowUpper, nInRowCutoff, distLimit, maxWidth, \
+		dualMethod: As in NexusAnalysis.callPeaks, except the cutoff must be \
+					a number, since an 'auto' cutoff needs the whole genome.
+
+		chunkSize (int): As in iterSourceChunks.
+
+		prefetchDepth (int): As in bedGraphReader.iterStrandChroms.
+
+		asFrames (bool): Whether to yield the peaks as pandas frames, as \
+						 from NexusAnalysis.callPeaks, rather than as \
+						 callPeaks.Peaks.
+
+		report, checkpoint: As in nexusEngine.callPeakArraysByChromosome.
+
+	Yields:
+		str, callPeaks.Peaks: The chromosome name and the peaks called on \
+							  the chromosome.
+	"""
+	if isinstance(cutoff, str):
+		raise ValueError("iterPeaks needs a numeric cutoff, "
+						 f"not '{cutoff}'.")
+
+	strandIters = []
+	for source, absCounts in [(pos, False), (neg, True)]:
+		chroms = bedGraphReader.iterChunkChroms(
+							iterSourceChunks(source, absCounts, chunkSize))
+		strandIters.append(bedGraphReader.iterPrefetched(chroms,
+														 prefetchDepth))
+	strandChroms = bedGraphReader.pairStrandChroms(*strandIters)
+	chromPeaks = nexusEngine.callPeakArraysByChromosome(
+						strandChroms, cutoff=cutoff,
+						falseInRowUpper=falseInRowUpper,
+						nInRowCutoff=nInRowCutoff, distLimit=distLimit,
+						maxWidth=maxWidth, dualMethod=dualMethod,
+						report=report, checkpoint=checkpoint)
+	for chrom, peaks in chromPeaks:
+		yield chrom, peaks.toFrame() if asFrames else peaks
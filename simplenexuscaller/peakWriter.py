@@ -0,0 +1,201 @@
+""" Writes peaks to bed files in chunks, such as one chromosome at a time as
+each is called, optionally gzip or BGZF compressed.
+
+Rather than DataFrame.to_csv, each chunk is formatted with a single %
+operation over a format string repeated for every row, which formats the
+values in C and is around twice as fast.
+
+Peaks are written in one of the peakFormats:
+
+	bed: chr, start, end.
+
+	extended: chr, start, end, width, posCount, negCount, originIndex1, \
+	originIndex2; the counts at the + and - strand boundaries the peak \
+	starts and ends at, and the rows of those boundaries in the bedGraphs. \
+	Followed by posSignal, negSignal and signal, the total counts over the \
+	peak, where the peaks were scored by NexusAnalysis.scorePeaks.
+
+	narrowPeak: The ENCODE narrowPeak format; chr, start, end, name, score \
+	(the summed boundary counts, capped at 1000), strand, signalValue (the \
+	summed boundary counts), pValue, qValue and peak, where the values not \
+	estimated are -1.
+"""
+
+import gzip, queue, threading
+import numpy
+from simplenexuscaller import bgzf
+
+peakFormats = ['bed', 'extended', 'narrowPeak']
+compressions = ['none', 'gzip', 'bgzf']
+chunkRows = 100000
+
+def getPeakFileName(output, peakFormat='bed', compression='none'):
+	""" Gets the peak file name for an output prefix.
+	"""
+	suffix = '.narrowPeak' if peakFormat == 'narrowPeak' else '.bed'
+	return output + suffix + ('' if compression == 'none' else '.gz')
+
+def getCountFormat(counts):
+	""" Gets the %-format of counts, which are integers unless the bedGraph \
+	counts were not.
+	"""
+	return '%d' if counts.dtype.kind in 'iu' else '%.7g'
+
+def getPeakColumns(peaks, peakFormat):
+	""" Gets the columns written for peaks as output by \
+	callPeaks.getPeakFrame, and the format of a row.
+
+	Returns:
+		list<numpy.array>, str: The columns, and the %-format of a row.
+	"""
+	chroms = peaks['chr'].to_numpy(dtype=object)
+	starts, ends = peaks['start'].to_numpy(), peaks['end'].to_numpy()
+	if peakFormat == 'bed':
+		return [chroms, starts, ends], '%s\t%d\t%d\n'
+
+	posCounts = peaks['posCount'].to_numpy()
+	negCounts = peaks['negCount'].to_numpy()
+	if peakFormat == 'extended':
+		countFormat = getCountFormat(posCounts)
+		columns = [chroms, starts, ends, peaks['width'].to_numpy(), posCounts,
+				   negCounts, peaks['originIndex1'].to_numpy(),
+				   peaks['originIndex2'].to_numpy()]
+		rowFormat = f'%s\t%d\t%d\t%d\t{countFormat}\t{countFormat}\t%d\t%d'
+		if 'signal' in peaks:
+			for column in ['posSignal', 'negSignal', 'signal']:
+				columns.append(peaks[column].to_numpy())
+				rowFormat += '\t' + getCountFormat(columns[-1])
+
+		return columns, rowFormat + '\n'
+
+	if peakFormat == 'narrowPeak':
+		signal = posCounts.astype(numpy.int64 if posCounts.dtype.kind in 'iu'
+								  else numpy.float64) + negCounts
+		return [chroms, starts, ends, numpy.minimum(signal, 1000), signal], \
+			   f'%s\t%d\t%d\t.\t%d\t.\t{getCountFormat(signal)}' \
+			   '\t-1\t-1\t-1\n'
+
+	raise ValueError(f"Unknown peak format '{peakFormat}', expected one of "
+					 f"{peakFormats}.")
+
+def formatPeaks(peaks, peakFormat='bed'):
+	""" Formats peaks as output by callPeaks.getPeakFrame as lines of text.
+	"""
+	columns, rowFormat = getPeakColumns(peaks, peakFormat)
+	values = numpy.empty(len(peaks) * len(columns), dtype=object)
+	for columni, column in enumerate(columns):
+		values[columni::len(columns)] = column.tolist()
+
+	return (rowFormat * len(peaks)) % tuple(values.tolist())
+
+class PeakWriter(object):
+	""" Writes peaks to a file in chunks, as they are called.
+	"""
+
+	def __init__(self, fileName, peakFormat='bed', compression='none'):
+		""" PeakWriter object constructor, which opens the file.
+
+			Args:
+				fileName (str): File to write to.
+
+				peakFormat (str): One of peakFormats.
+
+				compression (str): One of compressions.
+		"""
+		if peakFormat not in peakFormats:
+			raise ValueError(f"Unknown peak format '{peakFormat}', expected "
+							 f"one of {peakFormats}.")
+
+		self.peakFormat = peakFormat
+		self.nPeaks = 0
+		if compression == 'gzip':
+			self.peakFile = gzip.open(fileName, 'wb', compresslevel=6)
+		elif compression == 'bgzf':
+			self.peakFile = bgzf.BgzfWriter(fileName)
+		elif compression == 'none':
+			self.peakFile = open(fileName, 'wb')
+		else:
+			raise ValueError(f"Unknown compression '{compression}', expected "
+							 f"one of {compressions}.")
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *excInfo):
+		self.close()
+
+	def write(self, peaks):
+		""" Writes peaks as output by callPeaks.getPeakFrame, in chunks of \
+		chunkRows.
+		"""
+		for start in range(0, len(peaks), chunkRows):
+			self.peakFile.write(formatPeaks(peaks.iloc[start:start + chunkRows],
+											self.peakFormat).encode())
+		self.nPeaks += len(peaks)
+
+	def close(self):
+		self.peakFile.close()
+
+class BackgroundPeakWriter(PeakWriter):
+	""" A PeakWriter which formats and writes the peaks in a background \
+	thread, so that writing the peaks of one chromosome overlaps with \
+	calling the next.
+	"""
+
+	def __init__(self, fileName, peakFormat='bed', compression='none',
+				 depth=1):
+		""" BackgroundPeakWriter object constructor, which opens the file and \
+		starts the writing thread.
+
+			Args:
+				fileName, peakFormat, compression: As for PeakWriter.
+
+				depth (int): No. of peak frames which may be queued to write \
+							 before write blocks.
+		"""
+		super().__init__(fileName, peakFormat, compression)
+		self.peakQueue = queue.Queue(max(depth, 1))
+		self.error = None
+		self.writerThread = threading.Thread(target=self.writeQueued,
+											 daemon=True)
+		self.writerThread.start()
+
+	def writeQueued(self):
+		""" Writes the queued peaks until close. After an error, the queue is \
+		still emptied so that write does not block.
+		"""
+		while True:
+			peaks = self.peakQueue.get()
+			if peaks is None:
+				return
+			if self.error is None:
+				try:
+					PeakWriter.write(self, peaks)
+				except BaseException as error:
+					self.error = error
+
+	def write(self, peaks):
+		""" Queues peaks to write, raising any error writing earlier peaks.
+		"""
+		if self.error is not None:
+			raise self.error
+		self.peakQueue.put(peaks)
+
+	def close(self):
+		""" Waits for the queued peaks to be written and closes the file, \
+		where not already closed.
+		"""
+		if not self.writerThread.is_alive():
+			return
+
+		self.peakQueue.put(None)
+		self.writerThread.join()
+		super().close()
+		if self.error is not None:
+			raise self.error
+
+def writePeaks(peaks, fileName, peakFormat='bed', compression='none'):
+	""" Writes peaks as output by callPeaks.getPeakFrame to a file.
+	"""
+	with PeakWriter(fileName, peakFormat, compression) as writer:
+		writer.write(peaks)
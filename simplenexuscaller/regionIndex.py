@@ -0,0 +1,167 @@
+""" An interval index over a set of genomic regions, such as a panel of
+promoters, for calling peaks in the regions only.
+
+The regions of each chromosome are merged and kept as sorted arrays of starts
+and ends, so the regions overlapping a set of positions are found with
+numpy.searchsorted. Rows of a bedGraph sorted by position are likewise found
+for each region with a binary search, so calling a panel of regions on a
+memory-mapped bedGraph touches only the rows of the panel.
+
+Signal ranges, dual boundaries and peaks near a region can depend on rows
+outside the region, so regions are expanded by a margin (see getRegionMargin)
+before the rows are taken; peaks are then kept where they overlap a region.
+The margin is not an exact bound: signals are linked by the length of the rows
+between them, so across a gap in the bedGraph however long, and dual boundaries
+can chain for more than distLimit, so the peaks called near a region are
+approximate where such a chain reaches past the margin. Exact cuts need the
+signals of the whole chromosome (see tiling.getSafeCuts), which reading only
+the rows near the regions avoids.
+"""
+
+import numpy, pandas
+
+def getRegionMargin(falseInRowUpper, maxWidth, distLimit):
+	""" Gets the no. of bases either side of a region whose rows are called \
+	with the region: a signal range is extended over up to falseInRowUpper \
+	bases without signal, dual boundaries are up to distLimit apart, and a \
+	peak overlapping the region extends up to maxWidth past it.
+	"""
+	return falseInRowUpper + maxWidth + distLimit
+
+class RegionIndex(object):
+	""" Non-overlapping regions of each chromosome, sorted by start.
+	"""
+
+	def __init__(self, chroms, starts, ends):
+		""" RegionIndex object constructor.
+
+			Args:
+				chroms (list<str>): Chromosome of each region.
+
+				starts (list<int>): Start of each region, 0-based.
+
+				ends (list<int>): End of each region, exclusive.
+		"""
+		chroms = numpy.asarray(chroms, dtype=object)
+		starts = numpy.asarray(starts, dtype=numpy.int64)
+		ends = numpy.asarray(ends, dtype=numpy.int64)
+
+		self.regions = {}
+		for chrom in pandas.unique(chroms):
+			chromStarts, chromEnds = starts[chroms == chrom], \
+									 ends[chroms == chrom]
+			order = numpy.argsort(chromStarts, kind='stable')
+			chromStarts, chromEnds = chromStarts[order], chromEnds[order]
+
+			# Merging overlapping and adjacent regions
+			maxEnds = numpy.maximum.accumulate(chromEnds)
+			newRegion = numpy.concatenate(([True],
+										   chromStarts[1:] > maxEnds[:-1]))
+			firsts = numpy.flatnonzero(newRegion)
+			lasts = numpy.concatenate((firsts[1:], [len(chromStarts)])) - 1
+			self.regions[chrom] = (chromStarts[firsts], maxEnds[lasts])
+
+	def __len__(self):
+		return sum(len(starts) for starts, ends in self.regions.values())
+
+	@property
+	def nBases(self):
+		""" No. of bases in the regions.
+		"""
+		return int(sum((ends - starts).sum()
+					   for starts, ends in self.regions.values()))
+
+	def expand(self, margin):
+		""" Gets the regions extended by margin bases either side, merging \
+		regions which then overlap.
+		"""
+		chroms, starts, ends = [], [], []
+		for chrom, (chromStarts, chromEnds) in self.regions.items():
+			chroms.extend([chrom] * len(chromStarts))
+			starts.append(numpy.maximum(chromStarts - margin, 0))
+			ends.append(chromEnds + margin)
+
+		return RegionIndex(chroms,
+						   numpy.concatenate(starts + [numpy.zeros(0)]),
+						   numpy.concatenate(ends + [numpy.zeros(0)]))
+
+	def getOverlapMask(self, chroms, starts, ends):
+		""" Whether each interval overlaps a region.
+
+		Args:
+			chroms (numpy.array<str>): Chromosome of each interval.
+
+			starts (numpy.array<int>): Start of each interval.
+
+			ends (numpy.array<int>): End of each interval, exclusive.
+
+		Returns:
+			numpy.array<bool>: Whether each interval overlaps a region.
+		"""
+		chroms = numpy.asarray(chroms, dtype=object)
+		starts = numpy.asarray(starts)
+		ends = numpy.asarray(ends)
+		mask = numpy.zeros(len(chroms), dtype=bool)
+		for chrom in pandas.unique(chroms):
+			if chrom not in self.regions:
+				continue
+
+			rows = numpy.flatnonzero(chroms == chrom)
+			regionStarts, regionEnds = self.regions[chrom]
+			# The last region starting before the interval ends is the only
+			# candidate, since the regions do not overlap and are sorted.
+			regioni = numpy.searchsorted(regionStarts, ends[rows],
+										 side='left') - 1
+			mask[rows] = (regioni >= 0) & \
+						 (regionEnds[numpy.maximum(regioni, 0)] > starts[rows])
+
+		return mask
+
+	def getRowWindows(self, track):
+		""" Gets the rows of a track overlapping each region.
+
+		Args:
+			track (bedGraphTrack.BedGraphTrack): Track sorted by position \
+												 within each chromosome.
+
+		Returns:
+			dict<str, numpy.array<int>>: The first and last + 1 row of the \
+						track overlapping each region of each chromosome, as \
+						rows of [startRow, endRow], in the order of the \
+						regions; startRow == endRow for regions without rows.
+		"""
+		windows = {}
+		for chrom, (regionStarts, regionEnds) in self.regions.items():
+			if chrom not in track.chromNames:
+				windows[chrom] = numpy.zeros((len(regionStarts), 2),
+											 dtype=numpy.int64)
+				continue
+
+			code = track.chromNames.index(chrom)
+			offset = track.chromOffsets[code]
+			rows = slice(offset, track.chromOffsets[code + 1])
+			startRows = numpy.searchsorted(track.ends[rows], regionStarts,
+										   side='right')
+			endRows = numpy.searchsorted(track.starts[rows], regionEnds,
+										 side='left')
+			windows[chrom] = offset + numpy.column_stack(
+									(startRows, numpy.maximum(endRows, startRows)))
+
+		return windows
+
+def readRegions(fileName):
+	""" Reads regions from a bed file of [chr, start, end, ...], with no \
+	column headers; track and browser lines and lines starting with # are \
+	skipped.
+
+	Returns:
+		RegionIndex: The regions.
+	"""
+	bedFrame = pandas.read_csv(fileName, sep='\t', header=None, usecols=[0, 1, 2],
+							   names=['chr', 'start', 'end'], comment='#',
+							   dtype={'chr': str})
+	bedFrame = bedFrame.loc[~bedFrame['chr'].str.startswith(('track', 'browser'))]
+
+	return RegionIndex(bedFrame['chr'].tolist(),
+					   bedFrame['start'].astype(numpy.int64),
+					   bedFrame['end'].astype(numpy.int64))
@@ -0,0 +1,248 @@
+""" Pools the bedGraphs of replicates by summing their counts, optionally
+weighted, as the bedGraphs are read; so the replicates are called as one
+library without writing a pooled bedGraph.
+
+The replicates are read one chromosome at a time and aligned by chromosome
+with a k-way merge, so only one chromosome of each replicate is held in
+memory. The rows of a chromosome are split at the starts and ends of the rows
+of every replicate, as in bedtools unionbedg, and each piece covered by a row
+of any replicate is given the summed counts of the replicates covering it.
+Pieces covered by no replicate remain gaps in the pooled bedGraph.
+"""
+
+import collections
+import numpy
+from simplenexuscaller import bedGraphReader, bedGraphTrack
+
+def getWeights(nReplicates, weights=None):
+	""" Gets the weight of each replicate, 1 for each where not given.
+	"""
+	if weights is None:
+		return [1] * nReplicates
+	if len(weights) != nReplicates:
+		raise ValueError(f"Expected a weight for each of the {nReplicates} "
+						 f"replicates, but got {len(weights)} weights.")
+
+	return list(weights)
+
+def mergeIntervals(replicates, weights=None):
+	""" Sums the counts of the replicate rows on one chromosome.
+
+	Args:
+		replicates (list<tuple>): The starts, ends and counts of the rows of \
+						each replicate, sorted and not overlapping.
+
+		weights (list<float>): Weight of the counts of each replicate, or \
+							   None to sum the counts.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>, numpy.array: The starts, ends and \
+						summed counts of the pooled rows; the counts as \
+						output by bedGraphTrack.getCountArray.
+	"""
+	weights = getWeights(len(replicates), weights)
+	bounds = numpy.unique(numpy.concatenate(
+					[numpy.asarray(column, dtype=numpy.int64)
+					 for starts, ends, counts in replicates
+					 for column in [starts, ends]] +
+					[numpy.zeros(0, dtype=numpy.int64)]))
+	pieceStarts, pieceEnds = bounds[:-1], bounds[1:]
+
+	integral = all(float(weight).is_integer() for weight in weights) and \
+			   all(counts.dtype.kind in 'iu' for _, _, counts in replicates)
+	pooled = numpy.zeros(len(pieceStarts),
+						 dtype=numpy.int64 if integral else numpy.float64)
+	covered = numpy.zeros(len(pieceStarts), dtype=bool)
+	for (starts, ends, counts), weight in zip(replicates, weights):
+		# Row of the replicate each piece starts in, where covered
+		rows = numpy.searchsorted(starts, pieceStarts, side='right') - 1
+		inRow = rows >= 0
+		inRow[inRow] = pieceStarts[inRow] < ends[rows[inRow]]
+		weighted = counts[rows[inRow]].astype(pooled.dtype) * \
+				   (int(weight) if integral else weight)
+		pooled[inRow] += weighted
+		covered |= inRow
+
+	return bedGraphTrack.getCoordArray(pieceStarts[covered]), \
+		   bedGraphTrack.getCoordArray(pieceEnds[covered]), \
+		   bedGraphTrack.getCountArray(pooled[covered])
+
+def iterAlignedChroms(chromIters):
+	""" Aligns bedGraphs read one chromosome at a time by chromosome, with a \
+	k-way merge of their chromosome orders. Assumes the chromosomes are in \
+	the same order in each bedGraph, though any may be missing from some \
+	bedGraphs.
+
+	A chromosome is yielded once each bedGraph has either read it, or read a \
+	chromosome which another bedGraph has after it (so it is missing from \
+	the bedGraph).
+
+	Args:
+		chromIters (list<iterable>): The (chrom, track) of each chromosome \
+						of each bedGraph, as output by \
+						bedGraphReader.iterChroms.
+
+	Yields:
+		str, list<bedGraphTrack.BedGraphTrack>: The chromosome name and the \
+						track of each bedGraph on the chromosome, or None \
+						where the chromosome is missing from the bedGraph.
+	"""
+	chromIters = [iter(chroms) for chroms in chromIters]
+	nIters = len(chromIters)
+	exhausted = [False] * nIters
+	readOrder = [{} for _ in chromIters] # Position each chromosome was read at
+	pending = [collections.OrderedDict() for _ in chromIters]
+	# Latest position in bedGraph j of the chromosomes bedGraph i has read
+	readUpTo = [[-1] * nIters for _ in chromIters]
+	yielded = set()
+
+	def isPassed(i, chrom):
+		return exhausted[i] or any(chrom in readOrder[j] and
+								   readOrder[j][chrom] < readUpTo[i][j]
+								   for j in range(nIters))
+
+	def isNext(chrom):
+		return all(next(iter(pending[i])) == chrom if chrom in pending[i]
+				   else isPassed(i, chrom) for i in range(nIters))
+
+	while True:
+		# Yielding each chromosome which is next in every bedGraph
+		nextChroms = [chrom for chromTracks in pending
+					  for chrom in list(chromTracks)[:1] if isNext(chrom)]
+		if len(nextChroms) > 0:
+			chrom = nextChroms[0]
+			yielded.add(chrom)
+			yield chrom, [chromTracks.pop(chrom, None)
+						  for chromTracks in pending]
+			continue
+
+		if all(exhausted):
+			if any(len(chromTracks) > 0 for chromTracks in pending):
+				raise ValueError("Chromosomes must be in the same order in "
+								 "each bedGraph.")
+			return
+
+		# Reading the next chromosome of each bedGraph in turn
+		for i, chroms in enumerate(chromIters):
+			if exhausted[i]:
+				continue
+
+			nextChrom = next(chroms, None)
+			if nextChrom is None:
+				exhausted[i] = True
+				continue
+
+			chrom, track = nextChrom
+			if chrom in yielded or chrom in readOrder[i]:
+				raise ValueError("Chromosomes must be in the same order in "
+								 f"each bedGraph, but found {chrom} "
+								 "after the chromosomes following it.")
+			readOrder[i][chrom] = len(readOrder[i])
+			pending[i][chrom] = track
+			for j in range(nIters):
+				if chrom in readOrder[j]:
+					readUpTo[i][j] = max(readUpTo[i][j], readOrder[j][chrom])
+					readUpTo[j][i] = max(readUpTo[j][i], readOrder[i][chrom])
+
+def poolChroms(chromIters, weights=None):
+	""" Pools replicates read one chromosome at a time.
+
+	Args:
+		chromIters (list<iterable>): As in iterAlignedChroms, a replicate each.
+
+		weights (list<float>): As in mergeIntervals.
+
+	Yields:
+		str, bedGraphTrack.BedGraphTrack: The chromosome name and the pooled \
+						rows of the chromosome, with rowOffset the row in the \
+						pooled bedGraph; as output by bedGraphReader.iterChroms.
+	"""
+	weights = getWeights(len(chromIters), weights)
+	rowOffset = 0
+	for chrom, tracks in iterAlignedChroms(chromIters):
+		replicates, chromWeights = [], []
+		for track, weight in zip(tracks, weights):
+			if track is not None:
+				replicates.append((track.starts, track.ends, track.counts))
+				chromWeights.append(weight)
+
+		starts, ends, counts = mergeIntervals(replicates, chromWeights)
+		if len(starts) == 0:
+			continue
+		yield chrom, bedGraphTrack.getTrackFromBlocks(
+								[chrom], [len(starts)], starts, ends, counts,
+								rowOffset=rowOffset)
+		rowOffset += len(starts)
+
+def iterPooledChroms(fileNames, absCounts=False, weights=None,
+					 chunkSize=1000000):
+	""" Reads and pools the bedGraphs of replicates one chromosome at a time.
+
+	Args:
+		fileNames (list<str>): BedGraph of each replicate, as in \
+							   bedGraphReader.readTrack.
+
+		absCounts, chunkSize: As in bedGraphReader.iterChroms.
+
+		weights (list<float>): As in mergeIntervals.
+
+	Yields:
+		str, bedGraphTrack.BedGraphTrack: As in poolChroms.
+	"""
+	yield from poolChroms([bedGraphReader.iterChroms(fileName, absCounts,
+													 chunkSize)
+						   for fileName in fileNames], weights)
+
+def joinChroms(chroms):
+	""" Joins the tracks of chromosomes, as output by poolChroms, into one \
+	track.
+	"""
+	chromTracks = [track for chrom, track in chroms]
+	if len(chromTracks) == 0:
+		return bedGraphTrack.getEmptyTrack()
+
+	counts = bedGraphTrack.getCommonCountArrays([track.counts
+												 for track in chromTracks])
+
+	return bedGraphTrack.getTrackFromBlocks(
+				[track.chromNames[0] for track in chromTracks],
+				[len(track) for track in chromTracks],
+				numpy.concatenate([track.starts for track in chromTracks]),
+				numpy.concatenate([track.ends for track in chromTracks]),
+				numpy.concatenate(counts))
+
+def poolTracks(tracks, weights=None):
+	""" Pools the tracks of replicates held in memory.
+
+	Args:
+		tracks (list<bedGraphTrack.BedGraphTrack>): Track of each replicate.
+
+		weights (list<float>): As in mergeIntervals.
+
+	Returns:
+		bedGraphTrack.BedGraphTrack: The pooled track.
+	"""
+	return joinChroms(poolChroms([track.iterChroms() for track in tracks],
+								 weights))
+
+def readPooledTrack(fileNames, absCounts=False, weights=None,
+					chunkSize=1000000, regions=None):
+	""" Reads and pools the bedGraphs of replicates into one track.
+
+	Args:
+		fileNames, absCounts, weights, chunkSize: As in iterPooledChroms.
+
+		regions (regionIndex.RegionIndex): As in bedGraphReader.readTrack, \
+						where given each replicate is read in full before \
+						pooling, which only keeps the rows near the regions.
+
+	Returns:
+		bedGraphTrack.BedGraphTrack: The pooled track.
+	"""
+	if regions is not None:
+		return poolTracks([bedGraphReader.readTrack(fileName, absCounts,
+													chunkSize, regions=regions)
+						   for fileName in fileNames], weights)
+
+	return joinChroms(iterPooledChroms(fileNames, absCounts, weights,
+									   chunkSize))
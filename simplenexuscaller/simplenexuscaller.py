@@ -1,12 +1,20 @@
 """ Use NexusAnalysis class and define \
      simplenexuscaller class which uses NexusAnalysis as a base data structure \
      and call peaks using that with a defined CLI same as chipr.
+
+     Modules which import pandas are imported by the subcommands using them, \
+     so that short runs such as -h only import what they need.
 """
 
 import argparse
+import itertools
+import logging
 import sys
-import numpy, pandas
-from simplenexuscaller.nexusAnalysis import NexusAnalysis
+from simplenexuscaller import bgzf, binaryCache, checkpoint, cutoffSelection, \
+							  peakWriter
+from simplenexuscaller.instrumentation import RunReport
+
+logger = logging.getLogger(__name__)
 
 class SimpleNexusCaller(object):
 	""" Class for running the simplenexuscaller for peak calling on bedgraph \
@@ -23,33 +31,75 @@ class SimpleNexusCaller(object):
 											"fast and simple peak calling.\n")
 		parser.add_argument("-i", "--input",
 								help="ChIP-nexus bedGraph files, where each column is "
-									 "[chr, start, end, count], with no column headers. "
+									 "[chr, start, end, count], with no column headers, "
+									 "or caches written by 'simplenexuscaller convert'. "
+									 "A bedGraph with an up to date cache is read from "
+									 "the cache. "
 									 "These files must be "
 									 "in the order of counts on the + or - strand. "
 									 "Inputs are separated by a single space. "
+									 "Replicates are pooled by giving the "
+									 "bedGraphs of a strand separated by commas, "
+									 "such as rep1_pos.bg,rep2_pos.bg "
+									 "rep1_neg.bg,rep2_neg.bg, which sums their "
+									 "counts as they are read. "
 									 "Each BedGraph contains positions per base "
 									 "where counts represent the number of 5' reads "
 									 "mapping to that position. Where no reads "
 									 "mapped, position refers to interval "
 									 "where no reads mapped.",
 								dest="input",
-								type=str,
+								type=getInputArg,
 								nargs=2,
 								required=True)
+		parser.add_argument("--weights",
+							help="Weight of the counts of each replicate where "
+								 "pooling replicates with -i, such as to scale "
+								 "replicates by their sequencing depth. "
+								 "Defaults to summing the counts.",
+							dest="weights",
+							type=float,
+							nargs='+',
+							default=None,
+							required=False)
 		parser.add_argument("-c", "--cutoff",
 							help="Cutoff number of counts above which the position"
-							"considered as having signal.",
+							"considered as having signal. 'auto' selects the "
+							"cutoff from the distribution of the counts, see "
+							"--cutoffMethod.",
 							dest="cutoff",
-							type=int,
-							nargs=1,
+							type=getCutoffArg,
 							default=5,
 							required=False)
+		parser.add_argument("--cutoffMethod",
+							help="Method to select the cutoff with where the "
+								 "cutoff is 'auto'; 'poisson' selects the "
+								 "smallest cutoff at which a base with Poisson "
+								 "background counts (with the mean count per "
+								 "base) is a signal with probability at most "
+								 "--cutoffLevel, 'quantile' the smallest cutoff "
+								 "at which at most a --cutoffLevel fraction of "
+								 "bases are signals.",
+							dest="cutoffMethod",
+							type=str,
+							choices=cutoffSelection.cutoffMethods,
+							default='poisson',
+							required=False)
+		parser.add_argument("--cutoffLevel",
+							help="Level of --cutoffMethod. Defaults to "
+								 + ", ".join(f"{level} for '{method}'"
+									for method, level in
+									cutoffSelection.defaultLevels.items())
+								 + ".",
+							dest="cutoffLevel",
+							type=float,
+							default=None,
+							required=False)
 		parser.add_argument("-f", "--falseInRowUpper",
 							help="No. of no signal positions (count>cutoff) in row "
 								 "before terminate extension of signal region.",
 							dest="falseInRowUpper",
 							type=int,
-							nargs=1,
 							default=10,
 							required=False)
 		parser.add_argument("-n", "--nInRowCutoff",
@@ -57,7 +107,6 @@ class SimpleNexusCaller(object):
 							"signal to be called as a true signal.",
 							dest="nInRowCutoff",
 							type=int,
-							nargs=1,
 							default=2,
 							required=False)
 		parser.add_argument("-d", "--distLimit",
@@ -66,52 +115,679 @@ class SimpleNexusCaller(object):
 							"TF binding signal edges.",
 							dest="distLimit",
 							type=int,
-							nargs=1,
 							default=40,
 							required=False)
 		parser.add_argument("-m", "--maxWidth",
 							help="Maximum width a peak is allowed to be.",
 							dest="maxWidth",
 							type=int,
-							nargs=1,
 							default=100,
 							required=False)
+		parser.add_argument("-r", "--dualMethod",
+							help="Method to resolve dual boundaries; "
+								 "'largestSignal' keeps the boundary with most "
+								 "counts, 'wide' keeps the 5' most boundary on "
+								 "the + strand and 3' most on the - strand, "
+								 "'narrow' the opposite.",
+							dest="dualMethod",
+							type=str,
+							choices=['largestSignal', 'wide', 'narrow'],
+							default='largestSignal',
+							required=False)
+		parser.add_argument("-p", "--threads",
+							help="No. of processes to call peaks with, where "
+								 "each chromosome is called separately.",
+							dest="threads",
+							type=int,
+							default=1,
+							required=False)
+		parser.add_argument("--tileRows",
+							help="With -p, split chromosomes into tiles of at "
+								 "least this many rows of both strands, each "
+								 "called as a separate task, so that large "
+								 "chromosomes are spread over the processes. "
+								 "Tiles are cut where no signal range, dual "
+								 "boundaries or peak spans the cut, giving "
+								 "the same peaks as calling by chromosome.",
+							dest="tileRows",
+							type=int,
+							default=None,
+							required=False)
+		parser.add_argument("-s", "--streaming",
+							help="Read and call one chromosome at a time, "
+								 "writing the peaks of each chromosome as it "
+								 "is called. Bounds memory by the largest "
+								 "chromosome rather than the genome. Calls "
+								 "with one process.",
+							dest="streaming",
+							action="store_true",
+							required=False)
+		parser.add_argument("--prefetch",
+							help="With --streaming, read each strand up to "
+								 "this many chromosomes ahead in background "
+								 "threads, and write the peaks in a "
+								 "background thread, so that reading and "
+								 "writing overlap with calling. Up to this "
+								 "many chromosomes of each strand are held in "
+								 "memory in addition to the one being called. "
+								 "0 reads, calls and writes in turn.",
+							dest="prefetch",
+							type=int,
+							default=0,
+							required=False)
+		parser.add_argument("--regions",
+							help="Bed file of regions, such as a panel of "
+								 "promoters, to call only the peaks "
+								 "overlapping. Only the bedGraph rows near the "
+								 "regions are kept and called, so the time "
+								 "taken scales with the regions rather than "
+								 "the genome where the inputs are caches "
+								 "written by 'simplenexuscaller convert'. "
+								 "The peaks are approximate where signals "
+								 "or dual boundaries near a region are linked "
+								 "to rows beyond the margin; see the README. "
+								 "Calls with one process.",
+							dest="regions",
+							type=str,
+							default=None,
+							required=False)
+		parser.add_argument("--checkpoint",
+							help="Directory to save the result of each stage "
+								 "to, or with --streaming of each "
+								 "chromosome. A rerun after the run was "
+								 "killed loads the results saved with the "
+								 "same inputs and parameters rather than "
+								 "calling them again.",
+							dest="checkpoint",
+							type=str,
+							default=None,
+							required=False)
 		parser.add_argument("-o", "--output",
-							help="Output filename prefix. Automatically adds .bed",
+							help="Output filename prefix. Automatically adds "
+								 ".bed, or .narrowPeak with --format "
+								 "narrowPeak, and .gz if compressed.",
 							dest="output",
 							type=str,
 							default="simpleNexusPeaks",
 							required=False)
+		parser.add_argument("--format",
+							help="Columns of the peaks written; 'bed' is chr, "
+								 "start, end, 'extended' adds width, the "
+								 "counts at the + and - boundaries and the "
+								 "rows of the boundaries in the bedGraphs, "
+								 "'narrowPeak' is the ENCODE narrowPeak format "
+								 "with the summed boundary counts as the "
+								 "signal.",
+							dest="peakFormat",
+							type=str,
+							choices=peakWriter.peakFormats,
+							default='bed',
+							required=False)
+		parser.add_argument("--compress",
+							help="Compression of the peaks written; 'bgzf' "
+								 "can be indexed by tabix.",
+							dest="compression",
+							type=str,
+							choices=peakWriter.compressions,
+							default='none',
+							required=False)
+		parser.add_argument("--score",
+							help="Add the total counts over each peak of the "
+								 "+ strand, - strand and both strands as "
+								 "columns of --format extended, from a "
+								 "cumulative count index of each strand.",
+							dest="score",
+							action="store_true",
+							required=False)
+		parser.add_argument("--report",
+							help="File to write a JSON run report to, with the "
+								 "wall time, CPU time, peak RSS, input rows and "
+								 "outputs of each stage and strand.",
+							dest="report",
+							type=str,
+							default=None,
+							required=False)
+		parser.add_argument("--profile",
+							help="Profile the stages with cProfile, adding the "
+								 "functions with the most cumulative time to "
+								 "the run report.",
+							dest="profile",
+							action="store_true",
+							required=False)
+		addLoggingArg(parser)
 		args = parser.parse_args(sys.argv[1:])
+		if args.regions is not None and args.streaming:
+			parser.error("--regions can not be used with --streaming.")
+		if args.regions is not None and args.checkpoint is not None:
+			parser.error("--regions can not be used with --checkpoint.")
+		if args.prefetch > 0 and not args.streaming:
+			parser.error("--prefetch can only be used with --streaming.")
+		nReplicates = [len(fileName) if isinstance(fileName, list) else 1
+					   for fileName in args.input]
+		if nReplicates[0] != nReplicates[1]:
+			parser.error("-i must give the same no. of replicates for each "
+						 "strand.")
+		if args.weights is not None and len(args.weights) != nReplicates[0]:
+			parser.error(f"--weights must give a weight for each of the "
+						 f"{nReplicates[0]} replicates.")
+		setupLogging(args.logLevel)
 		self.runSimpleCaller(args)
 
 	def runSimpleCaller(self, args):
 		""" Defines how the simple caller runs based on user input.
 		"""
+		from simplenexuscaller.nexusAnalysis import NexusAnalysis
 
-		print("Reading in the data...")
-
-		# Reading in the bedGraph data #
 		posFileName, negFileName = args.input[0], args.input[1]
-		colNames = ['chr', 'start', 'end', 'count']
-		pos = pandas.read_csv(posFileName, sep='\t', names=colNames)
-		neg = pandas.read_csv(negFileName, sep='\t', names=colNames)
-		neg.loc[:, 'count'] = numpy.abs(neg.loc[:, 'count'])
+		params = {'cutoff': args.cutoff,
+				  'falseInRowUpper': args.falseInRowUpper,
+				  'nInRowCutoff': args.nInRowCutoff,
+				  'distLimit': args.distLimit,
+				  'maxWidth': args.maxWidth,
+				  'dualMethod': args.dualMethod}
+
+		report = RunReport(profiler='cProfile' if args.profile else None)
+		report.metadata['command'] = sys.argv
+		report.metadata['input'] = args.input
+		if args.weights is not None:
+			report.metadata['weights'] = args.weights
+		args.peakFileName = peakWriter.getPeakFileName(args.output,
+													   args.peakFormat,
+													   args.compression)
+		report.metadata['output'] = args.peakFileName
+		stageCheckpoint = None
+		if args.checkpoint is not None:
+			stageCheckpoint = checkpoint.Checkpoint(
+								args.checkpoint, checkpoint.getFileKey(
+									getInputFiles(args.input), args.weights))
+			report.metadata['checkpoint'] = args.checkpoint
+
+		if args.regions is not None:
+			self.runRegionCaller(args, params, report)
+		elif args.streaming:
+			if params['cutoff'] == 'auto':
+				params['cutoff'] = self.selectStreamingCutoff(
+											posFileName, negFileName,
+											args.cutoffMethod, args.cutoffLevel,
+											report, args.weights)
+			self.runStreamingCaller(posFileName, negFileName, args, params,
+									report, stageCheckpoint)
+		else:
+			logger.info("Reading in the data...")
+
+			# Reading in the bedGraph data #
+			tracks = []
+			for strand, fileName in zip(['+', '-'], args.input):
+				with report.stage('read', strand) as record:
+					tracks.append(readStrand(fileName, strand == '-',
+											 args.weights))
+					record.setOutput(len(tracks[-1]), 'rows')
+
+			# Constructing the ChIP-nexus analysis object #
+			nexus = NexusAnalysis(*tracks)
+
+			# Performing the peak calling #
+			peaks = nexus.callPeaks(threads = args.threads,
+									tileRows = args.tileRows,
+									cutoffMethod = args.cutoffMethod,
+									cutoffLevel = args.cutoffLevel,
+									report = report,
+									checkpoint = stageCheckpoint, **params)
+			if args.score:
+				with report.stage('score', inputRows=len(peaks)):
+					peaks = nexus.scorePeaks()
+
+			# Writing to file #
+			with report.stage('write', inputRows=len(peaks)):
+				nexus.write(args.peakFileName, args.peakFormat,
+							args.compression)
+
+		if args.report is not None:
+			report.writeJson(args.report)
+			logger.info(f"Wrote the run report to {args.report}.")
+
+	def runRegionCaller(self, args, params, report):
+		""" Reads and calls only the bedGraph rows near the regions.
+		"""
+		from simplenexuscaller import regionIndex
+		from simplenexuscaller.nexusAnalysis import NexusAnalysis
+
+		regions = regionIndex.readRegions(args.regions)
+		report.metadata['regionsFile'] = args.regions
+		# Rows the calling of the regions depends on, see
+		# nexusAnalysis.callPeaksInRegions
+		windows = regions.expand(regionIndex.getRegionMargin(
+											params['falseInRowUpper'],
+											params['maxWidth'],
+											params['distLimit']))
+
+		logger.info(f"Reading in the data near {len(regions)} regions...")
+		tracks = []
+		for strand, fileName in zip(['+', '-'], args.input):
+			with report.stage('read', strand) as record:
+				tracks.append(readStrand(fileName, strand == '-', args.weights,
+										 regions=windows))
+				record.setOutput(len(tracks[-1]), 'rows')
+
+		nexus = NexusAnalysis(*tracks)
+		peaks = nexus.callRegionPeaks(regions, cutoffMethod=args.cutoffMethod,
+									  cutoffLevel=args.cutoffLevel,
+									  report=report, **params)
+		if args.score:
+			with report.stage('score', inputRows=len(peaks)):
+				peaks = nexus.scorePeaks()
+
+		with report.stage('write', inputRows=len(peaks)):
+			nexus.write(args.peakFileName, args.peakFormat, args.compression)
+
+	def selectStreamingCutoff(self, posFileName, negFileName, method, level,
+							  report, weights=None):
+		""" Selects the cutoff for the streaming caller, reading the counts one \
+			chromosome at a time before calling.
+		"""
+		from simplenexuscaller import bedGraphReader
 
-		# Constructing the ChIP-nexus analysis object #
-		nexus = NexusAnalysis(pos, neg)
+		logger.info("Selecting the cutoff from the counts...")
+		tracks = itertools.chain(
+					(track for chrom, track in
+					 bedGraphReader.iterStrandSource(posFileName,
+													 weights=weights)),
+					(track for chrom, track in
+					 bedGraphReader.iterStrandSource(negFileName, absCounts=True,
+													 weights=weights)))
+		with report.stage('selectCutoff'):
+			cutoff, summary = cutoffSelection.selectCutoff(tracks, method,
+														   level)
+		report.metadata['cutoffSelection'] = summary
+		logger.info(f"Selected a cutoff of {cutoff} counts, at which "
+					f"{summary['signalFraction']:.2e} of bases are signals.")
 
-		# Performing the peak calling #
-		peaks = nexus.callPeaks(cutoff = args.cutoff,
-								falseInRowUpper = args.falseInRowUpper,
-								nInRowCutoff = args.nInRowCutoff,
-								distLimit = args.distLimit,
-								maxWidth = args.maxWidth)
+		return cutoff
 
-		# Writing to file #
-		nexus.write(f'{args.output}.bed')
+	def runStreamingCaller(self, posFileName, negFileName, args, params,
+						   report, stageCheckpoint=None):
+		""" Reads and calls the peaks one chromosome at a time, writing the \
+			peaks of each chromosome once called.
+		"""
+		from simplenexuscaller import bedGraphReader, nexusAnalysis
+
+		report.metadata['params'] = {**params, 'streaming': True,
+									 'prefetch': args.prefetch}
+		strandChroms = bedGraphReader.iterStrandChroms(
+								posFileName, negFileName,
+								prefetchDepth=args.prefetch,
+								weights=args.weights)
+		if args.prefetch > 0:
+			writer = peakWriter.BackgroundPeakWriter(
+								args.peakFileName, args.peakFormat,
+								args.compression, depth=args.prefetch)
+		else:
+			writer = peakWriter.PeakWriter(args.peakFileName, args.peakFormat,
+										   args.compression)
+
+		with writer:
+			for chrom, peaks in nexusAnalysis.callPeaksByChromosome(
+										strandChroms, report=report,
+										checkpoint=stageCheckpoint,
+										score=args.score, **params):
+				logger.info(f"Detected {len(peaks)} peaks on {chrom}.")
+				if args.prefetch > 0:
+					writer.write(peaks)
+					continue
+				with report.stage('write', chrom=chrom, inputRows=len(peaks)):
+					writer.write(peaks)
+
+			if args.prefetch > 0:
+				# Only the wait for the queued peaks, as the rest of the
+				# writing overlaps with the calling
+				with report.stage('write'):
+					writer.close()
+
+		report.metadata['peaks'] = writer.nPeaks
+		logger.info(f"Detected {writer.nPeaks} peaks.")
+
+def addLoggingArg(parser):
+	""" Adds the option of the level of messages logged.
+	"""
+	parser.add_argument("--logLevel",
+						help="Level of the messages to log.",
+						dest="logLevel",
+						type=str,
+						choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+						default='INFO',
+						required=False)
+
+def getInputArg(value):
+	""" Parses an input of -i, a bedGraph or comma separated bedGraphs of \
+	replicates to pool.
+	"""
+	fileNames = [fileName for fileName in value.split(',') if fileName != '']
+	if len(fileNames) == 0:
+		raise argparse.ArgumentTypeError(f"no bedGraph given in '{value}'")
+
+	return fileNames[0] if len(fileNames) == 1 else fileNames
+
+def getInputFiles(inputs):
+	""" Gets the file names of the inputs of -i, with the replicates of \
+	each strand in turn.
+	"""
+	return [fileName for fileNames in inputs for fileName in
+			(fileNames if isinstance(fileNames, list) else [fileNames])]
+
+def readStrand(fileName, absCounts=False, weights=None, regions=None):
+	""" Reads an input of -i, pooling a list of replicates.
+	"""
+	from simplenexuscaller import bedGraphReader, replicatePooling
+
+	if isinstance(fileName, list):
+		return replicatePooling.readPooledTrack(fileName, absCounts, weights,
+												regions=regions)
+
+	return bedGraphReader.readTrack(fileName, absCounts=absCounts,
+									regions=regions)
+
+def setupLogging(level):
+	""" Logs messages of the package at or above level to stderr.
+	"""
+	logging.basicConfig(format='%(message)s', level=level)
+
+def getCutoffArg(value):
+	""" Parses the cutoff option, which is an int or 'auto'.
+	"""
+	if value == 'auto':
+		return value
+
+	try:
+		return int(value)
+	except ValueError:
+		raise argparse.ArgumentTypeError(f"cutoff must be an integer or 'auto', "
+										 f"not '{value}'.")
+
+def convert(argv):
+	""" Converts + and - strand bedGraphs to binary caches, which are \
+		memory-mapped by later runs instead of parsing the bedGraphs.
+	"""
+	from simplenexuscaller import bedGraphReader
+
+	parser = argparse.ArgumentParser(prog='simplenexuscaller convert',
+							description="Converts ChIP-nexus bedGraphs to "
+										"binary caches, which are "
+										"memory-mapped by later runs instead "
+										"of parsing the bedGraphs.\n")
+	parser.add_argument("-i", "--input",
+						help="+ and - strand bedGraph files, as for "
+							 "simplenexuscaller.",
+						dest="input",
+						type=str,
+						nargs=2,
+						required=True)
+	parser.add_argument("-o", "--output",
+						help="Cache directories for the + and - strand. "
+							 "Defaults to the bedGraph file names with "
+							 f"'{binaryCache.cacheSuffix}' added, where they "
+							 "are used automatically when the bedGraphs are "
+							 "given as input.",
+						dest="output",
+						type=str,
+						nargs=2,
+						default=[None, None],
+						required=False)
+	addLoggingArg(parser)
+	args = parser.parse_args(argv)
+	setupLogging(args.logLevel)
+
+	for fileName, cacheDir, absCounts in zip(args.input, args.output,
+											 [False, True]):
+		if cacheDir is None:
+			cacheDir = binaryCache.getDefaultCachePath(fileName)
+		logger.info(f"Converting {fileName} to {cacheDir}...")
+		track = bedGraphReader.convertBedGraph(fileName, cacheDir, absCounts)
+		logger.info(f"Wrote {len(track)} rows on {len(track.chromNames)} "
+					f"chromosomes.")
+
+def index(argv):
+	""" Indexes BGZF compressed bedGraphs, so that the parts holding a \
+		chromosome or region are read without decompressing the rest.
+	"""
+	parser = argparse.ArgumentParser(prog='simplenexuscaller index',
+							description="Indexes BGZF compressed ChIP-nexus "
+										"bedGraphs by chromosome and position, "
+										"writing {bedGraph}.sni.\n")
+	parser.add_argument("-i", "--input",
+						help="bedGraph files sorted by chromosome and start. "
+							 "Files which are not BGZF compressed (plain text "
+							 "or gzip) are first compressed to {bedGraph}.bgz, "
+							 "without any .gz, which is then indexed and "
+							 "should be given as input to later runs.",
+						dest="input",
+						type=str,
+						nargs='+',
+						required=True)
+	parser.add_argument("-p", "--threads",
+						help="No. of threads to compress and decompress with.",
+						dest="threads",
+						type=int,
+						default=bgzf.defaultThreads,
+						required=False)
+	addLoggingArg(parser)
+	args = parser.parse_args(argv)
+	setupLogging(args.logLevel)
+
+	for fileName in args.input:
+		if not bgzf.isBgzf(fileName):
+			bgzfFileName = (fileName[:-3] if fileName.endswith('.gz')
+							else fileName) + '.bgz'
+			logger.info(f"Compressing {fileName} to {bgzfFileName}...")
+			bgzf.writeBgzf(fileName, bgzfFileName, args.threads)
+			fileName = bgzfFileName
+
+		logger.info(f"Indexing {fileName}...")
+		bgzfIndex = bgzf.buildIndex(fileName, args.threads)
+		logger.info(f"Wrote {fileName}{bgzf.indexSuffix}, with "
+					f"{len(bgzfIndex.chromNames)} chromosomes in "
+					f"{len(bgzfIndex.lineOffsets)} blocks.")
+
+def sweep(argv):
+	""" Calls peaks for each combination of a grid of parameters, writing the \
+		peaks of each combination and a summary table.
+	"""
+	from simplenexuscaller import bedGraphReader, parameterSweep
+	from simplenexuscaller.nexusAnalysis import NexusAnalysis
+
+	parser = argparse.ArgumentParser(prog='simplenexuscaller sweep',
+							description="Calls ChIP-nexus peaks for each "
+										"combination of the given parameter "
+										"values, loading the data once and "
+										"sharing the stages common to several "
+										"combinations.\n")
+	parser.add_argument("-i", "--input",
+						help="+ and - strand bedGraph files or caches, as for "
+							 "simplenexuscaller.",
+						dest="input",
+						type=str,
+						nargs=2,
+						required=True)
+	for flag, name, default in [("-c", "cutoff", 5),
+								("-f", "falseInRowUpper", 10),
+								("-n", "nInRowCutoff", 2),
+								("-d", "distLimit", 40),
+								("-m", "maxWidth", 100)]:
+		parser.add_argument(flag, f"--{name}",
+							help=f"Values of {name} to call with, as for "
+								 "simplenexuscaller.",
+							dest=name,
+							type=int,
+							nargs='+',
+							default=[default],
+							required=False)
+	parser.add_argument("-r", "--dualMethod",
+						help="Values of dualMethod to call with, as for "
+							 "simplenexuscaller.",
+						dest="dualMethod",
+						type=str,
+						nargs='+',
+						choices=['largestSignal', 'wide', 'narrow'],
+						default=['largestSignal'],
+						required=False)
+	parser.add_argument("-p", "--threads",
+						help="No. of processes to call the combinations with.",
+						dest="threads",
+						type=int,
+						default=1,
+						required=False)
+	parser.add_argument("-o", "--output",
+						help="Output filename prefix. Writes the peaks of each "
+							 "combination to {prefix}_c{cutoff}_f{"
+							 "falseInRowUpper}_n{nInRowCutoff}_d{distLimit}_m{"
+							 "maxWidth}_{dualMethod}.bed, and the no. of + and - "
+							 "boundaries and peaks of each combination to "
+							 "{prefix}_summary.tsv.",
+						dest="output",
+						type=str,
+						default="simpleNexusSweep",
+						required=False)
+	addLoggingArg(parser)
+	args = parser.parse_args(argv)
+	setupLogging(args.logLevel)
+	grid = {name: getattr(args, name) for name in parameterSweep.paramNames}
+
+	logger.info("Reading in the data...")
+	nexus = NexusAnalysis(bedGraphReader.readTrack(args.input[0]),
+						  bedGraphReader.readTrack(args.input[1],
+												   absCounts=True))
+
+	logger.info("Calling peaks for each combination of parameters...")
+	summary, peaksList = nexus.sweepPeaks(grid, threads=args.threads)
+	parameterSweep.writeSweep(summary, peaksList, args.output)
+	logger.info(f"Called {len(summary)} combinations, see "
+				f"{args.output}_summary.tsv.")
+
+def batch(argv):
+	""" Calls peaks for each sample of a manifest on one process pool, \
+		writing the peaks of each sample to its output prefix.
+	"""
+	from simplenexuscaller import batchCalling
+
+	parser = argparse.ArgumentParser(prog='simplenexuscaller batch',
+							description="Calls ChIP-nexus peaks for each sample "
+										"of a manifest, scheduling the "
+										"chromosomes of all samples on one "
+										"process pool.\n")
+	parser.add_argument("-i", "--input",
+						help="Tab separated manifest with a header, with the "
+							 "columns 'sample', 'pos' and 'neg' (the + and - "
+							 "strand bedGraphs or caches, as for "
+							 "simplenexuscaller), and optionally 'output' (the "
+							 "output filename prefix, by default the sample "
+							 "name) and any of "
+							 + ", ".join(batchCalling.optionalColumns[1:]) +
+							 ", which override the options below for the "
+							 "sample where not empty. Relative paths are "
+							 "relative to the manifest.",
+						dest="input",
+						type=str,
+						required=True)
+	parser.add_argument("-c", "--cutoff",
+						help="Default cutoff, as for simplenexuscaller.",
+						dest="cutoff",
+						type=getCutoffArg,
+						default=5,
+						required=False)
+	parser.add_argument("--cutoffMethod",
+						help="Default cutoffMethod, as for simplenexuscaller.",
+						dest="cutoffMethod",
+						type=str,
+						choices=cutoffSelection.cutoffMethods,
+						default='poisson',
+						required=False)
+	parser.add_argument("--cutoffLevel",
+						help="Default cutoffLevel, as for simplenexuscaller.",
+						dest="cutoffLevel",
+						type=float,
+						default=None,
+						required=False)
+	for flag, name, default in [("-f", "falseInRowUpper", 10),
+								("-n", "nInRowCutoff", 2),
+								("-d", "distLimit", 40),
+								("-m", "maxWidth", 100)]:
+		parser.add_argument(flag, f"--{name}",
+							help=f"Default {name}, as for simplenexuscaller.",
+							dest=name,
+							type=int,
+							default=default,
+							required=False)
+	parser.add_argument("-r", "--dualMethod",
+						help="Default dualMethod, as for simplenexuscaller.",
+						dest="dualMethod",
+						type=str,
+						choices=['largestSignal', 'wide', 'narrow'],
+						default='largestSignal',
+						required=False)
+	parser.add_argument("-p", "--threads",
+						help="No. of processes to call the chromosomes of all "
+							 "samples with.",
+						dest="threads",
+						type=int,
+						default=1,
+						required=False)
+	parser.add_argument("--memory",
+						help="Memory budget in MB for the bedGraphs of the "
+							 "samples being called; further samples are read "
+							 "once others are written. At least one sample is "
+							 "called at a time.",
+						dest="memory",
+						type=float,
+						default=4096,
+						required=False)
+	parser.add_argument("--status",
+						help="File the completed samples are recorded in. "
+							 "Defaults to the manifest with '.status.tsv' "
+							 "added.",
+						dest="status",
+						type=str,
+						default=None,
+						required=False)
+	parser.add_argument("--resume",
+						help="Skip the samples recorded in the status file "
+							 "as completed with the same output and "
+							 "parameters, such as after a failure.",
+						dest="resume",
+						action="store_true",
+						required=False)
+	addLoggingArg(parser)
+	args = parser.parse_args(argv)
+	setupLogging(args.logLevel)
+
+	defaults = {name: getattr(args, name)
+				for name in batchCalling.optionalColumns[1:]}
+	samples = batchCalling.readManifest(args.input, defaults)
+	statusFile = args.status if args.status is not None \
+				 else f'{args.input}.status.tsv'
+
+	logger.info(f"Calling peaks for {len(samples)} samples...")
+	nPeaks, failed = batchCalling.callBatch(samples, args.threads,
+											int(args.memory * 1024**2),
+											statusFile, args.resume)
+	logger.info(f"Called {len(nPeaks)} samples, see {statusFile}.")
+	if len(failed) > 0:
+		logger.error(f"{len(failed)} samples failed: {', '.join(failed)}. "
+					 f"Rerun with --resume to call only these samples.")
+		sys.exit(1)
 
 def main():
+	if len(sys.argv) > 1 and sys.argv[1] == 'convert':
+		convert(sys.argv[2:])
+		return
+	if len(sys.argv) > 1 and sys.argv[1] == 'index':
+		index(sys.argv[2:])
+		return
+	if len(sys.argv) > 1 and sys.argv[1] == 'sweep':
+		sweep(sys.argv[2:])
+		return
+	if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+		batch(sys.argv[2:])
+		return
+
 	SimpleNexusCaller()
 
 if __name__ == "__main__":
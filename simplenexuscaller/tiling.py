@@ -0,0 +1,188 @@
+""" Splits chromosomes into tiles which are called independently, so that the
+work of a large chromosome can be spread over several processes.
+
+Each stage of the calling only links rows over a short distance; signals are
+linked into a signal range over at most falseInRowUpper no signal bases,
+boundaries are dual within distLimit, and + and - strand boundaries are
+matched into peaks narrower than maxWidth. A tile edge is placed where none
+of these reach across it, so calling the tiles separately and joining the
+results in genome order gives the same result as calling the chromosome at
+once, without overlapping tiles or removing duplicated peaks.
+
+Since signals are linked by the length of the bedGraph rows between them, two
+signals either side of a gap in the bedGraph (a region with no rows) may be
+linked however long the gap. The edges are therefore found from the signals
+themselves rather than as a fixed margin of bases around each tile.
+"""
+
+import numpy
+
+def getSignalGaps(starts, ends, counts, cutoff, falseInRowUpper, distLimit):
+	""" Finds which consecutive signals on one strand of a chromosome can be \
+	called separately.
+
+	Args:
+		starts, ends, counts (numpy.array<int>): Columns of the chromosome.
+
+		cutoff, falseInRowUpper, distLimit: As in NexusAnalysis.callPeaks.
+
+	Returns:
+		numpy.array<int>, numpy.array<bool>: The start of each signal, and \
+						whether each pair of consecutive signals is neither \
+						linked into a signal range nor close enough for \
+						their boundaries to be dual.
+	"""
+	signalRows = numpy.flatnonzero(numpy.asarray(counts) >= cutoff)
+	signalStarts = numpy.asarray(starts, dtype=numpy.int64)[signalRows]
+	cumLens = numpy.concatenate(([0], numpy.cumsum(
+							numpy.asarray(ends, dtype=numpy.int64) - starts)))
+	falseInRow = cumLens[signalRows[1:]] - cumLens[signalRows[:-1] + 1]
+	separate = (falseInRow > falseInRowUpper) & \
+			   (signalStarts[1:] - signalStarts[:-1] > distLimit)
+
+	return signalStarts, separate
+
+def getSafeCuts(pos, neg, cutoff, falseInRowUpper, distLimit, maxWidth):
+	""" Gets the positions on a chromosome where it can be cut into tiles.
+
+	Args:
+		pos (tuple): starts, ends and counts of the + strand rows of the \
+					 chromosome, which may be empty.
+
+		neg (tuple): As for pos, except the - strand.
+
+		cutoff, falseInRowUpper, distLimit, maxWidth: As in \
+						NexusAnalysis.callPeaks.
+
+	Returns:
+		numpy.array<int>: Sorted positions x, where the rows starting before \
+						x on both strands can be called separately from \
+						those starting at or after x.
+	"""
+	posSignals, posSeparate = getSignalGaps(*pos, cutoff, falseInRowUpper,
+											distLimit)
+	negSignals, negSeparate = getSignalGaps(*neg, cutoff, falseInRowUpper,
+											distLimit)
+
+	# Safety only changes at a signal, so the signal starts are the candidates
+	cuts = numpy.unique(numpy.concatenate((posSignals, negSignals)))
+	safe = numpy.ones(len(cuts), dtype=bool)
+	for signalStarts, separate in [(posSignals, posSeparate),
+								   (negSignals, negSeparate)]:
+		right = numpy.searchsorted(signalStarts, cuts, side='left')
+		between = (right > 0) & (right < len(signalStarts))
+		safe[between] &= separate[right[between] - 1]
+
+	# A + strand boundary before the cut is not matched to a - strand
+	# boundary after it
+	posLeft = numpy.searchsorted(posSignals, cuts, side='left') - 1
+	negRight = numpy.searchsorted(negSignals, cuts, side='left')
+	across = (posLeft >= 0) & (negRight < len(negSignals))
+	safe[across] &= negSignals[negRight[across]] - \
+					posSignals[posLeft[across]] >= maxWidth
+
+	return cuts[safe]
+
+def getTileCuts(cuts, posStarts, negStarts, tileRows):
+	""" Chooses cuts to make tiles of at least tileRows rows of both strands, \
+	except the last tile of the chromosome.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>: The first row of each tile on the \
+						+ and - strand, followed by the no. of rows.
+	"""
+	posRows = numpy.searchsorted(posStarts, cuts, side='left')
+	negRows = numpy.searchsorted(negStarts, cuts, side='left')
+	rowsBefore = posRows + negRows
+
+	tileCuts = []
+	nextRows = tileRows
+	while True:
+		cuti = numpy.searchsorted(rowsBefore, nextRows, side='left')
+		if cuti >= len(cuts) or \
+		   rowsBefore[cuti] >= len(posStarts) + len(negStarts):
+			break
+		tileCuts.append(cuti)
+		nextRows = rowsBefore[cuti] + tileRows
+
+	return numpy.concatenate(([0], posRows[tileCuts], [len(posStarts)])), \
+		   numpy.concatenate(([0], negRows[tileCuts], [len(negStarts)]))
+
+def getTileTasks(posArrays, negArrays, tileRows, cutoff, falseInRowUpper,
+				 distLimit, maxWidth):
+	""" Gets a task per tile, as getChromosomeTasks in parallelCalling gets a \
+	task per chromosome.
+
+	Args:
+		posArrays (tuple): + strand columns as output by \
+						   BedGraphTrack.getBedArrays.
+
+		negArrays (tuple): As for posArrays, except the - strand.
+
+		tileRows (int): Rows of both strands to make each tile at least; \
+						tiles are smaller only at the end of a chromosome.
+
+		cutoff, falseInRowUpper, distLimit, maxWidth: As in \
+						NexusAnalysis.callPeaks.
+
+	Returns:
+		numpy.array<int>, numpy.array<int>, list<tuple>: As output by \
+						parallelCalling.getChromosomeTasks, with a block per \
+						tile rather than per chromosome.
+	"""
+	from simplenexuscaller.parallelCalling import getChromBlocks
+
+	strandBlocks = []
+	for chroms, chromNames, *_ in [posArrays, negArrays]:
+		chromStarts = getChromBlocks(chroms)
+		strandBlocks.append({chromNames[chroms[start]]: (start, end)
+							 for start, end in zip(chromStarts[:-1],
+												   chromStarts[1:])})
+	chromOrder = list(strandBlocks[0]) + [chrom for chrom in strandBlocks[1]
+										  if chrom not in strandBlocks[0]]
+
+	# Rows of each tile on each strand, as (start, end, tilei)
+	tileRanges = [[], []]
+	nTiles = 0
+	for chrom in chromOrder:
+		chromRows = [blocks.get(chrom, (0, 0)) for blocks in strandBlocks]
+		columns = [[array[start:end] for array in arrays[2:]]
+				   for arrays, (start, end) in zip([posArrays, negArrays],
+												   chromRows)]
+		cuts = getSafeCuts(*columns, cutoff, falseInRowUpper, distLimit,
+						   maxWidth)
+		posTileRows, negTileRows = getTileCuts(cuts, columns[0][0],
+											   columns[1][0], tileRows)
+		for strandi, strandTileRows in enumerate([posTileRows, negTileRows]):
+			chromStart = chromRows[strandi][0]
+			for tilei, (start, end) in enumerate(zip(strandTileRows[:-1],
+													 strandTileRows[1:])):
+				if end > start:
+					tileRanges[strandi].append((chromStart + start,
+												chromStart + end,
+												nTiles + tilei))
+		nTiles += len(posTileRows) - 1
+
+	# Blocks in row order, and the block of each tile on each strand
+	strandBlockStarts, tileBlocks = [], [[None, None] for _ in range(nTiles)]
+	for strandi, (arrays, ranges) in enumerate(zip([posArrays, negArrays],
+												   tileRanges)):
+		ranges.sort()
+		strandBlockStarts.append(numpy.array([start for start, end, tilei in
+											  ranges] + [len(arrays[0])],
+											 dtype=numpy.int64))
+		for blocki, (start, end, tilei) in enumerate(ranges):
+			tileBlocks[tilei][strandi] = blocki
+
+	tasks = [tuple(blocks) for blocks in tileBlocks if blocks != [None, None]]
+	posBlockStarts, negBlockStarts = strandBlockStarts
+
+	def taskRows(task):
+		nRows = 0
+		for blocki, blockStarts in zip(task, strandBlockStarts):
+			if blocki is not None:
+				nRows += blockStarts[blocki + 1] - blockStarts[blocki]
+		return nRows
+
+	return posBlockStarts, negBlockStarts, sorted(tasks, key=taskRows,
+												  reverse=True)
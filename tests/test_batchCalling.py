@@ -0,0 +1,97 @@
+import unittest
+import os, tempfile
+from simplenexuscaller import batchCalling
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+import numpy, pandas
+
+class TestBatchCalling(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		random = numpy.random.RandomState(0)
+		nRows = 1500
+		self.frames = {}
+		for sample in ['a', 'b']:
+			pos = pandas.DataFrame({'chr': ['chr1']*900 + ['chr2']*600,
+									'start': numpy.arange(nRows),
+									'end': numpy.arange(nRows) + 1,
+									'count': random.poisson(3, nRows)})
+			neg = pos.assign(count=-random.poisson(3, nRows))
+			for strand, frame in [('pos', pos), ('neg', neg)]:
+				frame.to_csv(self.getPath(f'{sample}_{strand}.bedGraph'),
+							 sep='\t', header=False, index=False)
+			self.frames[sample] = (pos, neg.assign(count=-neg['count']))
+
+		self.manifest = self.getPath('manifest.tsv')
+		with open(self.manifest, 'w') as manifest:
+			manifest.write('sample\tpos\tneg\tmaxWidth\n'
+						   'a\ta_pos.bedGraph\ta_neg.bedGraph\t\n'
+						   'b\tb_pos.bedGraph\tb_neg.bedGraph\t20\n')
+		self.defaults = dict(cutoff=5, falseInRowUpper=2, nInRowCutoff=1,
+							 distLimit=4, maxWidth=40, dualMethod='narrow',
+							 cutoffMethod='poisson', cutoffLevel=None)
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def getPath(self, fileName):
+		return os.path.join(self.tempDir.name, fileName)
+
+	def test_readManifest(self):
+		""" Tests parameters in the manifest override the defaults.
+		"""
+		samples = batchCalling.readManifest(self.manifest, self.defaults)
+
+		self.assertEqual( [sample['params']['maxWidth'] for sample in samples],
+						  [40, 20] )
+		self.assertEqual( samples[1]['output'], self.getPath('b') )
+		self.assertEqual( samples[1]['pos'], self.getPath('b_pos.bedGraph') )
+
+		with open(self.manifest, 'a') as manifest:
+			manifest.write('c\tc_pos.bedGraph\tc_neg.bedGraph\twide\n')
+		self.assertRaises(ValueError, batchCalling.readManifest,
+						  self.manifest, self.defaults)
+
+	def test_callBatch(self):
+		""" Tests each sample gives the same peaks as callPeaks, calling one \
+		sample at a time within the memory budget, and that a resumed batch \
+		calls only the samples which failed.
+		"""
+		samples = batchCalling.readManifest(self.manifest, self.defaults)
+		samples.append({**samples[0], 'sample': 'missing',
+						'pos': self.getPath('missing.bedGraph'),
+						'output': self.getPath('missing')})
+		statusFile = self.getPath('status.tsv')
+
+		nPeaks, failed = batchCalling.callBatch(samples, threads=2,
+												memoryBudget=1,
+												statusFile=statusFile)
+		self.assertEqual( failed, ['missing'] )
+
+		for sample in samples[:2]:
+			params = sample['params']
+			nexus = NexusAnalysis(*self.frames[sample['sample']])
+			peaks = nexus.callPeaks(**{name: params[name] for name in
+									   ['cutoff', 'falseInRowUpper',
+										'nInRowCutoff', 'distLimit',
+										'maxWidth', 'dualMethod']})
+			written = pandas.read_csv(f"{sample['output']}.bed", sep='\t',
+									  header=None)
+			self.assertGreater( len(peaks), 0 )
+			self.assertEqual( nPeaks[sample['sample']], len(peaks) )
+			self.assertEqual( written.values.tolist(),
+							  peaks.loc[:, ['chr', 'start', 'end']
+										].values.tolist() )
+
+		nPeaks, failed = batchCalling.callBatch(samples, statusFile=statusFile,
+												resume=True)
+		self.assertEqual( (nPeaks, failed), ({}, ['missing']) )
+
+		samples[1]['params']['maxWidth'] = 30
+		nPeaks, failed = batchCalling.callBatch(samples[:2],
+												statusFile=statusFile,
+												resume=True)
+		self.assertEqual( list(nPeaks), ['b'] )
+
+if __name__ == '__main__':
+	unittest.main()
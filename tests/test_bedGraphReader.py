@@ -0,0 +1,143 @@
+import unittest
+import os, tempfile
+from simplenexuscaller import bedGraphReader, bedGraphTrack, nexusAnalysis
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+import numpy, pandas
+
+class TestBedGraphReader(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.pos = pandas.DataFrame({'chr': ['chr1']*5 + ['chr2']*3,
+									 'start': [0, 1, 2, 3, 50, 0, 1, 2],
+									 'end': [1, 2, 3, 50, 51, 1, 2, 3],
+									 'count': [6, 9, 7, 0, 2, 8, 8, 1]})
+		self.neg = pandas.DataFrame({'chr': ['chr1']*4 + ['chr3']*2,
+									 'start': [0, 10, 11, 12, 0, 1],
+									 'end': [10, 11, 12, 13, 1, 2],
+									 'count': [0, -3, -9, -6, -4, -5]})
+		self.posFileName = os.path.join(self.tempDir.name, 'pos.bedGraph')
+		self.negFileName = os.path.join(self.tempDir.name, 'neg.bedGraph')
+		self.pos.to_csv(self.posFileName, sep='\t', header=False, index=False)
+		self.neg.to_csv(self.negFileName, sep='\t', header=False, index=False)
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def test_iterStrandChroms(self):
+		""" Tests reading the strands one chromosome at a time pairs the \
+		chromosomes, keeps the file row as rowOffset and makes - counts \
+		positive.
+		"""
+		strandChroms = list(bedGraphReader.iterStrandChroms(self.posFileName,
+															self.negFileName,
+															chunkSize=3))
+
+		self.assertEqual( [chrom for chrom, pos, neg in strandChroms],
+						  ['chr1', 'chr2', 'chr3'] )
+		chrom, pos, neg = strandChroms[0]
+		self.assertEqual( (pos.rowOffset, len(pos)), (0, 5) )
+		self.assertEqual( list(neg.counts), [0, 3, 9, 6] )
+		self.assertEqual( len(strandChroms[1][2]), 0 )
+		self.assertEqual( len(strandChroms[2][1]), 0 )
+		self.assertEqual( strandChroms[2][2].rowOffset, 4 )
+
+	def test_missingChroms(self):
+		""" Tests chromosomes read ahead on one strand, past a chromosome \
+		missing from the other strand, are yielded once and in genome order.
+		"""
+		def getChroms(chroms):
+			return [(chrom, self.pos.iloc[:2].assign(chr=chrom).pipe(
+								bedGraphTrack.getTrackFromFrame))
+					for chrom in chroms]
+
+		strandChroms = list(bedGraphReader.pairStrandChroms(
+								getChroms(['chr2', 'chrX']),
+								getChroms(['chr1', 'chr2', 'chr3', 'chrX'])))
+		self.assertEqual( [(chrom, len(pos), len(neg))
+						   for chrom, pos, neg in strandChroms],
+						  [('chr1', 0, 2), ('chr2', 2, 2), ('chr3', 0, 2),
+						   ('chrX', 2, 2)] )
+
+	def test_iterPrefetched(self):
+		""" Tests chromosomes read ahead in background threads are those read \
+		in turn, and that reading errors are raised to the consumer.
+		"""
+		for prefetchDepth in [1, 2]:
+			prefetched = bedGraphReader.iterStrandChroms(
+											self.posFileName, self.negFileName,
+											chunkSize=3,
+											prefetchDepth=prefetchDepth)
+			for (chrom, pos, neg), expected in zip(prefetched,
+					bedGraphReader.iterStrandChroms(self.posFileName,
+													self.negFileName)):
+				self.assertEqual( chrom, expected[0] )
+				self.assertTrue( numpy.array_equal(neg.counts,
+												   expected[2].counts) )
+
+		def iterFailing():
+			yield 1
+			raise OSError('read failed')
+
+		prefetched = bedGraphReader.iterPrefetched(iterFailing())
+		self.assertEqual( next(prefetched), 1 )
+		with self.assertRaises(OSError):
+			next(prefetched)
+
+	def test_callPeaksByChromosome(self):
+		""" Tests calling one chromosome at a time gives the same peaks as \
+		calling the whole genome.
+		"""
+		params = dict(cutoff=5, falseInRowUpper=1, nInRowCutoff=2,
+					  distLimit=5, maxWidth=100)
+		neg = self.neg.copy()
+		neg['count'] = numpy.abs(neg['count'])
+		nexus = NexusAnalysis(self.pos, neg)
+		nexus.callPeaks(**params)
+
+		strandChroms = bedGraphReader.iterStrandChroms(self.posFileName,
+													   self.negFileName,
+													   chunkSize=2)
+		chromPeaks = [peaks for chrom, peaks in
+					  nexusAnalysis.callPeaksByChromosome(strandChroms,
+														  **params)]
+
+		self.assertEqual( len(nexus.peaks), 1 )
+		self.assertEqual( nexus.peaks.values.tolist(),
+						  pandas.concat(chromPeaks).values.tolist() )
+
+	def test_readTrack(self):
+		""" Tests reading a bedGraph in chunks into compact typed columns.
+		"""
+		track = bedGraphReader.readTrack(self.negFileName, absCounts=True,
+										 chunkSize=4)
+
+		self.assertEqual( track.chromNames, ['chr1', 'chr3'] )
+		self.assertEqual( list(track.chromOffsets), [0, 4, 6] )
+		self.assertEqual( track.starts.dtype, numpy.int32 )
+		self.assertEqual( track.counts.dtype, numpy.uint32 )
+		self.assertEqual( list(track.counts), [0, 3, 9, 6, 4, 5] )
+		bedFrame = bedGraphReader.readBedGraph(self.negFileName, absCounts=True)
+		self.assertEqual( track.toFrame().values.tolist(),
+						  bedFrame.values.tolist() )
+
+	def test_numericChroms(self):
+		""" Tests numeric chromosome names are read as one str chromosome, \
+		however the chunks split them.
+		"""
+		fileName = os.path.join(self.tempDir.name, 'numeric.bedGraph')
+		pandas.DataFrame({'chr': ['1']*6 + ['X']*2, 'start': range(8),
+						  'end': range(1, 9), 'count': [1]*8}).to_csv(
+							fileName, sep='\t', header=False, index=False)
+
+		chroms = [(chrom, len(track)) for chrom, track in
+				  bedGraphReader.iterChroms(fileName, chunkSize=4)]
+		self.assertEqual( chroms, [('1', 6), ('X', 2)] )
+		self.assertEqual( bedGraphReader.readTrack(fileName,
+												   chunkSize=4).chromNames,
+						  ['1', 'X'] )
+		self.assertEqual( bedGraphReader.readBedGraph(fileName)['chr'][0],
+						  '1' )
+
+if __name__ == '__main__':
+	unittest.main()
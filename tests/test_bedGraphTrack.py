@@ -0,0 +1,49 @@
+import unittest
+from simplenexuscaller import bedGraphTrack
+import numpy, pandas
+
+class TestBedGraphTrack(unittest.TestCase):
+
+	def setUp(self):
+		self.bedFrame = pandas.DataFrame({'chr': ['chr1']*3 + ['chr2']*2,
+										  'start': [0, 1, 2, 0, 5],
+										  'end': [1, 2, 9, 5, 6],
+										  'count': [4, -2, 0, 0, 7]})
+
+	def test_trackFromFrame(self):
+		""" Tests converting a frame to compact typed columns.
+		"""
+		track = bedGraphTrack.getTrackFromFrame(self.bedFrame, absCounts=True)
+
+		self.assertEqual( track.chromNames, ['chr1', 'chr2'] )
+		self.assertEqual( list(track.chroms), [0, 0, 0, 1, 1] )
+		self.assertEqual( list(track.posLens), [1, 1, 7, 5, 1] )
+		self.assertEqual( track.ends.dtype, numpy.int32 )
+		self.assertEqual( list(track.counts), [4, 2, 0, 0, 7] )
+		self.assertEqual( track.counts.dtype, numpy.uint32 )
+
+		floatFrame = self.bedFrame.assign(count=[0.5, 1, 0, 0, 2])
+		self.assertEqual( bedGraphTrack.getTrackFromFrame(floatFrame).counts.dtype,
+						  numpy.float32 )
+
+		unsorted = self.bedFrame.assign(chr=['chr1', 'chr2', 'chr1',
+											 'chr2', 'chr2'])
+		self.assertRaises(ValueError, bedGraphTrack.getTrackFromFrame, unsorted)
+
+	def test_trackRows(self):
+		""" Tests tracks of a chromosome share the arrays and codes.
+		"""
+		track = bedGraphTrack.getTrackFromFrame(self.bedFrame)
+		chromTrack = track.getChrom('chr2')
+
+		self.assertEqual( (chromTrack.rowOffset, len(chromTrack)), (3, 2) )
+		self.assertEqual( list(chromTrack.chroms), [1, 1] )
+		self.assertEqual( list(chromTrack.chromOffsets), [0, 0, 2] )
+		self.assertTrue( numpy.shares_memory(chromTrack.starts, track.starts) )
+		self.assertEqual( list(chromTrack.toFrame().index), [3, 4] )
+		self.assertEqual( [chrom for chrom, rows in track.iterChroms()],
+						  ['chr1', 'chr2'] )
+		self.assertEqual( len(track.getChrom('chrX')), 0 )
+
+if __name__ == '__main__':
+	unittest.main()
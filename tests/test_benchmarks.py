@@ -0,0 +1,50 @@
+import unittest
+from benchmarks import syntheticGenome, runBenchmarks
+import numpy
+
+class TestBenchmarks(unittest.TestCase):
+
+	def test_generateGenome(self):
+		""" Tests the synthetic bedGraphs are seeded, and tile each \
+		chromosome with rows of bases with reads and zero-count gaps.
+		"""
+		pos, neg = syntheticGenome.generateGenome(nChroms=3, genomeSize=300000,
+												  seed=1)
+		self.assertTrue( pos.equals(syntheticGenome.generateGenome(
+										nChroms=3, genomeSize=300000, seed=1)[0]) )
+		self.assertFalse( pos.equals(syntheticGenome.generateGenome(
+										nChroms=3, genomeSize=300000, seed=2)[0]) )
+
+		for bedFrame in [pos, neg]:
+			self.assertEqual( list(bedFrame['chr'].unique()),
+							  ['chr1', 'chr2', 'chr3'] )
+			for chrom, chromFrame in bedFrame.groupby('chr'):
+				starts, ends = chromFrame['start'].values, chromFrame['end'].values
+				self.assertEqual( (starts[0], ends[-1]), (0, 100000) )
+				self.assertTrue( numpy.all(starts[1:] == ends[:-1]) )
+
+			counts, starts = bedFrame['count'].values, bedFrame['start'].values
+			lens = bedFrame['end'].values - starts
+			self.assertTrue( numpy.all(lens[counts > 0] == 1) )
+			self.assertFalse( numpy.any((counts[1:] == 0) & (counts[:-1] == 0) &
+										(starts[1:] > 0)) )
+
+	def test_runBenchmarks(self):
+		""" Tests the runner measures each stage at each scale.
+		"""
+		results = runBenchmarks.runBenchmarks([2000, 5000], seed=0)
+
+		self.assertEqual( [result['scale'] for result in results['scales']],
+						  [2000, 5000] )
+		for result in results['scales']:
+			self.assertEqual( set(result['stages']),
+							  set(runBenchmarks.stageNames) )
+			self.assertGreater( result['peaks'], 0 )
+			self.assertGreater(
+				result['stages']['callSignalRangesBed']['peakMemoryBytes'], 0 )
+
+		speedups = runBenchmarks.compareResults(results, results)
+		self.assertTrue( numpy.allclose(speedups.values, 1) )
+
+if __name__ == '__main__':
+	unittest.main()
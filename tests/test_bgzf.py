@@ -0,0 +1,104 @@
+import unittest
+import gzip, os, tempfile
+from simplenexuscaller import bedGraphReader, bgzf, regionIndex
+import numpy, pandas
+
+class TestBgzf(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		random = numpy.random.RandomState(0)
+		chromLens = [30000, 5, 20000]
+		starts = numpy.concatenate([numpy.arange(chromLen) * 2
+									for chromLen in chromLens])
+		self.bedFrame = pandas.DataFrame({
+							'chr': numpy.repeat(['chr1', 'chr2', 'chr3'],
+												chromLens),
+							'start': starts, 'end': starts + 2,
+							'count': -random.poisson(2, sum(chromLens))})
+		self.textFileName = os.path.join(self.tempDir.name, 'neg.bedGraph')
+		self.bedFrame.to_csv(self.textFileName, sep='\t', header=False,
+							 index=False)
+		self.fileName = self.textFileName + '.gz'
+		bgzf.writeBgzf(self.textFileName, self.fileName)
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def test_readBgzf(self):
+		""" Tests a BGZF bedGraph spanning many members is read the same as \
+		the bedGraph, and that other gzip files are not read as BGZF.
+		"""
+		self.assertTrue( bgzf.isBgzf(self.fileName) )
+		with gzip.open(self.fileName, 'rb') as bgzfFile, \
+			 open(self.textFileName, 'rb') as textFile:
+			self.assertEqual( bgzfFile.read(), textFile.read() )
+
+		gzipFileName = os.path.join(self.tempDir.name, 'plain.bedGraph.gz')
+		self.bedFrame.to_csv(gzipFileName, sep='\t', header=False, index=False)
+		self.assertFalse( bgzf.isBgzf(gzipFileName) )
+
+		track = bedGraphReader.readTrack(self.fileName, absCounts=True,
+										 chunkSize=5000)
+		self.assertEqual( track.toFrame().values.tolist(),
+						  bedGraphReader.readTrack(self.textFileName,
+												   absCounts=True
+												   ).toFrame().values.tolist() )
+
+	def test_indexedReads(self):
+		""" Tests an indexed BGZF bedGraph reads a chromosome or the rows \
+		near regions from only the members holding them.
+		"""
+		self.assertIsNone( bgzf.readIndex(self.fileName) )
+		index = bgzf.buildIndex(self.fileName, chunkBytes=100000)
+		self.assertEqual( index.chromNames, ['chr1', 'chr2', 'chr3'] )
+		self.assertGreater( len(index.lineOffsets), 10 )
+		self.assertIsNotNone( bgzf.readIndex(self.fileName) )
+
+		for chrom in ['chr1', 'chr2', 'chr3']:
+			track = bedGraphReader.readChrom(self.fileName, chrom)
+			expected = self.bedFrame.loc[self.bedFrame['chr'] == chrom]
+			self.assertEqual( track.chromNames, [chrom] )
+			self.assertEqual( track.counts.tolist(),
+							  expected['count'].tolist() )
+			self.assertEqual( track.rowOffset, expected.index[0] )
+		self.assertEqual( len(bedGraphReader.readChrom(self.fileName, 'chrX')),
+						  0 )
+
+		chromRange = index.getChromRange('chr3')
+		regionRange = index.getRegionRange('chr3', 20001, 20100)
+		self.assertTrue( chromRange[0] < regionRange[0] <
+						 regionRange[1] < chromRange[1] )
+
+		regions = regionIndex.RegionIndex(['chr1', 'chr3', 'chr2'],
+										  [59990, 20001, 0],
+										  [60010, 20100, 1])
+		track = bedGraphReader.readTrack(self.fileName, regions=regions)
+		mask = regions.getOverlapMask(self.bedFrame['chr'].to_numpy(),
+									  self.bedFrame['start'].to_numpy(),
+									  self.bedFrame['end'].to_numpy())
+		self.assertEqual( track.toFrame().values.tolist(),
+						  self.bedFrame.loc[mask].values.tolist() )
+		self.assertEqual( track.fileRows.tolist(),
+						  numpy.flatnonzero(mask).tolist() )
+
+	def test_numericChroms(self):
+		""" Tests numeric chromosome names are read as one str chromosome \
+		from BGZF chunks, whether or not the chunk holds other chromosomes.
+		"""
+		bedFrame = self.bedFrame.assign(
+						chr=self.bedFrame['chr'].map({'chr1': '1', 'chr2': 'X',
+													  'chr3': '3'}))
+		textFileName = os.path.join(self.tempDir.name, 'numeric.bedGraph')
+		bedFrame.to_csv(textFileName, sep='\t', header=False, index=False)
+		fileName = textFileName + '.gz'
+		bgzf.writeBgzf(textFileName, fileName)
+
+		track = bedGraphReader.readTrack(fileName, chunkSize=5000)
+		self.assertEqual( track.chromNames, ['1', 'X', '3'] )
+		bgzf.buildIndex(fileName, chunkBytes=100000)
+		self.assertEqual( len(bedGraphReader.readChrom(fileName, '3')),
+						  (bedFrame['chr'] == '3').sum() )
+
+if __name__ == '__main__':
+	unittest.main()
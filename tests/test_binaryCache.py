@@ -0,0 +1,76 @@
+import unittest
+import os, tempfile
+from simplenexuscaller import bedGraphReader, binaryCache, nexusAnalysis
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+import numpy, pandas
+
+class TestBinaryCache(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.pos = pandas.DataFrame({'chr': ['chr1']*5 + ['chr2']*3,
+									 'start': [0, 1, 2, 3, 50, 0, 1, 2],
+									 'end': [1, 2, 3, 50, 51, 1, 2, 3],
+									 'count': [6, 9, 7, 0, 2, 8, 8, 1]})
+		self.neg = pandas.DataFrame({'chr': ['chr1']*4 + ['chr3']*2,
+									 'start': [0, 10, 11, 12, 0, 1],
+									 'end': [10, 11, 12, 13, 1, 2],
+									 'count': [0, -3, -9, -6, -4, -5]})
+		self.posFileName = os.path.join(self.tempDir.name, 'pos.bedGraph')
+		self.negFileName = os.path.join(self.tempDir.name, 'neg.bedGraph')
+		self.pos.to_csv(self.posFileName, sep='\t', header=False, index=False)
+		self.neg.to_csv(self.negFileName, sep='\t', header=False, index=False)
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def test_convertBedGraph(self):
+		""" Tests a converted bedGraph is memory-mapped with the same rows, \
+		and that a cache is not used once the bedGraph changes.
+		"""
+		self.assertIsNone( binaryCache.getCachePath(self.negFileName) )
+		bedGraphReader.convertBedGraph(self.negFileName, absCounts=True)
+		cacheDir = binaryCache.getCachePath(self.negFileName)
+		self.assertEqual( cacheDir, self.negFileName + binaryCache.cacheSuffix )
+
+		track = bedGraphReader.readTrack(self.negFileName, absCounts=True)
+		self.assertIsInstance( track.counts, numpy.memmap )
+		self.assertEqual( track.toFrame().values.tolist(),
+						  bedGraphReader.readTrack(self.negFileName,
+												   absCounts=True,
+												   useCache=False
+												   ).toFrame().values.tolist() )
+		self.assertEqual( list(bedGraphReader.readTrack(cacheDir).counts),
+						  [0, 3, 9, 6, 4, 5] )
+
+		self.neg.iloc[:5].to_csv(self.negFileName, sep='\t', header=False,
+								 index=False)
+		self.assertIsNone( binaryCache.getCachePath(self.negFileName) )
+		self.assertEqual( len(bedGraphReader.readTrack(self.negFileName)), 5 )
+
+	def test_callPeaksFromCache(self):
+		""" Tests calling peaks from caches, whole genome and one chromosome \
+		at a time, gives the same peaks as calling from the bedGraphs.
+		"""
+		params = dict(cutoff=5, falseInRowUpper=1, nInRowCutoff=2,
+					  distLimit=5, maxWidth=100)
+		nexus = NexusAnalysis(self.posFileName, self.negFileName)
+		nexus.callPeaks(**params)
+
+		bedGraphReader.convertBedGraph(self.posFileName)
+		bedGraphReader.convertBedGraph(self.negFileName, absCounts=True)
+		cacheNexus = NexusAnalysis(self.posFileName, self.negFileName)
+		self.assertIsInstance( cacheNexus.pos.starts, numpy.memmap )
+		cacheNexus.callPeaks(**params)
+		self.assertTrue( cacheNexus.peaks.equals(nexus.peaks) )
+
+		strandChroms = bedGraphReader.iterStrandChroms(self.posFileName,
+													   self.negFileName)
+		chromPeaks = [peaks for chrom, peaks in
+					  nexusAnalysis.callPeaksByChromosome(strandChroms,
+														  **params)]
+		self.assertEqual( pandas.concat(chromPeaks).values.tolist(),
+						  nexus.peaks.values.tolist() )
+
+if __name__ == '__main__':
+	unittest.main()
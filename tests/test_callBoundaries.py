@@ -0,0 +1,87 @@
+import unittest
+from simplenexuscaller import callBoundaries
+import numpy, pandas
+
+class TestBoundaryFunctions(unittest.TestCase):
+
+	def test_chromCodes(self):
+		""" Tests encoding the chromosomes keeps order of appearance.
+		"""
+		chroms = numpy.array( ['chr2']*2 + ['chr1']*3 + ['chrX'] )
+		codes, chromNames = callBoundaries.getChromCodes(chroms)
+
+		self.assertTrue( numpy.all(codes == [0, 0, 1, 1, 1, 2]) )
+		self.assertTrue( chromNames == ['chr2', 'chr1', 'chrX'] )
+
+	def test_boundaryArrays(self):
+		""" Tests the boundary arrays match the frame from getBoundaries.
+		"""
+		bedFrame = pandas.DataFrame({'chr': ['chr1']*4 + ['chr2']*3,
+									 'start': [0, 1, 2, 10, 0, 1, 2],
+									 'end': [1, 2, 10, 11, 1, 2, 3],
+									 'count': [5, 7, 0, 6, 9, 8, 1]})
+		signalRanges = [(0, 2), (4, 6)]
+		signalSummits = [1, 0]
+
+		boundaryFrame = callBoundaries.getBoundaries(signalRanges,
+													 signalSummits, bedFrame)
+
+		chroms, chromNames = callBoundaries.getChromCodes(
+												bedFrame['chr'].to_numpy())
+		boundaries = callBoundaries.getBoundaryArrays(
+										numpy.array([0, 4]),
+										numpy.array(signalSummits),
+										chroms, chromNames,
+										bedFrame['start'].to_numpy(),
+										bedFrame['end'].to_numpy(),
+										bedFrame['count'].to_numpy())
+
+		self.assertEqual( len(boundaries), 2 )
+		self.assertTrue( numpy.all(boundaries.originIndex == [1, 4]) )
+		self.assertTrue( numpy.all(boundaries.toFrame().values ==
+								   boundaryFrame.values) )
+
+	def test_dualBoundaryMethods(self):
+		""" Tests resolving dual boundaries with each method, where close \
+		boundaries in a row are paired from left to right.
+		"""
+		chroms = numpy.array( [0, 0, 0, 0, 1, 1] )
+		starts = numpy.array( [10, 20, 30, 100, 15, 25] )
+		counts = numpy.array( [3, 8, 2, 5, 6, 6] )
+
+		keep = callBoundaries.getDualBoundaryMask(chroms, starts, counts, '+',
+												  15, 'largestSignal')
+		self.assertTrue( numpy.all(keep == [False, True, True, True,
+											True, False]) )
+
+		keep = callBoundaries.getDualBoundaryMask(chroms, starts, counts, '+',
+												  15, 'wide')
+		self.assertTrue( numpy.all(keep == [True, False, True, True,
+											True, False]) )
+		keep = callBoundaries.getDualBoundaryMask(chroms, starts, counts, '-',
+												  15, 'wide')
+		self.assertTrue( numpy.all(keep == [False, True, True, True,
+											False, True]) )
+
+		keep = callBoundaries.getDualBoundaryMask(chroms, starts, counts, '+',
+												  15, 'narrow')
+		self.assertTrue( numpy.all(keep == [False, True, True, True,
+											False, True]) )
+
+		self.assertRaises(ValueError, callBoundaries.getDualBoundaryMask,
+						  chroms, starts, counts, '+', 15, 'widest')
+
+	def test_resolveBoundariesWithSignal(self):
+		""" Tests the boundary with most counts is kept, including the last.
+		"""
+		boundaries = pandas.DataFrame({'chr': ['chr1']*4,
+									   'start': [10, 20, 60, 200],
+									   'end': [11, 21, 61, 201],
+									   'count': [9, 4, 5, 7],
+									   'originIndex': [0, 3, 8, 12]})
+
+		resolved = callBoundaries.resolveBoundariesWithSignal(boundaries, 40)
+		self.assertTrue( resolved['originIndex'].tolist() == [0, 8, 12] )
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from simplenexuscaller import callPeaks
+import numpy, pandas
+
+class TestPeakFunctions(unittest.TestCase):
+
+	def test_matchBoundaries(self):
+		""" Tests + strand boundaries match the first downstream - strand \
+		boundary on the same chromosome.
+		"""
+		posChroms = numpy.array( [0, 0, 0, 1, 2] )
+		posStarts = numpy.array( [10, 50, 200, 5, 7] )
+		negChroms = numpy.array( [0, 0, 1, 1] )
+		negStarts = numpy.array( [30, 60, 2, 90] )
+
+		posIndex, negIndex = callPeaks.matchBoundaries(posChroms, posStarts,
+													   negChroms, negStarts)
+		self.assertTrue( numpy.all(posIndex == [0, 1, 3]) )
+		self.assertTrue( numpy.all(negIndex == [0, 1, 3]) )
+
+		posIndex, negIndex = callPeaks.matchBoundaries(posChroms, posStarts,
+													   negChroms, negStarts,
+													   maxWidth=20)
+		self.assertTrue( numpy.all(posIndex == [1]) )
+		self.assertTrue( numpy.all(negIndex == [1]) )
+
+	def test_getPeaks(self):
+		""" Tests peaks are called from boundary frames on chromosome names.
+		"""
+		posBoundaries = pandas.DataFrame({'chr': ['chr1', 'chr1', 'chr2'],
+										  'start': [10, 50, 5],
+										  'end': [11, 51, 6],
+										  'count': [5, 6, 7],
+										  'originIndex': [1, 4, 9]})
+		negBoundaries = pandas.DataFrame({'chr': ['chr2', 'chr2'],
+										  'start': [8, 40],
+										  'end': [9, 41],
+										  'count': [5, 5],
+										  'originIndex': [3, 6]})
+
+		peaks = callPeaks.getPeaks(posBoundaries, negBoundaries, 100)
+		self.assertEqual( peaks.values.tolist(),
+						  [['chr2', 5, 8, 3, 9, 3]] )
+
+if __name__ == '__main__':
+	unittest.main()
@@ -80,6 +80,26 @@ class TestSignalFunctions(unittest.TestCase):
 		ranges1 = callSignals.callSignalRanges(chrom1, posLens, signal3, 4, 3)
 		self.assertTrue(ranges1 == [(0, 5)])
 
+	def test_signalRangeArrays(self):
+		""" Tests the vectorized signal range calling returns arrays matching \
+		callSignalRanges, including skipping a signal directly after a called \
+		range on chromosome change.
+		"""
+		signal = numpy.array( [True]*7 + [False] )
+		chroms = numpy.array( ['chr1']*2 + ['chr2']*3 + ['chr3']*3 )
+		posLens = numpy.ones(len(signal), dtype=int)
+
+		starts, ends = callSignals.getSignalRangeArrays(chroms, posLens,
+														signal, 2, 1)
+		self.assertTrue( numpy.all(starts == [0, 3]) )
+		self.assertTrue( numpy.all(ends == [2, 5]) )
+
+		ranges = callSignals.callSignalRanges(chroms, posLens, signal, 2, 1)
+		self.assertTrue(ranges == [(0, 2), (3, 5)])
+
+		ranges = callSignals.callSignalRanges(chroms, posLens, signal, 1, 1)
+		self.assertTrue(ranges == [(0, 2), (3, 5), (6, 7)])
+
 	def test_rangeSummits(self):
 		""" Tests calling range summits.
 		"""
@@ -91,5 +111,15 @@ class TestSignalFunctions(unittest.TestCase):
 		for i, val in enumerate( vals ):
 			self.assertTrue(val[summits[i]] == max(val))
 
+	def test_rangeSummitArray(self):
+		""" Tests calling range summits in one pass takes the first maximum.
+		"""
+		baseCounts = numpy.array( [1, 2, 3, 3, 3, 3, 5, 3, 10, 7] )
+		starts = numpy.array( [0, 3, 4, 7] )
+		ends = numpy.array( [3, 6, 8, 10] )
+		summits = callSignals.getRangeSummitArray(baseCounts, starts, ends)
+
+		self.assertTrue( numpy.all(summits == [2, 0, 2, 1]) )
+
 if __name__ == '__main__':
 	unittest.main()
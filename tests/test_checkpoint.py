@@ -0,0 +1,85 @@
+import unittest
+import os, tempfile
+from simplenexuscaller import bedGraphReader, checkpoint, nexusAnalysis
+from simplenexuscaller.instrumentation import RunReport
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+import numpy, pandas
+
+class TestCheckpoint(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		random = numpy.random.RandomState(0)
+		nRows = 3000
+		starts = numpy.concatenate((numpy.arange(2000), numpy.arange(1000)))
+		self.pos = pandas.DataFrame({'chr': ['chr1']*2000 + ['chr2']*1000,
+									 'start': starts, 'end': starts + 1,
+									 'count': random.poisson(2, nRows)})
+		self.neg = self.pos.assign(count=random.poisson(2, nRows))
+		self.params = dict(cutoff=4, falseInRowUpper=3, nInRowCutoff=1,
+						   distLimit=5, maxWidth=40)
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def test_stageCheckpoints(self):
+		""" Tests a rerun loads the stages saved by an earlier run rather \
+		than calling them, giving the same peaks, and that other parameters \
+		are not loaded.
+		"""
+		checkpointDir = os.path.join(self.tempDir.name, 'checkpoint')
+		expected = NexusAnalysis(self.pos, self.neg).callPeaks(
+										checkpoint=checkpointDir, **self.params)
+		self.assertEqual( len(os.listdir(checkpointDir)), 3 )
+
+		report = RunReport()
+		nexus = NexusAnalysis(self.pos, self.neg)
+		peaks = nexus.callPeaks(checkpoint=checkpointDir, report=report,
+								**self.params)
+		self.assertTrue( peaks.equals(expected) )
+		self.assertTrue( all(record.cached for record in report.records) )
+		self.assertIsInstance( nexus.posBoundaries.starts, numpy.memmap )
+
+		report = RunReport()
+		NexusAnalysis(self.pos, self.neg).callPeaks(
+							checkpoint=checkpointDir, report=report,
+							**{**self.params, 'distLimit': 8})
+		self.assertEqual( [record.stage for record in report.records
+						   if not record.cached], ['dualResolution'] * 2 +
+												  ['peaks'] )
+
+	def test_chromosomeCheckpoints(self):
+		""" Tests a streaming run killed after the first chromosome resumes \
+		from the second, giving the same peaks as an uninterrupted run.
+		"""
+		fileNames = []
+		for strand, frame in [('pos', self.pos), ('neg', self.neg)]:
+			fileNames.append(os.path.join(self.tempDir.name,
+										  f'{strand}.bedGraph'))
+			frame.to_csv(fileNames[-1], sep='\t', header=False, index=False)
+		stageCheckpoint = checkpoint.Checkpoint(
+								os.path.join(self.tempDir.name, 'checkpoint'),
+								checkpoint.getFileKey(fileNames))
+
+		def callChroms(report=None, stageCheckpoint=None):
+			return nexusAnalysis.callPeaksByChromosome(
+						bedGraphReader.iterStrandChroms(*fileNames),
+						report=report, checkpoint=stageCheckpoint,
+						**self.params)
+
+		expected = pandas.concat([peaks for chrom, peaks in callChroms()],
+								 ignore_index=True)
+		killed = callChroms(stageCheckpoint=stageCheckpoint)
+		self.assertEqual( next(killed)[0], 'chr1' )
+		killed.close()
+
+		report = RunReport()
+		peaks = pandas.concat([peaks for chrom, peaks in
+							   callChroms(report, stageCheckpoint)],
+							  ignore_index=True)
+		self.assertTrue( peaks.equals(expected) )
+		self.assertEqual( {record.chrom for record in report.records},
+						  {'chr2'} )
+
+if __name__ == '__main__':
+	unittest.main()
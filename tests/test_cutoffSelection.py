@@ -0,0 +1,66 @@
+import unittest
+from simplenexuscaller import callSignals, cutoffSelection
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+import numpy, pandas
+
+class TestCutoffSelection(unittest.TestCase):
+
+	def setUp(self):
+		random = numpy.random.RandomState(0)
+		self.counts = random.poisson(0.05, 100000)
+		self.counts[::1000] += 30
+
+	def test_basesAtCutoffs(self):
+		""" Tests the cumulative histogram gives the no. of signals at each \
+		cutoff, weighting each position by its length.
+		"""
+		histogram = cutoffSelection.getCountHistogram(
+								self.counts, numpy.ones(len(self.counts)))
+		cutoffs = list(range(len(histogram)))
+
+		self.assertEqual( list(cutoffSelection.getBasesAtCutoffs(histogram)),
+						  callSignals.getSignalsInRange(self.counts, cutoffs) )
+
+		histogram = cutoffSelection.getCountHistogram(numpy.array([0, 2.5, 1]),
+													  numpy.array([10, 1, 2]),
+													  histogram=[1, 1])
+		self.assertEqual( list(histogram), [11, 3, 1] )
+
+	def test_selectCutoff(self):
+		""" Tests the cutoff is selected above the background counts.
+		"""
+		histogram = cutoffSelection.getCountHistogram(
+								self.counts, numpy.ones(len(self.counts)))
+		for method in cutoffSelection.cutoffMethods:
+			cutoff, summary = cutoffSelection.selectCutoffFromHistogram(
+															histogram, method)
+			self.assertEqual( cutoff, 4 )
+			self.assertEqual( summary['signalBases'], 100 )
+
+		cutoff, summary = cutoffSelection.selectCutoffFromHistogram(
+												histogram, 'quantile', 0.01)
+		self.assertEqual( (cutoff, summary['signalBases']), (2, 223) )
+		self.assertRaises(ValueError, cutoffSelection.selectCutoffFromHistogram,
+						  histogram, 'mean')
+
+	def test_autoCutoff(self):
+		""" Tests calling with an automatic cutoff gives the same peaks as \
+		calling with the selected cutoff.
+		"""
+		pos = pandas.DataFrame({'chr': ['chr1']*len(self.counts),
+								'start': numpy.arange(len(self.counts)),
+								'end': numpy.arange(len(self.counts)) + 1,
+								'count': self.counts})
+		neg = pos.assign(count=numpy.roll(self.counts, 10))
+		nexus = NexusAnalysis(pos, neg)
+
+		peaks = nexus.callPeaks(cutoff='auto', falseInRowUpper=2,
+								nInRowCutoff=1, distLimit=5)
+		self.assertEqual( nexus.cutoffSummary['cutoff'], 4 )
+		self.assertEqual( len(peaks), 100 )
+		self.assertTrue( peaks.equals(NexusAnalysis(pos, neg).callPeaks(
+										cutoff=4, falseInRowUpper=2,
+										nInRowCutoff=1, distLimit=5)) )
+
+if __name__ == '__main__':
+	unittest.main()
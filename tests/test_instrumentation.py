@@ -0,0 +1,70 @@
+import unittest
+import json, os, tempfile
+from simplenexuscaller.instrumentation import RunReport
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+import numpy, pandas
+
+class TestInstrumentation(unittest.TestCase):
+
+	def setUp(self):
+		random = numpy.random.RandomState(0)
+		nRows = 2000
+		self.pos = pandas.DataFrame({'chr': ['chr1']*nRows,
+									 'start': numpy.arange(nRows),
+									 'end': numpy.arange(nRows) + 1,
+									 'count': random.poisson(3, nRows)})
+		self.neg = self.pos.assign(count=random.poisson(3, nRows))
+		self.params = dict(cutoff=5, falseInRowUpper=2, nInRowCutoff=2,
+						   distLimit=10, maxWidth=20)
+
+	def test_stageRecords(self):
+		""" Tests each stage and strand is recorded with its outputs, and \
+		that stages reused from the cache are recorded as cached.
+		"""
+		nexus = NexusAnalysis(self.pos, self.neg)
+		with self.assertLogs('simplenexuscaller.nexusAnalysis', 'INFO'):
+			peaks = nexus.callPeaks(**self.params)
+
+		records = {(record.stage, record.strand): record
+				   for record in nexus.report.records}
+		self.assertEqual( set(records),
+						  {(stage, strand) for strand in ['+', '-']
+						   for stage in ['signalRanges', 'boundaries',
+										 'dualResolution']} |
+						  {('peaks', None)} )
+		self.assertEqual( records[('signalRanges', '+')].inputRows, 2000 )
+		self.assertEqual( records[('dualResolution', '-')].outputs,
+						  len(nexus.negBoundaries) )
+		self.assertEqual( records[('peaks', None)].outputs, len(peaks) )
+		self.assertTrue( all(record.wallSeconds >= 0 and
+							 record.cpuSeconds >= 0
+							 for record in records.values()) )
+		self.assertEqual( nexus.report.metadata['peaks'], len(peaks) )
+
+		with self.assertLogs('simplenexuscaller.nexusAnalysis', 'INFO'):
+			nexus.callPeaks(**{**self.params, 'maxWidth': 40})
+		self.assertEqual( [record.stage for record in nexus.report.records
+						   if not record.cached], ['peaks'] )
+
+	def test_writeJson(self):
+		""" Tests the report is written as JSON, with profile stats where \
+		profiled with cProfile.
+		"""
+		report = RunReport(profiler='cProfile')
+		report.metadata['input'] = ['pos.bedGraph', 'neg.bedGraph']
+		with report.stage('sum', inputRows=1000) as record:
+			record.setOutput(numpy.arange(1000).sum(), 'total')
+
+		with tempfile.TemporaryDirectory() as tempDir:
+			fileName = os.path.join(tempDir, 'report.json')
+			report.writeJson(fileName)
+			with open(fileName) as reportFile:
+				written = json.load(reportFile)
+
+		self.assertEqual( written['metadata']['input'],
+						  ['pos.bedGraph', 'neg.bedGraph'] )
+		self.assertEqual( written['stages'][0]['outputs'], 499500 )
+		self.assertIn( 'cumulative', written['profile'] )
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from simplenexuscaller.nexusAnalysis import NexusAnalysis, StageCache
+import numpy, pandas
+
+class TestNexusAnalysis(unittest.TestCase):
+
+	def setUp(self):
+		random = numpy.random.RandomState(0)
+		nRows = 2000
+		self.pos = pandas.DataFrame({'chr': ['chr1']*nRows,
+									 'start': numpy.arange(nRows),
+									 'end': numpy.arange(nRows) + 1,
+									 'count': random.poisson(3, nRows)})
+		self.neg = self.pos.assign(count=random.poisson(3, nRows))
+		self.params = dict(cutoff=5, falseInRowUpper=2, nInRowCutoff=2,
+						   distLimit=10, maxWidth=20)
+
+	def test_stageCache(self):
+		""" Tests the least recently used result is evicted.
+		"""
+		cache = StageCache(2)
+		cache.put('a', 1)
+		cache.put('b', 2)
+		self.assertEqual( cache.get('a'), 1 )
+		cache.put('c', 3)
+
+		self.assertEqual( len(cache), 2 )
+		self.assertIsNone( cache.get('b') )
+		self.assertEqual( (cache.get('a'), cache.get('c')), (1, 3) )
+
+	def test_cachedStages(self):
+		""" Tests calling again reuses the stages the changed parameters do \
+		not affect, giving the same peaks as calling without a cache.
+		"""
+		nexus = NexusAnalysis(self.pos, self.neg)
+		nexus.callPeaks(**self.params)
+		posBounds, posBoundaries = nexus.posBounds, nexus.posBoundaries
+
+		for changed in [{'maxWidth': 40}, {'distLimit': 4},
+						{'dualMethod': 'wide'}, {'cutoff': 6}, {}]:
+			params = {**self.params, **changed}
+			peaks = nexus.callPeaks(**params)
+
+			self.assertEqual( nexus.posBounds is posBounds,
+							  'cutoff' not in changed )
+			self.assertEqual( nexus.posBoundaries is posBoundaries,
+							  changed in [{'maxWidth': 40}, {}] )
+			self.assertTrue( peaks.equals(NexusAnalysis(self.pos, self.neg
+														).callPeaks(**params)) )
+
+if __name__ == '__main__':
+	unittest.main()
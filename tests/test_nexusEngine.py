@@ -0,0 +1,48 @@
+import unittest
+import subprocess, sys
+from simplenexuscaller import callPeaks, nexusEngine
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+import numpy, pandas
+
+class TestNexusEngine(unittest.TestCase):
+
+	def setUp(self):
+		random = numpy.random.RandomState(0)
+		nRows = 3000
+		starts = numpy.concatenate((numpy.arange(2000), numpy.arange(1000)))
+		self.pos = pandas.DataFrame({'chr': ['chr1']*2000 + ['chr2']*1000,
+									 'start': starts, 'end': starts + 1,
+									 'count': random.poisson(2, nRows)})
+		self.neg = self.pos.assign(count=random.poisson(2, nRows))
+		self.params = dict(cutoff=4, falseInRowUpper=3, nInRowCutoff=1,
+						   distLimit=5, maxWidth=40)
+
+	def test_callPeakArrays(self):
+		""" Tests peaks called on arrays are those called by NexusAnalysis, \
+		and that the engine is imported without pandas.
+		"""
+		nexus = NexusAnalysis(self.pos, self.neg)
+		expected = nexus.callPeaks(**self.params)
+		peaks = nexusEngine.callPeakArrays(nexus.pos.getBedArrays(),
+										   nexus.neg.getBedArrays(),
+										   **self.params)
+		self.assertIsInstance( peaks, callPeaks.Peaks )
+		self.assertGreater( len(peaks), 0 )
+		self.assertTrue( peaks.toFrame().equals(expected) )
+
+		chr2 = peaks.subset(peaks.chroms == peaks.chromNames.index('chr2'))
+		self.assertEqual( chr2.widths.tolist(),
+						  expected.loc[expected['chr'] == 'chr2',
+									   'width'].tolist() )
+		self.assertEqual( len(callPeaks.concatPeaks([chr2, chr2],
+													peaks.chromNames)),
+						  2 * len(chr2) )
+
+		imported = subprocess.run([sys.executable, '-c',
+						"import sys; from simplenexuscaller import nexusEngine; "
+						"print('pandas' in sys.modules)"],
+						capture_output=True, text=True, check=True)
+		self.assertEqual( imported.stdout.strip(), 'False' )
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+import numpy, pandas
+
+def getBedFrame(chromLens, counts):
+	""" Per base bedGraph with the given number of positions per chromosome.
+	"""
+	chroms = numpy.repeat([f'chr{i+1}' for i in range(len(chromLens))],
+						  chromLens)
+	starts = numpy.concatenate([numpy.arange(chromLen)
+								for chromLen in chromLens])
+	return pandas.DataFrame({'chr': chroms, 'start': starts,
+							 'end': starts + 1, 'count': counts})
+
+class TestParallelCalling(unittest.TestCase):
+
+	def test_parallelSameAsSerial(self):
+		""" Tests calling each chromosome in a process pool gives the same \
+		result as calling the genome at once, including where signal ranges \
+		end on the last position of a chromosome.
+		"""
+		pos = getBedFrame([3, 3, 4, 6], [9, 9, 9,  9, 9, 9,  9, 9, 0, 9,
+										 0, 9, 9, 0, 0, 0])
+		neg = getBedFrame([3, 3, 4, 6], [0, 0, 9,  9, 9, 9,  9, 0, 0, 0,
+										 0, 0, 0, 9, 9, 0])
+		params = dict(cutoff=5, falseInRowUpper=1, nInRowCutoff=2,
+					  distLimit=1, maxWidth=100)
+
+		serial = NexusAnalysis(pos, neg)
+		serial.callPeaks(**params)
+		parallel = NexusAnalysis(pos, neg)
+		parallel.callPeaks(threads=2, **params)
+
+		self.assertTrue( numpy.all(serial.signalRanges ==
+								   parallel.signalRanges) )
+		self.assertTrue( numpy.all(serial.signalRangesNeg ==
+								   parallel.signalRangesNeg) )
+		self.assertTrue( serial.peaks.equals(parallel.peaks) )
+		self.assertTrue( serial.signalRanges.tolist() ==
+						 [[0, 3], [4, 6], [7, 10], [11, 13]] )
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from simplenexuscaller import parameterSweep
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+import numpy, pandas
+
+class TestParameterSweep(unittest.TestCase):
+
+	def setUp(self):
+		random = numpy.random.RandomState(0)
+		nRows = 2000
+		self.pos = pandas.DataFrame({'chr': ['chr1']*1200 + ['chr2']*800,
+									 'start': numpy.arange(nRows),
+									 'end': numpy.arange(nRows) + 1,
+									 'count': random.poisson(3, nRows)})
+		self.neg = self.pos.assign(count=random.poisson(3, nRows))
+
+	def test_paramSets(self):
+		""" Tests the grid is expanded to every combination, with defaults.
+		"""
+		paramSets = parameterSweep.getParamSets({'cutoff': [5, 10],
+												 'maxWidth': [50, 100, 150]})
+
+		self.assertEqual( len(paramSets), 6 )
+		self.assertEqual( paramSets[1], {**parameterSweep.defaultParams,
+										 'cutoff': 5, 'maxWidth': 100} )
+		self.assertEqual( len(parameterSweep.getSignalTasks(paramSets)), 2 )
+		self.assertRaises(ValueError, parameterSweep.getParamSets,
+						  {'cutOff': [5]})
+
+	def test_sweepPeaks(self):
+		""" Tests each combination gives the same peaks as callPeaks.
+		"""
+		grid = {'cutoff': [5, 6], 'falseInRowUpper': [2], 'nInRowCutoff': [1, 2],
+				'distLimit': [4, 10], 'maxWidth': [20, 40],
+				'dualMethod': ['largestSignal', 'narrow']}
+		nexus = NexusAnalysis(self.pos, self.neg)
+
+		for threads in [1, 2]:
+			summary, peaksList = nexus.sweepPeaks(grid, threads=threads)
+			self.assertEqual( len(summary), 32 )
+
+			for params, peaks in zip(summary.to_dict('records'), peaksList):
+				callNexus = NexusAnalysis(self.pos, self.neg)
+				callNexus.callPeaks(**{name: params[name]
+									   for name in parameterSweep.paramNames})
+
+				self.assertTrue( peaks.equals(callNexus.peaks) )
+				self.assertEqual( (params['posBoundaries'],
+								   params['negBoundaries'], params['peaks']),
+								  (len(callNexus.posBoundaries),
+								   len(callNexus.negBoundaries), len(peaks)) )
+
+if __name__ == '__main__':
+	unittest.main()
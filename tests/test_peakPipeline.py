@@ -0,0 +1,82 @@
+import unittest
+import os, tempfile
+from simplenexuscaller import bedGraphReader, peakPipeline
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+import numpy, pandas
+
+class TestPeakPipeline(unittest.TestCase):
+
+	def setUp(self):
+		random = numpy.random.RandomState(0)
+		starts = numpy.concatenate((numpy.arange(2000), numpy.arange(1000),
+									numpy.arange(500)))
+		chroms = ['chr1']*2000 + ['chr2']*1000 + ['chr3']*500
+		self.pos = pandas.DataFrame({'chr': chroms, 'start': starts,
+									 'end': starts + 1,
+									 'count': random.poisson(2, len(starts))})
+		# chr2 only on the + strand, and negative - strand counts
+		self.neg = self.pos[self.pos['chr'] != 'chr2'].assign(
+							count=lambda frame: -random.poisson(2, len(frame)))
+		self.params = dict(cutoff=4, falseInRowUpper=3, nInRowCutoff=1,
+						   distLimit=5, maxWidth=40)
+		self.expected = NexusAnalysis(self.pos, self.neg.assign(
+						count=numpy.abs(self.neg['count']))).callPeaks(
+																**self.params)
+
+	def test_sources(self):
+		""" Tests records, chunks, frames and files all give the peaks of \
+		NexusAnalysis.callPeaks.
+		"""
+		with tempfile.TemporaryDirectory() as tempDir:
+			fileNames = []
+			for strand, frame in [('pos', self.pos), ('neg', self.neg)]:
+				fileNames.append(os.path.join(tempDir, f'{strand}.bedGraph'))
+				frame.to_csv(fileNames[-1], sep='\t', header=False,
+							 index=False)
+
+			sources = [
+				[frame.itertuples(index=False, name=None)
+				 for frame in [self.pos, self.neg]],
+				[bedGraphReader.iterChunks(fileName, chunkSize=700)
+				 for fileName in fileNames],
+				[map(frame.iloc.__getitem__, [slice(i, i + 700) for i in
+											  range(0, len(frame), 700)])
+				 for frame in [self.pos, self.neg]],
+				fileNames]
+			for pos, neg in sources:
+				chromPeaks = list(peakPipeline.iterPeaks(
+										pos, neg, chunkSize=700, asFrames=True,
+										**self.params))
+				self.assertEqual( [chrom for chrom, peaks in chromPeaks],
+								  ['chr1', 'chr2', 'chr3'] )
+				peaks = pandas.concat([peaks for chrom, peaks in chromPeaks],
+									  ignore_index=True)
+				# A chromosome on one strand has empty int64 peak columns
+				pandas.testing.assert_frame_equal(peaks, self.expected,
+												  check_dtype=False)
+
+	def test_lazy(self):
+		""" Tests the peaks of a chromosome are yielded before the records of \
+		later chromosomes are read, other than the chunk which ends it.
+		"""
+		read = []
+		def iterRecords(frame):
+			for record in frame.itertuples(index=False, name=None):
+				read.append(record[0])
+				yield record
+
+		chromPeaks = peakPipeline.iterPeaks(iterRecords(self.pos),
+											iterRecords(self.neg),
+											chunkSize=100, **self.params)
+		self.assertEqual( read, [] )
+		chrom, peaks = next(chromPeaks)
+		self.assertEqual( chrom, 'chr1' )
+		# Only up to the first chunk of the next chromosome of each strand
+		self.assertLessEqual( read.count('chr3'), 100 )
+		self.assertEqual( len(peaks), (self.expected['chr'] == 'chr1').sum() )
+
+		with self.assertRaises(ValueError):
+			next(peakPipeline.iterPeaks([], [], cutoff='auto'))
+
+if __name__ == '__main__':
+	unittest.main()
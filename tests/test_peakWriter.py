@@ -0,0 +1,61 @@
+import unittest
+import gzip, itertools, os, tempfile
+from simplenexuscaller import bgzf, peakWriter
+import pandas
+
+class TestPeakWriter(unittest.TestCase):
+
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.peaks = pandas.DataFrame({'chr': ['chr1', 'chr1', 'chr2'],
+									   'start': [10, 200, 5],
+									   'end': [40, 260, 2005],
+									   'width': [30, 60, 2000],
+									   'posCount': [5, 600, 7],
+									   'negCount': [3, 800, 2],
+									   'originIndex1': [1, 4, 9],
+									   'originIndex2': [3, 6, 12]})
+
+	def tearDown(self):
+		self.tempDir.cleanup()
+
+	def test_formatPeaks(self):
+		""" Tests peaks are formatted as the rows of each format.
+		"""
+		bedLines = self.peaks.loc[:, ['chr', 'start', 'end']].to_csv(
+											sep='\t', index=False, header=False)
+		self.assertEqual( peakWriter.formatPeaks(self.peaks), bedLines )
+		self.assertEqual( peakWriter.formatPeaks(self.peaks, 'extended'),
+						  self.peaks.to_csv(sep='\t', index=False,
+											header=False) )
+		self.assertEqual( peakWriter.formatPeaks(self.peaks,
+												 'narrowPeak').split('\n')[1],
+						  'chr1\t200\t260\t.\t1000\t.\t1400\t-1\t-1\t-1' )
+		self.assertEqual( peakWriter.formatPeaks(self.peaks.iloc[:0]), '' )
+
+	def test_writeChunks(self):
+		""" Tests peaks written in chunks, in turn or in a background thread, \
+		are read back the same for each compression, with BGZF readable as \
+		gzip.
+		"""
+		expected = peakWriter.formatPeaks(self.peaks, 'extended') * 2
+		for compression, writerClass in itertools.product(
+									peakWriter.compressions,
+									[peakWriter.PeakWriter,
+									 peakWriter.BackgroundPeakWriter]):
+			fileName = peakWriter.getPeakFileName(
+								os.path.join(self.tempDir.name, compression),
+								'extended', compression)
+			with writerClass(fileName, 'extended', compression) as writer:
+				writer.write(self.peaks)
+				writer.write(self.peaks.iloc[:0])
+				writer.write(self.peaks)
+			self.assertEqual( writer.nPeaks, 6 )
+
+			opener = open if compression == 'none' else gzip.open
+			with opener(fileName, 'rt') as peakFile:
+				self.assertEqual( peakFile.read(), expected )
+			self.assertEqual( bgzf.isBgzf(fileName), compression == 'bgzf' )
+
+if __name__ == '__main__':
+	unittest.main()
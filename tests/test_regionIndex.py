@@ -0,0 +1,86 @@
+import unittest
+import os, tempfile
+from simplenexuscaller import bedGraphReader, regionIndex
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+import numpy, pandas
+
+class TestRegionIndex(unittest.TestCase):
+
+	def setUp(self):
+		random = numpy.random.RandomState(0)
+		nRows = 4000
+		starts = numpy.concatenate((numpy.arange(2500), numpy.arange(1500)))
+		self.pos = pandas.DataFrame({'chr': ['chr1']*2500 + ['chr2']*1500,
+									 'start': starts, 'end': starts + 1,
+									 'count': random.poisson(1, nRows)})
+		self.neg = self.pos.assign(count=random.poisson(1, nRows))
+		self.regions = regionIndex.RegionIndex(
+								['chr2', 'chr1', 'chr1', 'chr1', 'chr3'],
+								[300, 1000, 100, 1050, 0],
+								[600, 1100, 400, 1800, 10])
+		self.params = dict(cutoff=3, falseInRowUpper=3, nInRowCutoff=1,
+						   distLimit=5, maxWidth=40)
+
+	def test_regionIndex(self):
+		""" Tests overlapping regions are merged, and the rows overlapping \
+		each region are found.
+		"""
+		self.assertEqual( len(self.regions), 4 )
+		self.assertEqual( self.regions.regions['chr1'][1].tolist(),
+						  [400, 1800] )
+		self.assertEqual( self.regions.expand(350).regions['chr1'][0].tolist(),
+						  [0] )
+
+		mask = self.regions.getOverlapMask(['chr1', 'chr1', 'chr1', 'chr2'],
+										   [0, 399, 400, 550], [100, 400, 1000,
+																900])
+		self.assertEqual( mask.tolist(), [False, True, False, True] )
+
+		track = bedGraphReader.bedGraphTrack.getTrackFromFrame(self.pos)
+		windows = self.regions.getRowWindows(track)
+		self.assertEqual( windows['chr1'].tolist(), [[100, 400], [1000, 1800]] )
+		self.assertEqual( windows['chr2'].tolist(), [[2800, 3100]] )
+		self.assertEqual( windows['chr3'].tolist(), [[0, 0]] )
+
+	def test_callRegionPeaks(self):
+		""" Tests the peaks called in regions are the peaks called on the \
+		genome which overlap the regions, including when only the rows near \
+		the regions are read.
+		"""
+		nexus = NexusAnalysis(self.pos, self.neg)
+		peaks = nexus.callPeaks(**self.params)
+		ends = peaks['end'].to_numpy() + 1
+		expected = peaks.loc[self.regions.getOverlapMask(
+									peaks['chr'].to_numpy(),
+									peaks['start'].to_numpy(), ends)]
+		self.assertGreater( len(expected), 0 )
+		self.assertLess( len(expected), len(peaks) )
+
+		regionPeaks = nexus.callRegionPeaks(self.regions, **self.params)
+		self.assertTrue( regionPeaks.equals(expected.reset_index(drop=True)) )
+
+		with tempfile.TemporaryDirectory() as tempDir:
+			regionFile = os.path.join(tempDir, 'regions.bed')
+			with open(regionFile, 'w') as regions:
+				regions.write('track name=panel\n')
+				for chrom, (starts, ends) in self.regions.regions.items():
+					for start, end in zip(starts, ends):
+						regions.write(f'{chrom}\t{start}\t{end}\tregion\n')
+			tracks = []
+			for strand, frame in [('pos', self.pos), ('neg', self.neg)]:
+				fileName = os.path.join(tempDir, f'{strand}.bedGraph')
+				frame.to_csv(fileName, sep='\t', header=False, index=False)
+				tracks.append(bedGraphReader.readTrack(
+								fileName, chunkSize=1000,
+								regions=self.regions.expand(
+									regionIndex.getRegionMargin(3, 40, 5))))
+
+			self.assertLess( len(tracks[0]), len(self.pos) )
+			readPeaks = NexusAnalysis(*tracks).callRegionPeaks(regionFile,
+															   **self.params)
+			# Including the rows of the boundaries in the whole bedGraph
+			self.assertEqual( readPeaks.values.tolist(),
+							  expected.values.tolist() )
+
+if __name__ == '__main__':
+	unittest.main()
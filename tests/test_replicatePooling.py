@@ -0,0 +1,83 @@
+import unittest
+import os, tempfile
+from simplenexuscaller import bedGraphReader, replicatePooling
+from simplenexuscaller.bedGraphTrack import getTrackFromFrame
+from simplenexuscaller.nexusAnalysis import NexusAnalysis, \
+										  callPeaksByChromosome
+import numpy, pandas
+
+def getFrame(rows):
+	return pandas.DataFrame(rows, columns=['chr', 'start', 'end', 'count'])
+
+class TestReplicatePooling(unittest.TestCase):
+
+	def setUp(self):
+		# c0 and c2 are each only in one replicate
+		self.rep1 = getFrame([('c1', 0, 10, 0), ('c1', 10, 11, 3),
+							  ('c1', 20, 30, 1), ('c2', 0, 5, 2)])
+		self.rep2 = getFrame([('c0', 0, 1, 7), ('c1', 5, 10, 2),
+							  ('c1', 10, 12, 4), ('c3', 0, 3, 1)])
+
+	def test_poolTracks(self):
+		""" Tests the counts are summed over the pieces between the row edges \
+		of the replicates, keeping the chromosomes of either replicate.
+		"""
+		tracks = [getTrackFromFrame(frame) for frame in [self.rep1, self.rep2]]
+		pooled = replicatePooling.poolTracks(tracks).toFrame()
+		expected = getFrame([('c0', 0, 1, 7), ('c1', 0, 5, 0),
+							 ('c1', 5, 10, 2), ('c1', 10, 11, 7),
+							 ('c1', 11, 12, 4), ('c1', 20, 30, 1),
+							 ('c3', 0, 3, 1), ('c2', 0, 5, 2)])
+		pandas.testing.assert_frame_equal(pooled, expected, check_dtype=False)
+
+		pooled = replicatePooling.poolTracks(tracks, weights=[1, 0.5]).toFrame()
+		self.assertEqual( pooled['count'].tolist(),
+						  [3.5, 0, 1, 5, 2, 1, 0.5, 2] )
+
+		with self.assertRaises(ValueError):
+			replicatePooling.poolTracks(tracks, weights=[1])
+
+	def test_pooledCalling(self):
+		""" Tests calling pooled replicate bedGraphs gives the peaks of calling \
+		a bedGraph of the summed counts.
+		"""
+		random = numpy.random.RandomState(0)
+		starts = numpy.arange(3000)
+		chroms = ['chr1']*2000 + ['chr2']*1000
+		strands = [pandas.DataFrame({'chr': chroms, 'start': starts,
+									 'end': starts + 1,
+									 'count': random.poisson(2, len(starts))})
+				   for _ in range(2)]
+		params = dict(cutoff=4, falseInRowUpper=3, nInRowCutoff=1,
+					  distLimit=5, maxWidth=40)
+		expected = NexusAnalysis(*strands).callPeaks(**params)
+
+		with tempfile.TemporaryDirectory() as tempDir:
+			fileNames = [[], []]
+			for strandi, frame in enumerate(strands):
+				# Split each row between the replicates, dropping rows of no
+				# counts from the second replicate
+				rep1 = frame.assign(count=frame['count'] // 2)
+				rep2 = frame.assign(count=frame['count'] - rep1['count'])
+				for repi, repFrame in enumerate([rep1,
+												 rep2[rep2['count'] > 0]]):
+					fileNames[strandi].append(os.path.join(
+									tempDir, f'rep{repi}_{strandi}.bedGraph'))
+					repFrame.to_csv(fileNames[strandi][-1], sep='\t',
+									header=False, index=False)
+
+			peaks = NexusAnalysis(*fileNames).callPeaks(**params)
+			pandas.testing.assert_frame_equal(peaks, expected,
+											  check_dtype=False)
+
+			strandChroms = bedGraphReader.iterStrandChroms(*fileNames,
+														   chunkSize=700)
+			peaks = pandas.concat([peaks for chrom, peaks in
+								   callPeaksByChromosome(strandChroms,
+														 **params)],
+								  ignore_index=True)
+			pandas.testing.assert_frame_equal(peaks, expected,
+											  check_dtype=False)
+
+if __name__ == '__main__':
+	unittest.main()
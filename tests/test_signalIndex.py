@@ -0,0 +1,77 @@
+import unittest
+from simplenexuscaller import nexusAnalysis, signalIndex
+from simplenexuscaller.bedGraphTrack import getTrackFromFrame
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+import numpy, pandas
+
+class TestSignalIndex(unittest.TestCase):
+
+	def setUp(self):
+		random = numpy.random.RandomState(0)
+		frames = []
+		for chrom in ['chr1', 'chr2']:
+			# Rows of several bases, with gaps between some rows
+			lens = random.choice([1, 1, 4], 500)
+			starts = numpy.cumsum(random.choice([0, 0, 3], 500) + lens) - lens
+			frames.append(pandas.DataFrame({'chr': chrom, 'start': starts,
+											'end': starts + lens,
+											'count': random.poisson(2, 500)}))
+		self.bedGraph = pandas.concat(frames, ignore_index=True)
+
+	def getExpectedSignal(self, chrom, start, end):
+		rows = self.bedGraph[self.bedGraph['chr'] == chrom]
+		overlaps = numpy.clip(numpy.minimum(rows['end'], end) -
+							  numpy.maximum(rows['start'], start), 0, None)
+		return (overlaps * rows['count']).sum()
+
+	def test_getSignal(self):
+		""" Tests the counts over regions starting and ending within rows, in \
+		gaps, off either end of a chromosome or on a missing chromosome.
+		"""
+		index = signalIndex.getSignalIndex(getTrackFromFrame(self.bedGraph))
+		random = numpy.random.RandomState(1)
+		chroms = random.choice(['chr1', 'chr2', 'chr3'], 1000)
+		starts = random.randint(-10, 1500, 1000)
+		ends = starts + random.randint(-5, 300, 1000)
+
+		signal = index.getSignal(chroms, starts, ends)
+		expected = [self.getExpectedSignal(*region) if region[2] > region[1]
+					else 0 for region in zip(chroms, starts, ends)]
+		self.assertEqual( signal.tolist(), expected )
+		self.assertEqual( index.getSignal('chr1', 0, 10),
+						  self.getExpectedSignal('chr1', 0, 10) )
+
+	def test_scorePeaks(self):
+		""" Tests the peak scores are the counts of each strand over the bases \
+		of the peak, in memory and when calling one chromosome at a time.
+		"""
+		neg = self.bedGraph.assign(count=self.bedGraph['count'][::-1].to_numpy())
+		nexus = NexusAnalysis(self.bedGraph, neg)
+		params = dict(cutoff=4, falseInRowUpper=3, nInRowCutoff=1,
+					  distLimit=5, maxWidth=40)
+		nexus.callPeaks(**params)
+		peaks = nexus.scorePeaks()
+		self.assertGreater( len(peaks), 10 )
+		self.assertIs( nexus.peaks, peaks )
+
+		for peak in peaks.head(20).itertuples():
+			self.assertEqual( peak.posSignal, self.getExpectedSignal(
+											peak.chr, peak.start, peak.end + 1) )
+		self.assertTrue( numpy.array_equal(
+							peaks['signal'],
+							nexus.regionSignal(peaks['chr'], peaks['start'],
+											   peaks['end'] + 1)) )
+
+		strandChroms = ((chrom, pos, nexus.neg.getChrom(chrom))
+						for chrom, pos in nexus.pos.iterChroms())
+		chromPeaks = nexusAnalysis.callPeaksByChromosome(strandChroms,
+														 score=True, **params)
+		pandas.testing.assert_frame_equal(
+					pandas.concat([peaks for chrom, peaks in chromPeaks],
+								  ignore_index=True), peaks)
+
+		with self.assertRaises(ValueError):
+			nexus.regionSignal('chr1', 0, 10, strand='+-')
+
+if __name__ == '__main__':
+	unittest.main()
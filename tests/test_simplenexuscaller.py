@@ -0,0 +1,40 @@
+import unittest
+import subprocess, sys
+
+# Loose bound on the cumulative import time of the CLI module in seconds, for
+# catching a heavy import being added back rather than measuring precisely.
+importBudget = 1.0
+
+def getImportTimes(args):
+	""" Runs python with -X importtime, returning the cumulative import time \
+	in seconds of each module imported.
+	"""
+	run = subprocess.run([sys.executable, '-X', 'importtime'] + args,
+						 capture_output=True, text=True, check=True)
+	importTimes = {}
+	for line in run.stderr.splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+		self, cumulative, module = line[len('import time:'):].split('|')
+		importTimes[module.strip()] = int(cumulative) / 1e6
+
+	return importTimes
+
+class TestSimpleNexusCaller(unittest.TestCase):
+
+	def test_importTime(self):
+		""" Tests the CLI, including -h, does not import pandas or the \
+		plotting and pickle helpers, and imports within the budget.
+		"""
+		importTimes = getImportTimes(['-m', 'simplenexuscaller', '-h'])
+		self.assertIn( 'simplenexuscaller.simplenexuscaller', importTimes )
+		for module in ['pandas', 'matplotlib',
+					   'simplenexuscaller.helper_functions',
+					   'simplenexuscaller.nexusAnalysis']:
+			self.assertNotIn( module, importTimes )
+
+		self.assertLess( importTimes['simplenexuscaller.simplenexuscaller'],
+						 importBudget )
+
+if __name__ == '__main__':
+	unittest.main()
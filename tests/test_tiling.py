@@ -0,0 +1,83 @@
+import unittest
+from simplenexuscaller import callPeaks, parallelCalling, tiling
+from simplenexuscaller.nexusAnalysis import NexusAnalysis
+from simplenexuscaller.nexusEngine import callStrand
+import numpy, pandas
+
+def getSparseFrame(random, chroms, nRows):
+	""" Gets a bedGraph with gaps between the rows, some far longer than the \
+	calling parameters, so that signals are linked across the gaps.
+	"""
+	frames = []
+	for chrom in chroms:
+		lens = random.choice([1, 1, 1, 5], nRows)
+		starts = numpy.cumsum(random.choice([1, 1, 2, 50, 3000], nRows) + lens)
+		frames.append(pandas.DataFrame({'chr': chrom, 'start': starts,
+										'end': starts + lens,
+										'count': random.poisson(1.5, nRows) *
+												 random.choice([0, 1, 4], nRows)}))
+
+	return pandas.concat(frames, ignore_index=True)
+
+class TestTiling(unittest.TestCase):
+
+	def setUp(self):
+		random = numpy.random.RandomState(0)
+		nexus = NexusAnalysis(getSparseFrame(random, ['chr1', 'chr2'], 3000),
+							  getSparseFrame(random, ['chr1', 'chr3'], 3000))
+		self.posArrays = nexus.pos.getBedArrays()
+		self.negArrays = nexus.neg.getBedArrays()
+
+	def test_tiledCalling(self):
+		""" Tests calling tiles in parallel gives the same signal ranges, \
+		boundaries and peaks as calling the whole genome at once.
+		"""
+		for cutoff, falseInRowUpper, distLimit, maxWidth in [(3, 3, 5, 40),
+															 (2, 10, 40, 100)]:
+			params = dict(cutoff=cutoff, falseInRowUpper=falseInRowUpper,
+						  nInRowCutoff=1, distLimit=distLimit,
+						  dualMethod='largestSignal')
+			expected = [callStrand(self.posArrays, '+', **params),
+						callStrand(self.negArrays, '-', **params)]
+			expectedPeaks = callPeaks.matchBoundaryArrays(expected[0][3],
+														  expected[1][3],
+														  maxWidth)
+
+			posBlockStarts, negBlockStarts, tasks = tiling.getTileTasks(
+										self.posArrays, self.negArrays, 100,
+										cutoff, falseInRowUpper, distLimit,
+										maxWidth)
+			self.assertGreater( len(tasks), 10 )
+
+			posResult, negResult, peakIndex = \
+				parallelCalling.callStrandsParallel(self.posArrays,
+													self.negArrays, maxWidth,
+													2, tileRows=100, **params)
+			for result, strandExpected in zip([posResult, negResult],
+											  expected):
+				self.assertTrue( numpy.array_equal(result[0],
+												   strandExpected[0]) )
+				self.assertTrue( numpy.array_equal(
+										result[3].originIndex,
+										strandExpected[3].originIndex) )
+			for index, expectedIndex in zip(peakIndex, expectedPeaks):
+				self.assertTrue( numpy.array_equal(index, expectedIndex) )
+
+	def test_getSafeCuts(self):
+		""" Tests a cut is not placed between signals linked across a gap in \
+		the bedGraph, nor between boundaries which would be matched.
+		"""
+		starts = numpy.array([0, 5000, 5001, 9000])
+		pos = (starts, starts + 1, numpy.array([5, 5, 0, 5]))
+		neg = (starts, starts + 1, numpy.array([0, 0, 0, 5]))
+		cuts = tiling.getSafeCuts(pos, neg, cutoff=3, falseInRowUpper=0,
+								  distLimit=5, maxWidth=100)
+		# 0 and 5000 are linked, having no rows between them
+		self.assertEqual( cuts.tolist(), [0, 9000] )
+
+		cuts = tiling.getSafeCuts(pos, neg, cutoff=3, falseInRowUpper=0,
+								  distLimit=5, maxWidth=5000)
+		self.assertEqual( cuts.tolist(), [0] )
+
+if __name__ == '__main__':
+	unittest.main()